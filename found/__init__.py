@@ -20,8 +20,6 @@
 # limitations under the License.
 #
 
-from found._fdb import lib
-
 __VERSION__ = (0, 13, 0)
 
 MAX_SIZE_TRANSACTION = 10**7
@@ -29,28 +27,15 @@ MAX_SIZE_KEY = 10**4
 MAX_SIZE_VALUE = 10**5
 
 
+# The API version is selected when libfdb_c is loaded, by the first open of
+# a cluster, see found.base._load_fdb
 HEADER_VERSION = VERSION = 730
 
 
-code = lib.fdb_select_api_version_impl(VERSION, HEADER_VERSION)
-if code == 2203:
-    max_supported_ver = lib.fdb_get_max_api_version()
-    if HEADER_VERSION > max_supported_ver:
-        msg = "This version of the FoundationDB Python binding is not supported by "
-        msg += "the installed FoundationDB C library. The binding requires a library "
-        msg += "that supports API version %d, but the installed library supports a "
-        msg += "maximum version of %d."
-        msg = msg % (HEADER_VERSION, max_supported_ver)
-        raise RuntimeError(msg)
-    else:
-        msg = "API version %d is not supported by the installed FoundationDB C library."
-        msg = msg % VERSION
-        raise RuntimeError(msg)
-elif code != 0:
-    raise RuntimeError("FoundationDB API error ({})".format(code))
-
-
+from found.tuple import EncoderCache  # noqa
 from found.tuple import Versionstamp  # noqa
+from found.tuple import disable_encoder_cache  # noqa
+from found.tuple import enable_encoder_cache  # noqa
 from found.tuple import has_incomplete_versionstamp  # noqa
 from found.tuple import pack  # noqa
 from found.tuple import pack_with_versionstamp  # noqa
@@ -64,13 +49,23 @@ from found.base import STREAMING_MODE_SERIAL  # noqa
 from found.base import STREAMING_MODE_SMALL  # noqa
 from found.base import STREAMING_MODE_WANT_ALL  # noqa
 from found.base import BaseFoundException  # noqa
+from found.base import BatchWriter  # noqa
 from found.base import FoundException  # noqa
+from found.base import RetryBudgetExhausted  # noqa
+from found.base import Span  # noqa
 from found.base import CONFLICT_RANGE_TYPE_READ  # noqa
 from found.base import CONFLICT_RANGE_TYPE_WRITE  # noqa
 from found.base import KeySelector  # noqa
 from found.base import Hooks  # noqa
+from found.base import Histogram  # noqa
+from found.base import InMemoryExporter  # noqa
+from found.base import LoopLag  # noqa
+from found.base import Metrics  # noqa
 from found.base import Transaction  # noqa
 from found.base import TransactionStats  # noqa
+from found.base import ReadCache  # noqa
+from found.base import ReadVersionCache  # noqa
+from found.base import VersionedCache  # noqa
 from found.base import make_hooks  # noqa
 from found.base import ERROR_PREDICATE_MAYBE_COMMITTED  # noqa
 from found.base import ERROR_PREDICATE_RETRYABLE  # noqa
@@ -84,11 +79,16 @@ from found.base import bit_or  # noqa
 from found.base import bit_xor  # noqa
 from found.base import byte_max  # noqa
 from found.base import byte_min  # noqa
+from found.base import cache_read_version  # noqa
 from found.base import cancel  # noqa
 from found.base import clear  # noqa
 from found.base import commit  # noqa
 from found.base import compare_and_clear  # noqa
 from found.base import database_set_option  # noqa
+from found.base import disable_metrics  # noqa
+from found.base import enable_metrics  # noqa
+from found.base import enable_read_cache  # noqa
+from found.base import end_span  # noqa
 from found.base import error_predicate  # noqa
 from found.base import estimated_size_bytes  # noqa
 from found.base import get  # noqa
@@ -97,6 +97,7 @@ from found.base import get_approximate_size  # noqa
 from found.base import get_client_version  # noqa
 from found.base import get_committed_version  # noqa
 from found.base import get_key  # noqa
+from found.base import get_many  # noqa
 from found.base import get_range_split_points  # noqa
 from found.base import get_versionstamp  # noqa
 from found.base import gt  # noqa
@@ -105,23 +106,29 @@ from found.base import lt  # noqa
 from found.base import lte  # noqa
 from found.base import make_transaction  # noqa
 from found.base import max  # noqa
+from found.base import monitor_loop_lag  # noqa
 from found.base import min  # noqa
 from found.base import network_set_option  # noqa
 from found.base import next_prefix  # noqa
 from found.base import on_error  # noqa
 from found.base import open  # noqa
+from found.base import parallel_query  # noqa
 from found.base import query  # noqa
 from found.base import read_version  # noqa
 from found.base import reset  # noqa
 from found.base import set  # noqa
 from found.base import set_option  # noqa
 from found.base import set_read_version  # noqa
+from found.base import set_span_exporter  # noqa
 from found.base import set_versionstamped_key  # noqa
 from found.base import set_versionstamped_value  # noqa
+from found.base import start_span  # noqa
 from found.base import transaction  # noqa
 from found.base import transactional  # noqa
 from found.base import watch  # noqa
 
+from found.subspace import Subspace  # noqa
+
 
 def co(func):
     async def wrapper(*args, **kwargs):
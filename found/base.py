@@ -12,16 +12,21 @@
 
 import asyncio
 import atexit
+import builtins
+import contextvars
+import logging
+import random
 import struct
 import threading
 import time
-from collections import namedtuple
+import weakref
+from collections import OrderedDict, deque, namedtuple
 from contextlib import asynccontextmanager
 
-from found._fdb import ffi, lib
-
 assert struct.calcsize("P") == 8, "found requires a 64-bit Python interpreter"
 
+log = logging.getLogger(__name__)
+
 
 # ---------------------------------------------------------------------------
 # Exceptions
@@ -40,10 +45,71 @@ class FoundException(BaseFoundException):
         self.code = code
 
     def __repr__(self):
+        if lib is None:
+            # Raised by the in-memory backend, libfdb_c is not loaded
+            return "<FoundException ({})>".format(self.code)
         description = ffi.string(lib.fdb_get_error(self.code)).decode("utf-8")
         return "<FoundException {} ({})>".format(description, self.code)
 
 
+class RetryBudgetExhausted(FoundException):
+    """Exception raised by transactional when the retry limit or the deadline
+    is reached.  ``code`` is the last error, ``stats`` the TransactionStats of
+    the attempts."""
+
+    def __init__(self, code, stats):
+        super().__init__(code)
+        self.stats = stats
+
+
+# ---------------------------------------------------------------------------
+# libfdb_c
+#
+# CHANGE: found._fdb, hence libfdb_c, is loaded and the API version selected
+# by the first open of a cluster, or the first call that needs the client,
+# e.g. network_set_option, instead of at import time: the tuple layer and the
+# in-memory backend work on hosts without the FoundationDB client.
+# ---------------------------------------------------------------------------
+
+ffi = lib = None
+_fdb_lock = threading.Lock()
+
+
+def _load_fdb():
+    global ffi, lib, _buffers, _cb_dispatch, _cb_get_many, _cb_completion_hook
+    if lib is not None:
+        return
+    with _fdb_lock:
+        if lib is not None:
+            return
+        from found import HEADER_VERSION, VERSION, _fdb
+
+        code = _fdb.lib.fdb_select_api_version_impl(VERSION, HEADER_VERSION)
+        if code == 2203:
+            max_supported_ver = _fdb.lib.fdb_get_max_api_version()
+            if HEADER_VERSION > max_supported_ver:
+                msg = "This version of the FoundationDB Python binding is not supported by "
+                msg += "the installed FoundationDB C library. The binding requires a library "
+                msg += "that supports API version %d, but the installed library supports a "
+                msg += "maximum version of %d."
+                msg = msg % (HEADER_VERSION, max_supported_ver)
+                raise RuntimeError(msg)
+            else:
+                msg = "API version %d is not supported by the installed FoundationDB C library."
+                msg = msg % VERSION
+                raise RuntimeError(msg)
+        elif code != 0:
+            raise RuntimeError("FoundationDB API error ({})".format(code))
+        callback = _fdb.ffi.callback
+        _cb_dispatch = callback("void(FDBFuture *, void *)")(_dispatch)
+        _cb_get_many = callback("void(FDBFuture *, void *)")(_dispatch_get_many)
+        _cb_completion_hook = callback("void(void *)")(_completion_hook)
+        ffi = _fdb.ffi
+        _buffers = _Buffers()
+        # Last, lib is not None once everything is ready
+        lib = _fdb.lib
+
+
 # ---------------------------------------------------------------------------
 # Helpers
 # ---------------------------------------------------------------------------
@@ -119,162 +185,288 @@ def _stop_network():
 # Core bridge helper
 #
 # CHANGE: instead of storing just the asyncio Future as a CFFI handle, we now
-# store a (loop, future) pair.  This way every C callback has an unambiguous
-# reference to the loop it must call back into, without relying on a stale
-# module-level _loop variable.
+# store a (completions, future) pair, where completions is the completion
+# queue of the loop the future belongs to.  This way every C callback has an
+# unambiguous reference to the loop it must call back into, without relying
+# on a stale module-level _loop variable.
 #
 # We also keep the handle alive by storing it in a dict keyed by the FDB
 # future pointer, and remove it once the callback fires.  In the original
 # code the handle was a local variable in the calling coroutine, kept alive
 # only because CFFI held a borrowed reference — that is technically fine but
 # relies on CPython's refcount behaviour in a way that is hard to audit.
+#
+# CHANGE: results are no longer handed over with one call_soon_threadsafe per
+# FDB future.  Each call writes to the loop's self-pipe, so a fan-out of 10k
+# reads cost 10k syscalls and 10k loop wakeups.  The network thread now
+# appends results to the per-loop completion queue, and only the first append
+# after a drain wakes the loop up; a single drain resolves the whole burst.
 # ---------------------------------------------------------------------------
 
-# fdb_future_ptr (int) -> cffi handle object
-_pending_handles: dict = {}
-_pending_handles_lock = threading.Lock()
 
+class _CompletionQueue:
+    """Results handed over by the network thread to one event loop.
+
+    ``put`` runs on the network thread, ``drain`` runs on the loop.  The deque
+    append and popleft are atomic, and ``scheduled`` is reset *before* the
+    deque is drained, so a result appended concurrently is either drained by
+    the running drain or schedules the next one — it is never lost.
+
+    The loop is held with a weak reference: the queue is the value of the loop
+    in _completion_queues, a strong reference would keep the key alive.  The
+    pending asyncio futures keep their loop alive until they are drained.
+    """
+
+    __slots__ = ("loop", "pending", "scheduled", "lag", "__weakref__")
+
+    def __init__(self, loop):
+        self.loop = weakref.ref(loop)
+        self.pending = deque()
+        self.scheduled = False
+        # LoopLag, see monitor_loop_lag
+        self.lag = None
+
+    def put(self, aio_future, error, result):
+        stamp = None if self.lag is None else time.perf_counter_ns()
+        self.pending.append((aio_future, error, result, stamp))
+        if not self.scheduled:
+            self.scheduled = True
+            self.loop().call_soon_threadsafe(self.drain)
+
+    def drain(self):
+        self.scheduled = False
+        pending = self.pending
+        while pending:
+            aio_future, error, result, stamp = pending.popleft()
+            if aio_future.done():
+                # The awaiting task was cancelled in the meantime.
+                continue
+            if stamp is not None and self.lag is not None:
+                # When the loop hands the result to the awaiting task, that
+                # resumes on one of the next iterations of the loop.
+                self.lag.record(stamp)
+            if error == 0:
+                aio_future.set_result(result)
+            else:
+                aio_future.set_exception(FoundException(error))
+
+
+# event loop -> _CompletionQueue, only ever touched from the loop thread
+_completion_queues = weakref.WeakKeyDictionary()
+
+
+def _completion_queue(loop):
+    try:
+        return _completion_queues[loop]
+    except KeyError:
+        out = _completion_queues[loop] = _CompletionQueue(loop)
+        return out
+
+
+# CHANGE: slot table.  The state of each pending future used to be kept alive
+# with a cffi handle, stored in a dict keyed by the future pointer under a
+# lock, taken twice per call, once of them by the network thread.  The state
+# is now stored in a slot of a table that grows but never shrinks, and the
+# index of the slot is the void * parameter of the callback.  Free slots are
+# recycled through a free list: list.append and list.pop are atomic under the
+# GIL, so the loop and the network thread do not need a lock.  Only growing
+# the table takes one, when the free list is empty.
+
+_SLOTS_INITIAL = 1024
 
-def _register_callback(fdb_future, callback, loop, aio_future):
+# slot index -> state of the pending future, or None
+_slots = [None] * _SLOTS_INITIAL
+_free_slots = list(range(_SLOTS_INITIAL - 1, -1, -1))
+_slots_lock = threading.Lock()
+
+
+def _grow_slots():
+    with _slots_lock:
+        if not _free_slots:
+            size = len(_slots)
+            _slots.extend([None] * size)
+            _free_slots.extend(range(2 * size - 1, size - 1, -1))
+
+
+def _put_slot(state):
+    """Store ``state`` in a free slot, return the callback parameter."""
+    while True:
+        try:
+            index = _free_slots.pop()
+        except IndexError:
+            _grow_slots()
+        else:
+            break
+    _slots[index] = state
+    return ffi.cast("void *", index)
+
+
+def _take_slot(param):
+    """Return the state stored in the slot of ``param``, and free the slot."""
+    index = int(ffi.cast("intptr_t", param))
+    state = _slots[index]
+    _slots[index] = None
+    _free_slots.append(index)
+    return state
+
+
+def _register_callback(fdb_future, kind, loop, aio_future):
     """
-    Wire up a CFFI callback so that when fdb_future is ready it resolves
-    aio_future on the given loop.
+    Wire up the dispatch callback so that when fdb_future is ready its
+    result, read according to ``kind``, resolves aio_future on the given
+    loop.
 
     Returns the aio_future so callers can `await` it directly.
     """
-    pair = (loop, aio_future)
-    handle = ffi.new_handle(pair)
-    # Keep the handle alive until the callback fires
-    key = int(ffi.cast("uintptr_t", fdb_future))
-    with _pending_handles_lock:
-        _pending_handles[key] = handle
-    lib.fdb_future_set_callback(fdb_future, callback, handle)
+    param = _put_slot((kind, _completion_queue(loop), aio_future))
+    lib.fdb_future_set_callback(fdb_future, _cb_dispatch, param)
     return aio_future
 
 
-def _release_handle(fdb_future):
-    key = int(ffi.cast("uintptr_t", fdb_future))
-    with _pending_handles_lock:
-        _pending_handles.pop(key, None)
-
-
 # ---------------------------------------------------------------------------
 # CFFI callbacks
 #
-# CHANGE: every callback now unpacks the (loop, future) pair from the handle
-# instead of relying on the module-global _loop.  The fdb_future is destroyed
-# *before* scheduling the asyncio callback so the C memory is released as
-# early as possible, and we don't risk it being accessed after Python resumes.
+# CHANGE: every callback now unpacks the (completions, future) pair from the
+# slot of its parameter instead of relying on the module-global _loop.  The
+# fdb_future is destroyed *before* the result is queued so the C memory is
+# released as early as possible, and we don't risk it being accessed after
+# Python resumes.  The exception is the zero-copy range read, whose results
+# point into the memory of the future: the garbage collector destroys it.
+#
+# CHANGE: one callback for every kind of result.  There used to be a cffi
+# callback per kind, each allocating its out-parameters with ffi.new on every
+# completion, on the network thread and with the GIL held.  The slot now also
+# holds the kind of result, _cb_dispatch reads it with the matching reader,
+# and the readers reuse out-parameters allocated once per thread: callbacks
+# run on the network thread, or on the calling thread when the future is
+# already ready.
 # ---------------------------------------------------------------------------
 
 
-@ffi.callback("void(FDBFuture *, void *)")
-def _cb_watch(fdb_future, handle):
-    loop, aio_future = ffi.from_handle(handle)
-    error = lib.fdb_future_get_error(fdb_future)
-    _release_handle(fdb_future)
-    lib.fdb_future_destroy(fdb_future)
-    if error == 0:
-        loop.call_soon_threadsafe(aio_future.set_result, None)
-    else:
-        loop.call_soon_threadsafe(aio_future.set_exception, FoundException(error))
+class _Buffers(threading.local):
+    """Out-parameters of the fdb_future_get_* functions, one set per thread."""
 
+    def __init__(self):
+        self.present = ffi.new("fdb_bool_t *")
+        self.value = ffi.new("uint8_t **")
+        self.length = ffi.new("int *")
+        self.int64 = ffi.new("int64_t *")
+        self.key = ffi.new("uint8_t const **")
+        self.kvs = ffi.new("FDBKeyValue **")
+        self.keys = ffi.new("FDBKey const **")
+        self.strings = ffi.new("const char ***")
+        self.more = ffi.new("fdb_bool_t *")
 
-@ffi.callback("void(FDBFuture *, void *)")
-def _cb_get(fdb_future, handle):
-    loop, aio_future = ffi.from_handle(handle)
-    present = ffi.new("fdb_bool_t *")
-    value = ffi.new("uint8_t **")
-    value_length = ffi.new("int *")
-    error = lib.fdb_future_get_value(fdb_future, present, value, value_length)
-    if error == 0:
-        if present[0]:
-            # Copy the bytes out before destroying the future
-            out = bytes(ffi.buffer(value[0], value_length[0]))
-        else:
-            out = None
-    _release_handle(fdb_future)
-    lib.fdb_future_destroy(fdb_future)
-    if error == 0:
-        loop.call_soon_threadsafe(aio_future.set_result, out)
-    else:
-        loop.call_soon_threadsafe(aio_future.set_exception, FoundException(error))
 
+# Created by _load_fdb
+_buffers = None
 
-@ffi.callback("void(FDBFuture *, void *)")
-def _cb_get_range(fdb_future, handle):
-    loop, aio_future = ffi.from_handle(handle)
-    kvs = ffi.new("FDBKeyValue **")
-    count = ffi.new("int *")
-    more = ffi.new("fdb_bool_t *")
-    error = lib.fdb_future_get_keyvalue_array(fdb_future, kvs, count, more)
-    if error == 0:
-        out = []
-        copy = kvs[0][0 : count[0]]
-        for kv in copy:
-            # Manual struct unpacking — CFFI does not respect FDBKeyValue's
-            # actual packing on all platforms.
-            # https://bitbucket.org/cffi/cffi/issues/364/make-packing-configureable
-            # Layout: key_ptr(8) key_len(4) value_ptr(8) value_len(4) = 24
-            memory = ffi.buffer(ffi.addressof(kv), 24)
-            key_ptr, key_length, value_ptr, value_length = struct.unpack("=qiqi", memory)
-            key = bytes(ffi.buffer(ffi.cast("char *", key_ptr), key_length))
-            value = bytes(ffi.buffer(ffi.cast("char *", value_ptr), value_length))
-            out.append((key, value))
-        result = (out, count[0], bool(more[0]))
-    _release_handle(fdb_future)
-    lib.fdb_future_destroy(fdb_future)
-    if error == 0:
-        loop.call_soon_threadsafe(aio_future.set_result, result)
-    else:
-        loop.call_soon_threadsafe(aio_future.set_exception, FoundException(error))
+
+def _read_none(fdb_future):
+    return lib.fdb_future_get_error(fdb_future), None
 
 
-@ffi.callback("void(FDBFuture *, void *)")
-def _cb_int64(fdb_future, handle):
-    """Generic callback for operations that resolve to an int64."""
-    loop, aio_future = ffi.from_handle(handle)
-    pointer = ffi.new("int64_t *")
+def _read_value(fdb_future):
+    buffers = _buffers
+    present = buffers.present
+    value = buffers.value
+    value_length = buffers.length
+    error = lib.fdb_future_get_value(fdb_future, present, value, value_length)
+    out = None
+    if error == 0 and present[0]:
+        # Copy the bytes out before destroying the future
+        out = bytes(ffi.buffer(value[0], value_length[0]))
+    return error, out
+
+
+# Manual struct unpacking — CFFI does not respect FDBKeyValue's actual packing
+# on all platforms.
+# https://bitbucket.org/cffi/cffi/issues/364/make-packing-configureable
+# Layout: key_ptr(8) key_len(4) value_ptr(8) value_len(4) = 24
+_KEYVALUE = struct.Struct("=qiqi")
+
+
+def _get_keyvalue_array(fdb_future):
+    """Return (error, rows, more) where rows are (key_ptr, key_length,
+    value_ptr, value_length) tuples, decoded in one pass over the array."""
+    buffers = _buffers
+    kvs = buffers.kvs
+    count = buffers.length
+    more = buffers.more
+    error = lib.fdb_future_get_keyvalue_array(fdb_future, kvs, count, more)
+    if error != 0 or count[0] == 0:
+        return error, [], bool(more[0])
+    memory = ffi.buffer(kvs[0], _KEYVALUE.size * count[0])
+    return error, list(_KEYVALUE.iter_unpack(memory)), bool(more[0])
+
+
+def _read_keyvalues(fdb_future):
+    error, rows, more = _get_keyvalue_array(fdb_future)
+    if error != 0:
+        return error, None
+    out = []
+    for key_ptr, key_length, value_ptr, value_length in rows:
+        key = bytes(ffi.buffer(ffi.cast("char *", key_ptr), key_length))
+        value = bytes(ffi.buffer(ffi.cast("char *", value_ptr), value_length))
+        out.append((key, value))
+    return error, (out, len(out), more)
+
+
+def _read_keyvalues_zero_copy(fdb_future):
+    """Like _read_keyvalues, but returns read-only memoryview slices of the
+    memory of the future instead of copies.
+
+    Unlike the other readers, it owns the future: the future is destroyed when
+    the last memoryview of the batch is released."""
+    error, rows, more = _get_keyvalue_array(fdb_future)
+    if error != 0 or not rows:
+        lib.fdb_future_destroy(fdb_future)
+        return error, None if error != 0 else ([], 0, more)
+    # One buffer spans the keys and values of the batch, that may be in
+    # several blocks of the memory of the future: only the slices are read.
+    begin = builtins.min(builtins.min(row[0], row[2]) for row in rows)
+    end = builtins.max(builtins.max(row[0] + row[1], row[2] + row[3]) for row in rows)
+    pointer = ffi.gc(ffi.cast("char *", begin), lambda _: lib.fdb_future_destroy(fdb_future))
+    memory = memoryview(ffi.buffer(pointer, end - begin)).toreadonly()
+    out = []
+    for key_ptr, key_length, value_ptr, value_length in rows:
+        key = key_ptr - begin
+        value = value_ptr - begin
+        out.append((memory[key : key + key_length], memory[value : value + value_length]))
+    return error, (out, len(out), more)
+
+
+def _read_int64(fdb_future):
+    """Read operations that resolve to an int64."""
+    pointer = _buffers.int64
     error = lib.fdb_future_get_int64(fdb_future, pointer)
-    if error == 0:
-        result = pointer[0]
-    _release_handle(fdb_future)
-    lib.fdb_future_destroy(fdb_future)
-    if error == 0:
-        loop.call_soon_threadsafe(aio_future.set_result, result)
-    else:
-        loop.call_soon_threadsafe(aio_future.set_exception, FoundException(error))
+    return error, pointer[0] if error == 0 else None
 
 
-@ffi.callback("void(FDBFuture *, void *)")
-def _cb_get_key(fdb_future, handle):
-    """Callback for fdb_transaction_get_key — copies key bytes from the future."""
-    loop, aio_future = ffi.from_handle(handle)
-    key = ffi.new("uint8_t const **")
-    key_length = ffi.new("int *")
+def _read_key(fdb_future):
+    """Read fdb_transaction_get_key — copies key bytes from the future."""
+    buffers = _buffers
+    key = buffers.key
+    key_length = buffers.length
     error = lib.fdb_future_get_key(fdb_future, key, key_length)
+    out = None
     if error == 0:
         out = bytes(ffi.buffer(key[0], key_length[0]))
-    _release_handle(fdb_future)
-    lib.fdb_future_destroy(fdb_future)
-    if error == 0:
-        loop.call_soon_threadsafe(aio_future.set_result, out)
-    else:
-        loop.call_soon_threadsafe(aio_future.set_exception, FoundException(error))
+    return error, out
 
 
-@ffi.callback("void(FDBFuture *, void *)")
-def _cb_get_key_array(fdb_future, handle):
-    """Callback for fdb_future_get_key_array — returns a list of bytes keys.
+def _read_key_array(fdb_future):
+    """Read fdb_future_get_key_array — returns a list of bytes keys.
 
     Requires a 64-bit Python interpreter (pointer size == 8 bytes).
     FDBKey is #pragma pack(4): pointer(8) + int(4) = 12 bytes, no trailing pad.
-    We unpack manually (same strategy as _cb_get_range / FDBKeyValue) to avoid
+    We unpack manually (same strategy as _read_keyvalues / FDBKeyValue) to avoid
     any CFFI-vs-compiler layout disagreement."""
-    loop, aio_future = ffi.from_handle(handle)
-    keys = ffi.new("FDBKey const **")
-    count = ffi.new("int *")
+    buffers = _buffers
+    keys = buffers.keys
+    count = buffers.length
     error = lib.fdb_future_get_key_array(fdb_future, keys, count)
+    out = None
     if error == 0:
         out = []
         if count[0] > 0:
@@ -284,44 +476,146 @@ def _cb_get_key_array(fdb_future, handle):
                 memory = ffi.buffer(ffi.addressof(k), 12)
                 key_ptr, key_length = struct.unpack("=qi", memory)
                 out.append(bytes(ffi.buffer(ffi.cast("char *", key_ptr), key_length)))
-    _release_handle(fdb_future)
-    lib.fdb_future_destroy(fdb_future)
-    if error == 0:
-        loop.call_soon_threadsafe(aio_future.set_result, out)
-    else:
-        loop.call_soon_threadsafe(aio_future.set_exception, FoundException(error))
+    return error, out
 
 
-@ffi.callback("void(FDBFuture *, void *)")
-def _cb_get_string_array(fdb_future, handle):
-    """Callback for fdb_future_get_string_array — returns a list of UTF-8 strings."""
-    loop, aio_future = ffi.from_handle(handle)
-    strings = ffi.new("const char ***")
-    count = ffi.new("int *")
+def _read_string_array(fdb_future):
+    """Read fdb_future_get_string_array — returns a list of UTF-8 strings."""
+    buffers = _buffers
+    strings = buffers.strings
+    count = buffers.length
     error = lib.fdb_future_get_string_array(fdb_future, strings, count)
+    out = None
     if error == 0:
         out = []
         for i in range(count[0]):
             out.append(ffi.string(strings[0][i]).decode("utf-8"))
-    _release_handle(fdb_future)
+    return error, out
+
+
+# Kinds of result, the index of their reader in _READERS.  _RESULT_NONE is
+# used by commit, watch and on_error, that resolve to None or raise.
+_RESULT_NONE = 0
+_RESULT_VALUE = 1
+_RESULT_KEYVALUES = 2
+_RESULT_KEYVALUES_ZERO_COPY = 3
+_RESULT_INT64 = 4
+_RESULT_KEY = 5
+_RESULT_KEY_ARRAY = 6
+_RESULT_STRING_ARRAY = 7
+
+_READERS = (
+    _read_none,
+    _read_value,
+    _read_keyvalues,
+    _read_keyvalues_zero_copy,
+    _read_int64,
+    _read_key,
+    _read_key_array,
+    _read_string_array,
+)
+
+
+def _read_ready(fdb_future, kind):
+    """Return the result of ``fdb_future``, that is ready, and destroy it."""
+    error, result = _READERS[kind](fdb_future)
+    if kind != _RESULT_KEYVALUES_ZERO_COPY:
+        lib.fdb_future_destroy(fdb_future)
+    _check(error)
+    return result
+
+
+# The cffi callbacks of _dispatch, _dispatch_get_many and _completion_hook,
+# created by _load_fdb
+_cb_dispatch = _cb_get_many = _cb_completion_hook = None
+
+
+def _dispatch(fdb_future, param):
+    kind, completions, aio_future = _take_slot(param)
+    error, result = _READERS[kind](fdb_future)
+    if kind != _RESULT_KEYVALUES_ZERO_COPY:
+        lib.fdb_future_destroy(fdb_future)
+    completions.put(aio_future, error, result)
+
+
+class _GetMany:
+    """Shared state of one get_many call.
+
+    ``indices`` maps each pending fdb future pointer to the position of its
+    key; ``remaining`` is decremented under ``lock`` because the callback of a
+    future that is already ready runs on the calling thread, while the others
+    run on the network thread."""
+
+    __slots__ = ("completions", "aio_future", "indices", "out", "remaining", "error", "lock")
+
+    def __init__(self, completions, aio_future, count):
+        self.completions = completions
+        self.aio_future = aio_future
+        self.indices = {}
+        self.out = [None] * count
+        self.remaining = count
+        self.error = 0
+        self.lock = threading.Lock()
+
+
+def _dispatch_get_many(fdb_future, param):
+    batch = _slots[int(ffi.cast("intptr_t", param))]
+    error, value = _read_value(fdb_future)
+    index = batch.indices.pop(int(ffi.cast("uintptr_t", fdb_future)))
+    batch.out[index] = value
     lib.fdb_future_destroy(fdb_future)
-    if error == 0:
-        loop.call_soon_threadsafe(aio_future.set_result, out)
+    with batch.lock:
+        if error != 0 and batch.error == 0:
+            batch.error = error
+        batch.remaining -= 1
+        done = batch.remaining == 0
+    if done:
+        _take_slot(param)
+        batch.completions.put(batch.aio_future, batch.error, batch.out)
+
+
+# ---------------------------------------------------------------------------
+# In-memory backend
+#
+# A database opened with backend="memory" has a found.memory object as
+# pointer, whose methods compute results synchronously.  They are still handed
+# over through an asyncio future resolved on the next loop iteration, so that
+# coroutines interleave at the same points as with a cluster.
+# ---------------------------------------------------------------------------
+
+
+def _memory_resolve(aio_future, error, result):
+    if aio_future.done():
+        return
+    if error is None:
+        aio_future.set_result(result)
     else:
-        loop.call_soon_threadsafe(aio_future.set_exception, FoundException(error))
+        aio_future.set_exception(error)
 
 
-@ffi.callback("void(FDBFuture *, void *)")
-def _cb_error(fdb_future, handle):
-    """Used for fdb_transaction_on_error — resolves to None or raises."""
-    loop, aio_future = ffi.from_handle(handle)
-    error = lib.fdb_future_get_error(fdb_future)
-    _release_handle(fdb_future)
-    lib.fdb_future_destroy(fdb_future)
-    if error == 0:
-        loop.call_soon_threadsafe(aio_future.set_result, None)
+def _memory_future(loop, method, *args):
+    aio_future = loop.create_future()
+    try:
+        result = method(*args)
+    except FoundException as exc:
+        loop.call_soon(_memory_resolve, aio_future, exc, None)
     else:
-        loop.call_soon_threadsafe(aio_future.set_exception, FoundException(error))
+        loop.call_soon(_memory_resolve, aio_future, None, result)
+    return aio_future
+
+
+def _memory_get_many(tx, keys):
+    get = tx.pointer.get
+    return [get(key, tx.snapshot) for key in keys]
+
+
+def _memory_get_range(tx, begin, end, limit, mode, iteration, reverse, kind):
+    kvs, count, more = tx.pointer.get_range(
+        begin, end, limit, mode, iteration, tx.snapshot, reverse
+    )
+    if kind == _RESULT_KEYVALUES_ZERO_COPY:
+        kvs = [(memoryview(key), memoryview(value)) for key, value in kvs]
+    return kvs, count, more
 
 
 # ---------------------------------------------------------------------------
@@ -337,6 +631,343 @@ STREAMING_MODE_LARGE = 3
 STREAMING_MODE_SERIAL = 4
 
 
+# ---------------------------------------------------------------------------
+# Metrics
+#
+# Opt-in instrumentation: with enable_metrics, get, query batches, commit and
+# on_error record the time from the C call to the resumption of the awaiting
+# coroutine, together with the bytes read, in one histogram per operation.
+# Bytes written with set, clear and atomic operations are counted as "write".
+# When disabled, the cost is one global lookup per operation.
+# ---------------------------------------------------------------------------
+
+
+class Histogram:
+    """Histogram of non-negative integers, in the style of HdrHistogram.
+
+    Buckets are 1/16th of a power of two wide, hence values are known within
+    6.25%, with a fixed cost per record and a few hundred buckets at most."""
+
+    __slots__ = ("counts", "count", "total", "min", "max")
+
+    SUB_BUCKET_BITS = 4
+
+    def __init__(self):
+        # bucket index -> count
+        self.counts = {}
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    @classmethod
+    def index(cls, value):
+        shift = value.bit_length() - cls.SUB_BUCKET_BITS - 1
+        if shift <= 0:
+            return value
+        return (shift << cls.SUB_BUCKET_BITS) + (value >> shift)
+
+    @classmethod
+    def highest(cls, index):
+        """Return the highest value that falls in the bucket ``index``."""
+        shift = (index >> cls.SUB_BUCKET_BITS) - 1
+        if shift <= 0:
+            return index
+        return ((index - (shift << cls.SUB_BUCKET_BITS) + 1) << shift) - 1
+
+    def record(self, value):
+        index = self.index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, percentile):
+        """Return the value under which ``percentile`` percent of the values fall."""
+        if self.count == 0:
+            return 0
+        rank = percentile / 100 * self.count
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return builtins.min(self.highest(index), self.max)
+        return self.max
+
+
+class Metrics:
+    """Latency histograms in nanoseconds, and byte counters, per operation."""
+
+    __slots__ = ("latency", "bytes")
+
+    PERCENTILES = (50, 90, 99, 99.9)
+
+    def __init__(self):
+        # operation -> Histogram
+        self.latency = {}
+        # operation -> bytes read, or written for "write"
+        self.bytes = {}
+
+    def record(self, operation, start, size=0):
+        """Record an operation that started at ``time.perf_counter_ns()`` ``start``."""
+        histogram = self.latency.get(operation)
+        if histogram is None:
+            histogram = self.latency[operation] = Histogram()
+        histogram.record(time.perf_counter_ns() - start)
+        self.count(operation, size)
+
+    def count(self, operation, size):
+        self.bytes[operation] = self.bytes.get(operation, 0) + size
+
+    def to_dict(self):
+        """Return the metrics as a dict, durations in seconds."""
+        out = {}
+        for operation in sorted(builtins.set(self.latency) | builtins.set(self.bytes)):
+            item = out[operation] = dict(bytes=self.bytes.get(operation, 0))
+            histogram = self.latency.get(operation)
+            if histogram is None:
+                continue
+            item["count"] = histogram.count
+            item["sum"] = histogram.total / 1e9
+            item["min"] = (histogram.min or 0) / 1e9
+            item["max"] = histogram.max / 1e9
+            for percentile in self.PERCENTILES:
+                item["p{}".format(percentile)] = histogram.percentile(percentile) / 1e9
+        return out
+
+    def to_prometheus(self, prefix="found"):
+        """Return the metrics in the Prometheus text exposition format."""
+        lines = []
+        name = prefix + "_operation_duration_seconds"
+        lines.append("# TYPE {} summary".format(name))
+        for operation, histogram in sorted(self.latency.items()):
+            for percentile in self.PERCENTILES:
+                value = histogram.percentile(percentile) / 1e9
+                labels = 'operation="{}",quantile="{}"'.format(operation, percentile / 100)
+                lines.append("{}{{{}}} {}".format(name, labels, value))
+            labels = 'operation="{}"'.format(operation)
+            lines.append("{}_sum{{{}}} {}".format(name, labels, histogram.total / 1e9))
+            lines.append("{}_count{{{}}} {}".format(name, labels, histogram.count))
+        name = prefix + "_operation_bytes_total"
+        lines.append("# TYPE {} counter".format(name))
+        for operation, size in sorted(self.bytes.items()):
+            lines.append('{}{{operation="{}"}} {}'.format(name, operation, size))
+        return "\n".join(lines) + "\n"
+
+
+_metrics = None
+
+
+def enable_metrics():
+    """Start recording metrics, return the ``Metrics``."""
+    global _metrics
+    if _metrics is None:
+        _metrics = Metrics()
+    _update_instrumented()
+    return _metrics
+
+
+def disable_metrics():
+    global _metrics
+    _metrics = None
+    _update_instrumented()
+
+
+# ---------------------------------------------------------------------------
+# Event loop lag
+#
+# Results are handed over to the event loop, so a busy loop delays every
+# result, and a slow database looks the same as a saturated loop.  Once
+# monitor_loop_lag is called, the network thread timestamps each result, and
+# the delay until the loop hands it to the awaiting coroutine is recorded.
+# ---------------------------------------------------------------------------
+
+
+class LoopLag:
+    """Delays, in nanoseconds, between the completion of FDB futures on the
+    network thread and the loop setting the result of the asyncio futures."""
+
+    def __init__(self, completions, threshold):
+        self.completions = completions
+        self.threshold = threshold
+        self.histogram = Histogram()
+        # count of delays above threshold
+        self.slow = 0
+        self.warned = 0.0
+
+    def record(self, stamp):
+        if self.completions.lag is not self:
+            # closed
+            return
+        lag = time.perf_counter_ns() - stamp
+        self.histogram.record(lag)
+        if self.threshold is None or lag <= self.threshold * 1e9:
+            return
+        self.slow += 1
+        now = time.monotonic()
+        # At most one warning per second
+        if now - self.warned >= 1:
+            self.warned = now
+            log.warning(
+                "event loop lag of %.3f seconds, %d results above %.3f seconds so far",
+                lag / 1e9,
+                self.slow,
+                self.threshold,
+            )
+
+    def close(self):
+        if self.completions.lag is self:
+            self.completions.lag = None
+
+
+def monitor_loop_lag(threshold=None):
+    """Record the event loop lag of the running loop, return the ``LoopLag``.
+
+    A warning is logged, at most once per second, when a delay is above
+    ``threshold`` seconds."""
+    completions = _completion_queue(asyncio.get_running_loop())
+    if completions.lag is None:
+        completions.lag = LoopLag(completions, threshold)
+    else:
+        completions.lag.threshold = threshold
+    return completions.lag
+
+
+# ---------------------------------------------------------------------------
+# Tracing
+#
+# Spans follow the model of OpenTelemetry, without depending on it: an
+# exporter receives each span when it starts and when it ends, see
+# found.ext.otel for the bridge to an OpenTelemetry tracer.  transactional
+# opens a span per attempt, which is the parent of the spans of get, query
+# batches and commit, and of the spans opened by the layers.  Without an
+# exporter, start_span returns None and the operations skip the tracing code.
+# ---------------------------------------------------------------------------
+
+
+class Span:
+    """A timed operation.  Times are ``time.time_ns()``, ``parent`` is the
+    enclosing span or None, ``context`` is free for the exporter."""
+
+    __slots__ = (
+        "name",
+        "parent",
+        "attributes",
+        "start_time",
+        "end_time",
+        "error",
+        "context",
+        "token",
+    )
+
+    def __init__(self, name, parent, attributes):
+        self.name = name
+        self.parent = parent
+        self.attributes = attributes
+        self.start_time = time.time_ns()
+        self.end_time = None
+        self.error = None
+        self.context = None
+        self.token = None
+
+
+class InMemoryExporter:
+    """Exporter that keeps the ended spans in the list ``spans``."""
+
+    def __init__(self):
+        self.spans = []
+
+    def on_start(self, span):
+        pass
+
+    def on_end(self, span):
+        self.spans.append(span)
+
+
+_exporter = None
+_current_span = contextvars.ContextVar("found_current_span", default=None)
+
+
+def set_span_exporter(exporter):
+    """Send spans to ``exporter``, an object with the methods ``on_start(span)``
+    and ``on_end(span)``; None disables tracing."""
+    global _exporter
+    _exporter = exporter
+    _update_instrumented()
+
+
+def start_span(name, attributes=None, current=False):
+    """Start a span, child of the current span, return None if tracing is
+    disabled.  With ``current=True`` it is the parent of the spans started
+    until it ends, which must happen in the same task: do not use it in
+    async generators."""
+    exporter = _exporter
+    if exporter is None:
+        return None
+    span = Span(name, _current_span.get(), dict(attributes or {}))
+    exporter.on_start(span)
+    if current:
+        span.token = _current_span.set(span)
+    return span
+
+
+def end_span(span, error=None):
+    """End ``span`` unless it is None or already ended."""
+    if span is None or span.end_time is not None:
+        return
+    span.end_time = time.time_ns()
+    span.error = error
+    if span.token is not None:
+        _current_span.reset(span.token)
+    exporter = _exporter
+    if exporter is not None:
+        exporter.on_end(span)
+
+
+# True when metrics or tracing are enabled.
+_instrumented = False
+
+
+def _update_instrumented():
+    global _instrumented
+    _instrumented = _metrics is not None or _exporter is not None
+
+
+def _observe_begin(operation):
+    span = None if _exporter is None else start_span("found." + operation)
+    return time.perf_counter_ns(), span
+
+
+def _observe_end(operation, state, size, error=None):
+    start, span = state
+    if _metrics is not None:
+        _metrics.record(operation, start, size)
+    if span is not None:
+        span.attributes["bytes"] = size
+        end_span(span, error)
+
+
+async def _observe(operation, state, aio_future, size):
+    try:
+        out = await aio_future
+    except BaseException as exc:
+        _observe_end(operation, state, 0, exc)
+        raise
+    _observe_end(operation, state, 0 if size is None else size(out))
+    return out
+
+
+def _value_size(value):
+    return 0 if value is None else len(value)
+
+
+def _batch_size(batch):
+    return sum(len(key) + len(value) for key, value in batch[0])
+
+
 # ---------------------------------------------------------------------------
 # Transaction
 # ---------------------------------------------------------------------------
@@ -345,7 +976,16 @@ Transaction = namedtuple("Transaction", ("pointer", "db", "snapshot", "vars"))
 
 Hooks = namedtuple("Hooks", ("on_begin", "on_commit", "on_post_commit"))
 
-TransactionStats = namedtuple("TransactionStats", ("retries", "elapsed", "commit_bytes"))
+TransactionStats = namedtuple(
+    "TransactionStats", ("retries", "elapsed", "commit_bytes", "conflicts"), defaults=((),)
+)
+
+
+def _commit_bytes(hooks):
+    # get_approximate_size is a round trip: it is skipped when no on_post_commit
+    # hook reads stats.commit_bytes, that is 0 then.  A hook that does not read
+    # it has the attribute commit_bytes set to False.
+    return any(getattr(hook, "commit_bytes", True) for hook in hooks.on_post_commit)
 
 
 def make_hooks():
@@ -358,11 +998,179 @@ def make_hooks():
     return Hooks(on_begin=[], on_commit=[], on_post_commit=[])
 
 
-def make_transaction(db, snapshot=False):
-    out = ffi.new("FDBTransaction **")
-    lib.fdb_database_create_transaction(db.pointer, out)
-    out = ffi.gc(out[0], lib.fdb_transaction_destroy)
-    return Transaction(out, db, snapshot, dict())
+def make_transaction(db, snapshot=False, cache=None):
+    if db.memory:
+        out = db.pointer.create_transaction()
+    else:
+        out = ffi.new("FDBTransaction **")
+        lib.fdb_database_create_transaction(db.pointer, out)
+        out = ffi.gc(out[0], lib.fdb_transaction_destroy)
+    variables = dict() if cache is None else {_VERSIONED_CACHE: cache}
+    return Transaction(out, db, snapshot, variables)
+
+
+# ---------------------------------------------------------------------------
+# Per-transaction read cache
+#
+# Layers tend to read the same keys several times inside one transaction.
+# The cache is opt-in, lives in tx.vars, hence it is dropped on retry together
+# with the read version it was filled at.  Reads through the cache still
+# observe the transaction's own writes: set, clear and atomic operations
+# invalidate the affected point reads, and every cached range read, since a
+# write anywhere may land inside one of them.
+# ---------------------------------------------------------------------------
+
+_READ_CACHE = "_found_read_cache"
+
+
+class ReadCache:
+    """Memoized ``get`` and small ``query`` results of one transaction.
+
+    ``hits`` and ``misses`` count the lookups, that is, the round trips saved
+    and paid.  Range reads of more than ``max_rows`` rows are not cached."""
+
+    __slots__ = ("max_rows", "values", "queries", "generation", "hits", "misses")
+
+    def __init__(self, max_rows=100):
+        self.max_rows = max_rows
+        self.values = {}
+        self.queries = {}
+        # Incremented on every write, so that a range read that was running
+        # during a write is not stored.
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def invalidate(self, key, other=None):
+        if other is None:
+            self.values.pop(key, None)
+        else:
+            for cached in [cached for cached in self.values if key <= cached < other]:
+                del self.values[cached]
+        self.queries.clear()
+        self.generation += 1
+
+    async def record(self, batches, key):
+        generation = self.generation
+        rows = []
+        async for kvs in batches:
+            if rows is not None:
+                rows.extend(kvs)
+                if len(rows) > self.max_rows:
+                    rows = None
+            yield kvs
+        if rows is not None and generation == self.generation:
+            self.queries[key] = rows
+
+
+def enable_read_cache(tx, max_rows=100):
+    """Cache the reads of ``tx`` until it is retried, return the ``ReadCache``."""
+    out = tx.vars.get(_READ_CACHE)
+    if out is None:
+        out = tx.vars[_READ_CACHE] = ReadCache(max_rows)
+    return out
+
+
+# ---------------------------------------------------------------------------
+# Versioned client cache
+#
+# A process-wide LRU of key -> value for hot rows that rarely change, shared
+# by the transactions opened with ``cache=``.  Each entry remembers the read
+# version it was observed at, and a newer observation never loses against an
+# older one.  An entry is served for ``max_staleness`` seconds, or with
+# ``watch=True`` until a watch on its key fires.  Served entries do not add
+# read conflict ranges: transactions using the cache accept stale reads.
+# Once a transaction wrote, its reads may return its own uncommitted writes:
+# they are not stored, otherwise other transactions would see them.
+# ---------------------------------------------------------------------------
+
+_VERSIONED_CACHE = "_found_versioned_cache"
+# Set in tx.vars by the first write of a transaction with a VersionedCache
+_VERSIONED_CACHE_WRITES = "_found_versioned_cache_writes"
+
+
+class VersionedCache:
+    """Process-wide LRU cache of the values read by ``found.get``."""
+
+    __slots__ = ("max_entries", "max_staleness", "watch", "entries", "watches", "hits", "misses")
+
+    def __init__(self, max_entries=10_000, max_staleness=1.0, watch=False):
+        self.max_entries = max_entries
+        self.max_staleness = max_staleness
+        self.watch = watch
+        # key -> (read version, monotonic time of the read, value)
+        self.entries = OrderedDict()
+        # key -> asyncio.Task waiting on the watch of key
+        self.watches = {}
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, key):
+        entry = self.entries.get(key)
+        if entry is not None and (
+            self.watch or time.monotonic() - entry[1] <= self.max_staleness
+        ):
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+        self.misses += 1
+        return None
+
+    def store(self, db, key, version, timestamp, value):
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] > version:
+            return
+        self.entries[key] = (version, timestamp, value)
+        self.entries.move_to_end(key)
+        if self.watch and key not in self.watches:
+            self.watches[key] = asyncio.ensure_future(self._watch(db, key, value))
+        while len(self.entries) > self.max_entries:
+            oldest, _ = self.entries.popitem(last=False)
+            self._unwatch(oldest)
+
+    def invalidate(self, key, other=None):
+        if other is None:
+            keys = [key] if key in self.entries else []
+        else:
+            keys = [cached for cached in self.entries if key <= cached < other]
+        for cached in keys:
+            del self.entries[cached]
+            self._unwatch(cached)
+
+    def clear(self):
+        self.invalidate(b"", b"\xff\xff")
+
+    def _unwatch(self, key):
+        task = self.watches.pop(key, None)
+        if task is not None:
+            task.cancel()
+
+    async def _watch(self, db, key, value):
+        task = asyncio.current_task()
+        try:
+            tx = make_transaction(db)
+            # The watch fires on changes after its own read version, check
+            # that nothing changed in between.
+            if await get(tx, key) == value:
+                changed = await watch(tx, key)
+                await commit(tx)
+                await changed
+        except FoundException:
+            pass
+        finally:
+            if self.watches.get(key) is task:
+                del self.watches[key]
+                self.entries.pop(key, None)
+
+
+def _invalidate(tx, key, other=None):
+    cache = tx.vars.get(_READ_CACHE)
+    if cache is not None:
+        cache.invalidate(key, other)
+    shared = tx.vars.get(_VERSIONED_CACHE)
+    if shared is not None:
+        shared.invalidate(key, other)
+        tx.vars[_VERSIONED_CACHE_WRITES] = True
 
 
 # ---------------------------------------------------------------------------
@@ -375,22 +1183,125 @@ def make_transaction(db, snapshot=False):
 
 async def read_version(tx):
     loop = asyncio.get_running_loop()
+    if tx.db.memory:
+        return await _memory_future(loop, tx.pointer.get_read_version)
     fdb_future = lib.fdb_transaction_get_read_version(tx.pointer)
     aio_future = loop.create_future()
-    _register_callback(fdb_future, _cb_int64, loop, aio_future)
+    _register_callback(fdb_future, _RESULT_INT64, loop, aio_future)
+    return await aio_future
+
+
+# CHANGE: ready futures.  Reads answered by the read-your-writes cache of the
+# client, e.g. a key the transaction just wrote, are ready as soon as they are
+# issued.  get, get_key and the batches of query check fdb_future_is_ready
+# first, and read such a result inline, without an asyncio future, a slot and
+# a round trip through the network thread and the completion queue.
+
+
+async def _get(tx, key):
+    loop = asyncio.get_running_loop()
+    if tx.db.memory:
+        return await _memory_future(loop, tx.pointer.get, key, tx.snapshot)
+    fdb_future = lib.fdb_transaction_get(tx.pointer, key, len(key), tx.snapshot)
+    if lib.fdb_future_is_ready(fdb_future):
+        return _read_ready(fdb_future, _RESULT_VALUE)
+    aio_future = loop.create_future()
+    _register_callback(fdb_future, _RESULT_VALUE, loop, aio_future)
     return await aio_future
 
 
 async def get(tx, key):
     assert isinstance(tx, Transaction)
     assert isinstance(key, bytes)
+    if tx.vars or _instrumented:
+        return await _get_slow(tx, key)
+    return await _get(tx, key)
+
+
+async def _get_slow(tx, key):
+    cache = tx.vars.get(_READ_CACHE)
+    if cache is not None:
+        try:
+            out = cache.values[key]
+        except KeyError:
+            cache.misses += 1
+        else:
+            cache.hits += 1
+            return out
+        generation = cache.generation
+    shared = tx.vars.get(_VERSIONED_CACHE)
+    entry = None if shared is None else shared.lookup(key)
+    if entry is not None:
+        out = entry[2]
+    else:
+        timestamp = time.monotonic()
+        if _instrumented:
+            state = _observe_begin("get")
+            out = await _observe("get", state, _get(tx, key), _value_size)
+        else:
+            out = await _get(tx, key)
+        if shared is not None and _VERSIONED_CACHE_WRITES not in tx.vars:
+            shared.store(tx.db, key, await read_version(tx), timestamp, out)
+    if cache is not None and generation == cache.generation:
+        cache.values[key] = out
+    return out
+
+
+# CHANGE: get_many.  A fan-out of N reads through get and asyncio.gather costs
+# N coroutines, N tasks, N asyncio futures and N slots.  get_many
+# issues the N fdb_transaction_get back to back with a single slot, the
+# callbacks write into one shared list, and the last one resolves the single
+# asyncio future.  The first error, if any, is raised once every read is
+# done, so that no fdb future outlives the call.
+
+
+async def get_many(tx, keys):
+    """Return the values of ``keys``, in the same order, ``None`` for missing keys."""
+    assert isinstance(tx, Transaction)
+    keys = list(keys)
+    assert all(isinstance(key, bytes) for key in keys)
+    cache = tx.vars.get(_READ_CACHE)
+    if cache is not None:
+        return await _get_many_cached(tx, cache, keys)
+    return await _get_many(tx, keys)
+
+
+async def _get_many(tx, keys):
+    if not keys:
+        return []
     loop = asyncio.get_running_loop()
-    fdb_future = lib.fdb_transaction_get(tx.pointer, key, len(key), tx.snapshot)
+    if tx.db.memory:
+        return await _memory_future(loop, _memory_get_many, tx, keys)
     aio_future = loop.create_future()
-    _register_callback(fdb_future, _cb_get, loop, aio_future)
+    batch = _GetMany(_completion_queue(loop), aio_future, len(keys))
+    # The slot is freed by the last callback
+    param = _put_slot(batch)
+    pointer = tx.pointer
+    snapshot = tx.snapshot
+    indices = batch.indices
+    for index, key in enumerate(keys):
+        fdb_future = lib.fdb_transaction_get(pointer, key, len(key), snapshot)
+        indices[int(ffi.cast("uintptr_t", fdb_future))] = index
+        lib.fdb_future_set_callback(fdb_future, _cb_get_many, param)
     return await aio_future
 
 
+async def _get_many_cached(tx, cache, keys):
+    values = cache.values
+    missing = [key for key in keys if key not in values]
+    cache.misses += len(missing)
+    cache.hits += len(keys) - len(missing)
+    if not missing:
+        return [values[key] for key in keys]
+    known = {key: values[key] for key in keys if key in values}
+    generation = cache.generation
+    fetched = await _get_many(tx, missing)
+    if generation == cache.generation:
+        values.update(zip(missing, fetched))
+    known.update(zip(missing, fetched))
+    return [known[key] for key in keys]
+
+
 # ---------------------------------------------------------------------------
 # Key selectors
 # ---------------------------------------------------------------------------
@@ -424,8 +1335,109 @@ def gte(key, offset=1):
 # ---------------------------------------------------------------------------
 
 
-async def query(tx, key, other, *, limit=0, reverse=None, mode=STREAMING_MODE_ITERATOR):
+async def _get_range(tx, begin, end, limit, mode, iteration, reverse, kind):
     loop = asyncio.get_running_loop()
+    if tx.db.memory:
+        return await _memory_future(
+            loop, _memory_get_range, tx, begin, end, limit, mode, iteration, reverse, kind
+        )
+    fdb_future = lib.fdb_transaction_get_range(
+        tx.pointer,
+        begin.key,
+        len(begin.key),
+        begin.or_equal,
+        begin.offset,
+        end.key,
+        len(end.key),
+        end.or_equal,
+        end.offset,
+        limit,
+        0,
+        mode,
+        iteration,
+        tx.snapshot,
+        reverse,
+    )
+    if lib.fdb_future_is_ready(fdb_future):
+        return _read_ready(fdb_future, kind)
+    aio_future = loop.create_future()
+    _register_callback(fdb_future, kind, loop, aio_future)
+    return await aio_future
+
+
+async def _get_range_batch(tx, begin, end, limit, mode, iteration, reverse, kind):
+    args = (tx, begin, end, limit, mode, iteration, reverse, kind)
+    if not _instrumented:
+        return await _get_range(*args)
+    return await _observe("query", _observe_begin("query"), _get_range(*args), _batch_size)
+
+
+async def _query_batches(tx, begin, end, limit, reverse, mode, kind):
+    """Generate the batches of a range read, one fdb_transaction_get_range each."""
+    iteration = 1
+    while True:
+        kvs, count, more = await _get_range_batch(
+            tx, begin, end, limit, mode, iteration, reverse, kind
+        )
+        if count == 0:
+            return
+        yield kvs
+        if not more or limit == count:
+            return
+        iteration += 1
+        if limit > 0:
+            limit -= count
+        last = bytes(kvs[-1][0])
+        if reverse:
+            end = gte(last)
+        else:
+            begin = gt(last)
+
+
+# CHANGE: read-ahead.  The selector of the next batch depends on the last key
+# of the previous one, so batches cannot be requested in parallel; what can
+# overlap is the network round-trip with the consumer.  With prefetch=N a task
+# requests the next batch as soon as the previous one arrived, and parks the
+# batches in a queue until the consumer gets to them.  A slot of a semaphore
+# of N is taken before a batch is requested, and given back when the consumer
+# takes the batch out of the queue: at most N batches are requested or parked
+# ahead of the one that is consumed.  The ``iteration`` ramp-up and ``limit``
+# are handled by _query_batches exactly as without read-ahead.
+
+
+async def _prefetch_batches(batches, queue, slots):
+    try:
+        await slots.acquire()
+        async for kvs in batches:
+            queue.put_nowait(kvs)
+            await slots.acquire()
+    except Exception as exc:
+        # Handed over to the consumer, in order, after the batches before it.
+        queue.put_nowait(exc)
+    else:
+        queue.put_nowait(None)
+
+
+async def query(
+    tx,
+    key,
+    other,
+    *,
+    limit=0,
+    reverse=None,
+    mode=STREAMING_MODE_ITERATOR,
+    zero_copy=False,
+    prefetch=0,
+):
+    """Generate the key-value pairs in the range between ``key`` and ``other``.
+
+    With ``zero_copy=True`` keys and values are read-only ``memoryview`` slices
+    of one arena per batch instead of ``bytes``; convert them with ``bytes()``
+    to keep them beyond the iteration.
+
+    With ``prefetch=N`` the next batch is requested while the current one is
+    consumed, and up to N batches are read ahead of the consumer."""
+    kind = _RESULT_KEYVALUES_ZERO_COPY if zero_copy else _RESULT_KEYVALUES
 
     key = key if isinstance(key, KeySelector) else gte(key)
     other = other if isinstance(other, KeySelector) else gte(other)
@@ -442,47 +1454,43 @@ async def query(tx, key, other, *, limit=0, reverse=None, mode=STREAMING_MODE_IT
         # Explicit reverse: pass key selectors through unchanged
         begin, end = key, other
 
-    iteration = 1
-    snapshot = tx.snapshot
-
-    while True:
-        fdb_future = lib.fdb_transaction_get_range(
-            tx.pointer,
-            begin.key,
-            len(begin.key),
-            begin.or_equal,
-            begin.offset,
-            end.key,
-            len(end.key),
-            end.or_equal,
-            end.offset,
-            limit,
-            0,
-            mode,
-            iteration,
-            snapshot,
-            reverse,
-        )
-        aio_future = loop.create_future()
-        _register_callback(fdb_future, _cb_get_range, loop, aio_future)
-        kvs, count, more = await aio_future
+    batches = _query_batches(tx, begin, end, limit, reverse, mode, kind)
 
-        if count == 0:
+    cache = None if zero_copy else tx.vars.get(_READ_CACHE)
+    if cache is not None:
+        cache_key = (begin, end, limit, reverse)
+        try:
+            rows = cache.queries[cache_key]
+        except KeyError:
+            cache.misses += 1
+            batches = cache.record(batches, cache_key)
+        else:
+            cache.hits += 1
+            for kv in rows:
+                yield kv
             return
 
-        for i, kv in enumerate(kvs):
-            yield kv
+    if prefetch <= 0:
+        async for kvs in batches:
+            for kv in kvs:
+                yield kv
+        return
 
-            if i == count - 1:
-                if not more or limit == count:
-                    return
-                iteration += 1
-                if limit > 0:
-                    limit -= count
-                if reverse:
-                    end = gte(kv[0])
-                else:
-                    begin = gt(kv[0])
+    queue = asyncio.Queue()
+    slots = asyncio.Semaphore(prefetch)
+    producer = asyncio.ensure_future(_prefetch_batches(batches, queue, slots))
+    try:
+        while True:
+            kvs = await queue.get()
+            slots.release()
+            if kvs is None:
+                return
+            if isinstance(kvs, Exception):
+                raise kvs
+            for kv in kvs:
+                yield kv
+    finally:
+        producer.cancel()
 
 
 # ---------------------------------------------------------------------------
@@ -492,11 +1500,13 @@ async def query(tx, key, other, *, limit=0, reverse=None, mode=STREAMING_MODE_IT
 
 async def estimated_size_bytes(tx, begin, end):
     loop = asyncio.get_running_loop()
+    if tx.db.memory:
+        return await _memory_future(loop, tx.pointer.estimated_size_bytes, begin, end)
     fdb_future = lib.fdb_transaction_get_estimated_range_size_bytes(
         tx.pointer, begin, len(begin), end, len(end)
     )
     aio_future = loop.create_future()
-    _register_callback(fdb_future, _cb_int64, loop, aio_future)
+    _register_callback(fdb_future, _RESULT_INT64, loop, aio_future)
     return await aio_future
 
 
@@ -506,7 +1516,10 @@ async def estimated_size_bytes(tx, begin, end):
 
 
 async def set_read_version(tx, version):
-    lib.fdb_transaction_set_read_version(tx.pointer, version)
+    if tx.db.memory:
+        tx.pointer.set_read_version(version)
+    else:
+        lib.fdb_transaction_set_read_version(tx.pointer, version)
 
 
 async def set(tx, key, value):
@@ -514,17 +1527,32 @@ async def set(tx, key, value):
     assert isinstance(key, bytes)
     assert isinstance(value, bytes)
     assert not tx.snapshot
-    lib.fdb_transaction_set(tx.pointer, key, len(key), value, len(value))
+    if tx.db.memory:
+        tx.pointer.set(key, value)
+    else:
+        lib.fdb_transaction_set(tx.pointer, key, len(key), value, len(value))
+    _invalidate(tx, key)
+    if _metrics is not None:
+        _metrics.count("write", len(key) + len(value))
 
 
 async def clear(tx, key, other=None):
     assert isinstance(tx, Transaction)
     assert isinstance(key, bytes)
-    if other is None:
+    if other is not None:
+        assert isinstance(other, bytes)
+    if tx.db.memory:
+        if other is None:
+            tx.pointer.clear(key)
+        else:
+            tx.pointer.clear_range(key, other)
+    elif other is None:
         lib.fdb_transaction_clear(tx.pointer, key, len(key))
     else:
-        assert isinstance(other, bytes)
         lib.fdb_transaction_clear_range(tx.pointer, key, len(key), other, len(other))
+    _invalidate(tx, key, other)
+    if _metrics is not None:
+        _metrics.count("write", len(key) + (0 if other is None else len(other)))
 
 
 # ---------------------------------------------------------------------------
@@ -546,7 +1574,13 @@ MUTATION_COMPARE_AND_CLEAR = 20
 
 
 def _atomic(tx, opcode, key, param):
-    lib.fdb_transaction_atomic_op(tx.pointer, key, len(key), param, len(param), opcode)
+    if tx.db.memory:
+        tx.pointer.atomic_op(key, param, opcode)
+    else:
+        lib.fdb_transaction_atomic_op(tx.pointer, key, len(key), param, len(param), opcode)
+    _invalidate(tx, key)
+    if _metrics is not None:
+        _metrics.count("write", len(key) + len(param))
 
 
 async def add(tx, key, param):
@@ -605,34 +1639,56 @@ async def set_versionstamped_value(tx, key, param):
 async def commit(tx):
     """Commit the transaction, waiting for FDB to confirm durability."""
     loop = asyncio.get_running_loop()
-    fdb_future = lib.fdb_transaction_commit(tx.pointer)
-    aio_future = loop.create_future()
-    _register_callback(fdb_future, _cb_watch, loop, aio_future)
-    await aio_future
+    state = _observe_begin("commit") if _instrumented else None
+    if tx.db.memory:
+        aio_future = _memory_future(loop, tx.pointer.commit)
+    else:
+        fdb_future = lib.fdb_transaction_commit(tx.pointer)
+        aio_future = loop.create_future()
+        _register_callback(fdb_future, _RESULT_NONE, loop, aio_future)
+    if state is None:
+        await aio_future
+    else:
+        await _observe("commit", state, aio_future, None)
 
 
 async def on_error(tx, code):
     """Wraps fdb_transaction_on_error. Returns when the transaction can be retried,
     or raises if the error is not retryable."""
     loop = asyncio.get_running_loop()
-    fdb_future = lib.fdb_transaction_on_error(tx.pointer, code)
-    aio_future = loop.create_future()
-    _register_callback(fdb_future, _cb_error, loop, aio_future)
-    await aio_future
+    state = _observe_begin("on_error") if _instrumented else None
+    if tx.db.memory:
+        aio_future = _memory_future(loop, tx.pointer.on_error, code)
+    else:
+        fdb_future = lib.fdb_transaction_on_error(tx.pointer, code)
+        aio_future = loop.create_future()
+        _register_callback(fdb_future, _RESULT_NONE, loop, aio_future)
+    if state is None:
+        await aio_future
+    else:
+        await _observe("on_error", state, aio_future, None)
 
 
 def reset(tx):
     """Wraps fdb_transaction_reset (synchronous)."""
-    lib.fdb_transaction_reset(tx.pointer)
+    if tx.db.memory:
+        tx.pointer.reset()
+    else:
+        lib.fdb_transaction_reset(tx.pointer)
 
 
 def cancel(tx):
     """Wraps fdb_transaction_cancel (synchronous)."""
-    lib.fdb_transaction_cancel(tx.pointer)
+    if tx.db.memory:
+        tx.pointer.cancel()
+    else:
+        lib.fdb_transaction_cancel(tx.pointer)
 
 
 def get_committed_version(tx):
     """Wraps fdb_transaction_get_committed_version (synchronous, returns int64)."""
+    if tx.db.memory:
+        return tx.pointer.get_committed_version()
     version = ffi.new("int64_t *")
     _check(lib.fdb_transaction_get_committed_version(tx.pointer, version))
     return version[0]
@@ -641,9 +1697,11 @@ def get_committed_version(tx):
 async def get_approximate_size(tx):
     """Wraps fdb_transaction_get_approximate_size (async future -> int64)."""
     loop = asyncio.get_running_loop()
+    if tx.db.memory:
+        return await _memory_future(loop, tx.pointer.get_approximate_size)
     fdb_future = lib.fdb_transaction_get_approximate_size(tx.pointer)
     aio_future = loop.create_future()
-    _register_callback(fdb_future, _cb_int64, loop, aio_future)
+    _register_callback(fdb_future, _RESULT_INT64, loop, aio_future)
     return await aio_future
 
 
@@ -651,15 +1709,19 @@ async def get_versionstamp(tx):
     """Wraps fdb_transaction_get_versionstamp (async future -> key bytes).
     Must be called after commit."""
     loop = asyncio.get_running_loop()
+    if tx.db.memory:
+        return await _memory_future(loop, tx.pointer.get_versionstamp)
     fdb_future = lib.fdb_transaction_get_versionstamp(tx.pointer)
     aio_future = loop.create_future()
-    _register_callback(fdb_future, _cb_get_key, loop, aio_future)
+    _register_callback(fdb_future, _RESULT_KEY, loop, aio_future)
     return await aio_future
 
 
 async def get_key(tx, key_selector):
     """Wraps fdb_transaction_get_key (async future -> key bytes)."""
     loop = asyncio.get_running_loop()
+    if tx.db.memory:
+        return await _memory_future(loop, tx.pointer.get_key, *key_selector, tx.snapshot)
     fdb_future = lib.fdb_transaction_get_key(
         tx.pointer,
         key_selector.key,
@@ -668,13 +1730,18 @@ async def get_key(tx, key_selector):
         key_selector.offset,
         tx.snapshot,
     )
+    if lib.fdb_future_is_ready(fdb_future):
+        return _read_ready(fdb_future, _RESULT_KEY)
     aio_future = loop.create_future()
-    _register_callback(fdb_future, _cb_get_key, loop, aio_future)
+    _register_callback(fdb_future, _RESULT_KEY, loop, aio_future)
     return await aio_future
 
 
 def add_conflict_range(tx, begin, end, conflict_type):
     """Wraps fdb_transaction_add_conflict_range (synchronous)."""
+    if tx.db.memory:
+        tx.pointer.add_conflict_range(begin, end, conflict_type)
+        return
     _check(
         lib.fdb_transaction_add_conflict_range(
             tx.pointer, begin, len(begin), end, len(end), conflict_type
@@ -684,6 +1751,9 @@ def add_conflict_range(tx, begin, end, conflict_type):
 
 def set_option(tx, option, value=None):
     """Wraps fdb_transaction_set_option."""
+    if tx.db.memory:
+        tx.pointer.set_option(option, value)
+        return
     if value is None:
         _check(lib.fdb_transaction_set_option(tx.pointer, option, ffi.NULL, 0))
     else:
@@ -701,14 +1771,79 @@ async def get_range_split_points(tx, begin, end, chunk_size):
     Returns a list of bytes keys that divide the range [begin, end) into
     chunks of approximately chunk_size bytes each."""
     loop = asyncio.get_running_loop()
+    if tx.db.memory:
+        return await _memory_future(loop, tx.pointer.get_range_split_points, begin, end, chunk_size)
     fdb_future = lib.fdb_transaction_get_range_split_points(
         tx.pointer, begin, len(begin), end, len(end), chunk_size
     )
     aio_future = loop.create_future()
-    _register_callback(fdb_future, _cb_get_key_array, loop, aio_future)
+    _register_callback(fdb_future, _RESULT_KEY_ARRAY, loop, aio_future)
     return await aio_future
 
 
+# ---------------------------------------------------------------------------
+# Parallel range query
+# ---------------------------------------------------------------------------
+
+
+async def _query_shard(tx, begin, end, mode):
+    return [kv async for kv in query(tx, begin, end, reverse=False, mode=mode)]
+
+
+async def parallel_query(
+    tx, begin, end, chunk_size, concurrency, *, ordered=True, mode=STREAMING_MODE_WANT_ALL
+):
+    """Generate the key-value pairs in [begin, end), reading shards concurrently.
+
+    The range is split with get_range_split_points into shards of about
+    chunk_size bytes, and at most ``concurrency`` shards are read, or held in
+    memory until their pairs are consumed, at the same time.  With
+    ``ordered=True`` pairs are generated in key order; otherwise each shard is
+    generated as soon as it is read, in no particular order."""
+    assert isinstance(begin, bytes)
+    assert isinstance(end, bytes)
+    assert concurrency > 0
+    points = await get_range_split_points(tx, begin, end, chunk_size)
+    bounds = [begin] + [point for point in points if begin < point < end] + [end]
+    # Duplicate split points make empty shards
+    shards = iter([(lo, hi) for lo, hi in zip(bounds, bounds[1:]) if lo < hi])
+
+    def spawn():
+        try:
+            shard_begin, shard_end = next(shards)
+        except StopIteration:
+            return None
+        return asyncio.ensure_future(_query_shard(tx, shard_begin, shard_end, mode))
+
+    pending = deque()
+    try:
+        for _ in range(concurrency):
+            task = spawn()
+            if task is None:
+                break
+            pending.append(task)
+
+        while pending:
+            if ordered:
+                done = [pending.popleft()]
+                await done[0]
+            else:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    pending.remove(task)
+            for task in done:
+                for kv in task.result():
+                    yield kv
+                # The next shard is read once the pairs of this one are
+                # consumed, so that at most concurrency shards are held
+                task = spawn()
+                if task is not None:
+                    pending.append(task)
+    finally:
+        for task in pending:
+            task.cancel()
+
+
 async def watch(tx, key):
     """Wraps fdb_transaction_watch.
 
@@ -727,9 +1862,11 @@ async def watch(tx, key):
     key must be bytes."""
     assert isinstance(key, bytes)
     loop = asyncio.get_running_loop()
+    if tx.db.memory:
+        return tx.pointer.watch(loop, key)
     fdb_future = lib.fdb_transaction_watch(tx.pointer, key, len(key))
     aio_future = loop.create_future()
-    _register_callback(fdb_future, _cb_watch, loop, aio_future)
+    _register_callback(fdb_future, _RESULT_NONE, loop, aio_future)
     return aio_future
 
 
@@ -737,53 +1874,149 @@ async def get_addresses_for_key(tx, key):
     """Wraps fdb_transaction_get_addresses_for_key (async future -> list of strings)."""
     assert isinstance(key, bytes)
     loop = asyncio.get_running_loop()
+    if tx.db.memory:
+        return await _memory_future(loop, tx.pointer.get_addresses_for_key, key)
     fdb_future = lib.fdb_transaction_get_addresses_for_key(tx.pointer, key, len(key))
     aio_future = loop.create_future()
-    _register_callback(fdb_future, _cb_get_string_array, loop, aio_future)
+    _register_callback(fdb_future, _RESULT_STRING_ARRAY, loop, aio_future)
     return await aio_future
 
 
-async def transactional(db, func, *args, snapshot=False, **kwargs):
-    loop = asyncio.get_running_loop()
-    tx = make_transaction(db, snapshot)
+# CHANGE: retry budget.  on_error only ever gives up on errors that are not
+# retryable, so a hot conflicting key could spin a coroutine forever.
+# ``retry_limit`` caps the number of retries, and ``deadline`` the total time
+# in seconds: it is also handed to FDB as the timeout option, so that a read
+# that hangs fails with transaction_timed_out (1031) instead of waiting past
+# the deadline.  Both raise RetryBudgetExhausted.  ``backoff`` adds a random
+# delay, up to ``backoff * 2 ** retries`` seconds capped at ``max_backoff``,
+# on top of the delay of on_error, to spread the retries of contending
+# clients.
+
+_TRANSACTION_OPTION_TIMEOUT = 500
+_ERROR_TRANSACTION_TIMED_OUT = 1031
+
+# CHANGE: conflict diagnostics.  With ``report_conflicting_keys=True`` every
+# attempt sets the REPORT_CONFLICTING_KEYS option, and after a not_committed
+# error the read ranges that conflicted are read from the special key space,
+# before on_error resets the transaction.  They are accumulated over the
+# attempts in TransactionStats.conflicts as (begin, end) pairs.  When that read
+# fails, the conflicts of the attempt are not reported.
+
+_TRANSACTION_OPTION_REPORT_CONFLICTING_KEYS = 712
+_ERROR_NOT_COMMITTED = 1020
+_CONFLICTING_KEYS = b"\xff\xff/transaction/conflicting_keys/"
+
+
+async def _conflicting_keys(tx):
+    # The special keys come in pairs: the begin of a conflicting range has
+    # the value b"1", its end the value b"0".
+    out = []
+    begin = None
+    async for key, value in query(tx, _CONFLICTING_KEYS, _CONFLICTING_KEYS + b"\xff"):
+        key = key[len(_CONFLICTING_KEYS) :]
+        if value == b"1":
+            begin = key
+        elif begin is not None:
+            out.append((begin, key))
+            begin = None
+    return out
+
+
+async def transactional(
+    db,
+    func,
+    *args,
+    snapshot=False,
+    cache=None,
+    retry_limit=None,
+    deadline=None,
+    backoff=0.0,
+    max_backoff=1.0,
+    report_conflicting_keys=False,
+    **kwargs,
+):
+    tx = make_transaction(db, snapshot, cache)
     retries = 0
     start = time.monotonic()
+    conflicts = []
+
+    if deadline is not None:
+        timeout = builtins.max(1, int(deadline * 1000))
+        set_option(tx, _TRANSACTION_OPTION_TIMEOUT, struct.pack("<q", timeout))
+
+    if report_conflicting_keys:
+        set_option(tx, _TRANSACTION_OPTION_REPORT_CONFLICTING_KEYS)
 
     for hook in db.hooks.on_begin:
         await hook(tx)
 
     while True:
+        attempt = None
+        if _exporter is not None:
+            name = getattr(func, "__qualname__", repr(func))
+            attempt = start_span("found.transactional", dict(function=name, retry=retries), True)
         try:
             out = await func(tx, *args, **kwargs)
             for hook in db.hooks.on_commit:
                 await hook(tx)
-            commit_bytes = await get_approximate_size(tx) if db.hooks.on_post_commit else 0
+            commit_bytes = await get_approximate_size(tx) if _commit_bytes(db.hooks) else 0
             await commit(tx)
         except FoundException as exc:
-            fdb_future = lib.fdb_transaction_on_error(tx.pointer, exc.code)
-            aio_future = loop.create_future()
-            _register_callback(fdb_future, _cb_error, loop, aio_future)
-            await aio_future  # raises if not retryable
+            end_span(attempt, exc)
+            if exc.code == _ERROR_NOT_COMMITTED and report_conflicting_keys:
+                try:
+                    conflicts.extend(await _conflicting_keys(tx))
+                except FoundException:
+                    # Best effort: on_error must still run with the code of
+                    # the commit, e.g. when the read of the special keys
+                    # times out.
+                    pass
+            if exc.code == _ERROR_TRANSACTION_TIMED_OUT and deadline is not None:
+                stats = TransactionStats(retries, time.monotonic() - start, 0, tuple(conflicts))
+                raise RetryBudgetExhausted(exc.code, stats) from exc
+            await on_error(tx, exc.code)  # raises if not retryable
+            # The budget is checked before the backoff, that does not wait
+            # past the deadline.
+            elapsed = time.monotonic() - start
+            if (retry_limit is not None and retries >= retry_limit) or (
+                deadline is not None and elapsed >= deadline
+            ):
+                stats = TransactionStats(retries, elapsed, 0, tuple(conflicts))
+                raise RetryBudgetExhausted(exc.code, stats) from exc
+            if backoff > 0:
+                delay = builtins.min(max_backoff, backoff * 2**retries)
+                if deadline is not None:
+                    delay = builtins.min(delay, deadline - elapsed)
+                await asyncio.sleep(random.uniform(0, delay))
             retries += 1
             tx.vars.clear()
+            if cache is not None:
+                tx.vars[_VERSIONED_CACHE] = cache
+            if report_conflicting_keys:
+                set_option(tx, _TRANSACTION_OPTION_REPORT_CONFLICTING_KEYS)
             for hook in db.hooks.on_begin:
                 await hook(tx)
+        except BaseException as exc:
+            end_span(attempt, exc)
+            raise
         else:
-            stats = TransactionStats(retries, time.monotonic() - start, commit_bytes)
+            end_span(attempt)
+            elapsed = time.monotonic() - start
+            stats = TransactionStats(retries, elapsed, commit_bytes, tuple(conflicts))
             for hook in db.hooks.on_post_commit:
                 await hook(tx, stats)
             return out
 
 
 @asynccontextmanager
-async def transaction(db, snapshot=False):
+async def transaction(db, snapshot=False, cache=None):
     """Non-retrying async context manager for a single transaction.
 
     On clean exit the transaction is committed. On exception it is re-raised
     without committing (FDB destroys the transaction automatically). The caller
     is responsible for retry logic if needed.
     """
-    tx = make_transaction(db, snapshot)
+    tx = make_transaction(db, snapshot, cache)
     start = time.monotonic()
     for hook in db.hooks.on_begin:
         await hook(tx)
@@ -791,7 +2024,7 @@ async def transaction(db, snapshot=False):
         yield tx
         for hook in db.hooks.on_commit:
             await hook(tx)
-        commit_bytes = await get_approximate_size(tx) if db.hooks.on_post_commit else 0
+        commit_bytes = await get_approximate_size(tx) if _commit_bytes(db.hooks) else 0
         await commit(tx)
     except BaseException:
         raise
@@ -801,14 +2034,115 @@ async def transaction(db, snapshot=False):
             await hook(tx, stats)
 
 
+# ---------------------------------------------------------------------------
+# Batch writer
+#
+# A transaction per blind write costs a GetReadVersion and a commit round
+# trip each.  BatchWriter queues the blind writes of many coroutines for at
+# most ``max_delay`` seconds, or until ``max_batch_bytes`` is reached, then
+# applies the whole batch in one transaction.  Blind writes do not read, so
+# they do not conflict: the batch only retries on errors such as a lost
+# connection, and every caller of the batch learns the outcome of the commit.
+# ---------------------------------------------------------------------------
+
+
+class BatchWriter:
+    """Coalesce blind writes of many coroutines into shared transactions.
+
+    ``max_batch_bytes`` must stay well under found.MAX_SIZE_TRANSACTION,
+    FDB recommends transactions of less than one megabyte."""
+
+    def __init__(self, db, max_batch_bytes=10**6, max_delay=0.005):
+        self.db = db
+        self.max_batch_bytes = max_batch_bytes
+        self.max_delay = max_delay
+        # (op, key, args, future) of the next batch
+        self.pending = []
+        self.size = 0
+        self.timer = None
+        # task -> None, the batches being committed
+        self.commits = {}
+
+    async def write(self, op, key, *args):
+        """Apply ``await op(tx, key, *args)`` in the next batch, and return
+        once the batch is durably committed.  ``op`` is ``found.set``,
+        ``found.clear`` or one of the atomic operations such as ``found.add``.
+
+        The versionstamp mutations are rejected: the writes of a batch share
+        its versionstamp, hence two of them could write the same key."""
+        if op is set_versionstamped_key or op is set_versionstamped_value:
+            raise ValueError("BatchWriter does not apply versionstamp mutations")
+        assert isinstance(key, bytes)
+        assert all(arg is None or isinstance(arg, bytes) for arg in args)
+        size = len(key) + sum(len(arg) for arg in args if arg is not None)
+        if self.pending and self.size + size > self.max_batch_bytes:
+            self._flush()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending.append((op, key, args, future))
+        self.size += size
+        if self.size >= self.max_batch_bytes:
+            self._flush()
+        elif self.timer is None:
+            self.timer = loop.call_later(self.max_delay, self._flush)
+        await future
+
+    async def flush(self):
+        """Commit the pending writes, and wait for every batch in flight."""
+        self._flush()
+        while self.commits:
+            await asyncio.wait(list(self.commits))
+
+    def _flush(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        if not self.pending:
+            return
+        batch = self.pending
+        self.pending = []
+        self.size = 0
+        task = asyncio.ensure_future(self._commit(batch))
+        self.commits[task] = None
+        task.add_done_callback(self.commits.pop)
+
+    async def _commit(self, batch):
+        async def apply(tx):
+            for op, key, args, _ in batch:
+                await op(tx, key, *args)
+
+        try:
+            await transactional(self.db, apply)
+        except Exception as exc:
+            for _, _, _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+        else:
+            for _, _, _, future in batch:
+                if not future.done():
+                    future.set_result(None)
+
+
 # ---------------------------------------------------------------------------
 # Database
 # ---------------------------------------------------------------------------
 
-Database = namedtuple("Database", ("pointer", "hooks"))
+Database = namedtuple("Database", ("pointer", "hooks", "memory"), defaults=(False,))
+
+
+async def open(cluster_file=None, backend=None):
+    """Return a Database for the cluster of ``cluster_file``.
 
+    With ``backend="memory"`` the database is a fresh in-memory stand-in for
+    a cluster, see found.memory; pass a ``found.memory.Store`` instead to
+    share the data of several databases."""
+    if backend is not None:
+        from found import memory
 
-async def open(cluster_file=None):
+        store = memory.Store() if backend == "memory" else backend
+        assert isinstance(store, memory.Store)
+        return Database(memory.Database(store), make_hooks(), True)
+    _load_fdb()
     _ensure_network()
     out = ffi.new("FDBDatabase **")
     cluster_file_c = (
@@ -823,6 +2157,81 @@ async def open(cluster_file=None):
     return Database(out, make_hooks())
 
 
+# ---------------------------------------------------------------------------
+# Read version cache
+#
+# Every transaction pays a GetReadVersion round trip before its first read.
+# Read-only pages that tolerate a little staleness can instead share a read
+# version: a task fetches one every ``interval`` seconds, and an on_begin hook
+# hands it to each snapshot transaction with fdb_transaction_set_read_version.
+# The on_post_commit hook moves the cached version forward to the versions
+# committed by this process, so that a page still shows the writes of the
+# request that preceded it.  A version older than ``max_age`` seconds, e.g.
+# when the refresh task is late, is not used: well within the five seconds
+# after which FDB rejects a read version as too old.
+# ---------------------------------------------------------------------------
+
+
+class ReadVersionCache:
+    """Read version shared by the snapshot transactions of ``db``."""
+
+    def __init__(self, db, interval, max_age):
+        self.db = db
+        self.interval = interval
+        self.max_age = max_age
+        self.version = None
+        self.timestamp = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.task = None
+
+    def update(self, version):
+        if self.version is None or version >= self.version:
+            self.version = version
+            self.timestamp = time.monotonic()
+
+    async def on_begin(self, tx):
+        if not tx.snapshot:
+            return
+        if self.version is None or time.monotonic() - self.timestamp > self.max_age:
+            self.misses += 1
+            return
+        self.hits += 1
+        await set_read_version(tx, self.version)
+
+    async def on_post_commit(self, tx, stats):
+        version = get_committed_version(tx)
+        if version > 0:
+            self.update(version)
+
+    on_post_commit.commit_bytes = False
+
+    async def refresh(self):
+        while True:
+            try:
+                self.update(await read_version(make_transaction(self.db)))
+            except FoundException:
+                # The cached version ages, and stops being used.
+                pass
+            await asyncio.sleep(self.interval)
+
+    def close(self):
+        self.task.cancel()
+        self.db.hooks.on_begin.remove(self.on_begin)
+        self.db.hooks.on_post_commit.remove(self.on_post_commit)
+
+
+def cache_read_version(db, interval=0.1, max_age=1.0):
+    """Share a read version, refreshed every ``interval`` seconds, between
+    the snapshot transactions of ``db``.  Return the ``ReadVersionCache``,
+    call its ``close`` method to stop."""
+    out = ReadVersionCache(db, interval, max_age)
+    db.hooks.on_begin.append(out.on_begin)
+    db.hooks.on_post_commit.append(out.on_post_commit)
+    out.task = asyncio.ensure_future(out.refresh())
+    return out
+
+
 # ---------------------------------------------------------------------------
 # Database options
 # ---------------------------------------------------------------------------
@@ -830,6 +2239,9 @@ async def open(cluster_file=None):
 
 def database_set_option(db, option, value=None):
     """Wraps fdb_database_set_option (synchronous)."""
+    if db.memory:
+        # There is nothing to tune without a cluster.
+        return
     if value is None:
         _check(lib.fdb_database_set_option(db.pointer, option, ffi.NULL, 0))
     else:
@@ -843,6 +2255,7 @@ def database_set_option(db, option, value=None):
 
 def network_set_option(option, value=None):
     """Wraps fdb_network_set_option (synchronous). Must be called before network start."""
+    _load_fdb()
     if value is None:
         _check(lib.fdb_network_set_option(option, ffi.NULL, 0))
     else:
@@ -853,22 +2266,18 @@ _completion_hooks = []
 _completion_hooks_lock = threading.Lock()
 
 
-@ffi.callback("void(void *)")
-def _completion_hook_trampoline(param):
+def _completion_hook(param):
     idx = ffi.cast("intptr_t", param)
     _completion_hooks[idx]()
 
 
 def add_network_thread_completion_hook(callback):
     """Register a callback to be invoked when the network thread exits."""
+    _load_fdb()
     with _completion_hooks_lock:
         idx = len(_completion_hooks)
         _completion_hooks.append(callback)
-    _check(
-        lib.fdb_add_network_thread_completion_hook(
-            _completion_hook_trampoline, ffi.cast("void *", idx)
-        )
-    )
+    _check(lib.fdb_add_network_thread_completion_hook(_cb_completion_hook, ffi.cast("void *", idx)))
 
 
 # ---------------------------------------------------------------------------
@@ -878,6 +2287,7 @@ def add_network_thread_completion_hook(callback):
 
 def get_client_version():
     """Return the FDB client library version string."""
+    _load_fdb()
     return ffi.string(lib.fdb_get_client_version()).decode("utf-8")
 
 
@@ -888,4 +2298,5 @@ ERROR_PREDICATE_RETRYABLE_NOT_COMMITTED = 50002
 
 def error_predicate(predicate, code):
     """Test whether an error code matches a predicate (retryable, maybe-committed, etc.)."""
+    _load_fdb()
     return bool(lib.fdb_error_predicate(predicate, code))
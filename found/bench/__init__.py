@@ -0,0 +1,194 @@
+"""Microbenchmarks of found and its extension stores.
+
+Run them against the cluster of the default cluster file, or in process
+against the in-memory backend:
+
+    python -m found.bench --backend memory --output results.json
+
+Each benchmark repeats rounds of operations, and reports the throughput, the
+mean time per operation, and the percentiles over the rounds of the mean
+time per operation of each round, as JSON.  Data
+is generated from a fixed seed, so that two runs do the same work, and two
+result files can be compared with ``--compare``.  Benchmarks only write
+below the ``("found.bench",)`` prefix, cleared before and after each run.
+"""
+
+#
+# This source file is part of the asyncio-foundationdb open source project
+#
+# Copyright 2026 Amirouche Boubekki <amirouche@hyper.dev>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import itertools
+import platform
+import random
+import time
+from collections import namedtuple
+
+import found
+
+PREFIX = ("found.bench",)
+
+# Keys of the flat prefix, e.g. nstore, and of the nested prefix, e.g. bstore
+_RANGES = (
+    (found.pack(PREFIX), found.next_prefix(found.pack(PREFIX))),
+    (found.pack((PREFIX,))[:-1], found.next_prefix(found.pack((PREFIX,))[:-1])),
+)
+
+PERCENTILES = (50, 90, 99)
+
+SEED = 42
+
+Benchmark = namedtuple("Benchmark", ("name", "func", "params"))
+
+# Registered with @benchmark, in order
+BENCHMARKS = []
+
+
+def benchmark(name, **grid):
+    """Register ``func`` as the benchmark ``name``, once per combination of
+    the values of ``grid``.
+
+    ``await func(db, rng, **params)`` prepares the data, and returns a
+    coroutine function that runs one round and returns its count of
+    operations, or ``None`` to skip the benchmark, e.g. when it does not
+    apply to the backend."""
+
+    def decorator(func):
+        keys = sorted(grid)
+        for values in itertools.product(*(grid[key] for key in keys)):
+            BENCHMARKS.append(Benchmark(name, func, dict(zip(keys, values))))
+        return func
+
+    return decorator
+
+
+def label(name, params):
+    """Return the label of a benchmark, e.g. ``get[concurrency=16]``."""
+    if not params:
+        return name
+    return "{}[{}]".format(name, ",".join("{}={}".format(k, v) for k, v in params.items()))
+
+
+async def clear(db):
+    async def func(tx):
+        for begin, end in _RANGES:
+            await found.clear(tx, begin, end)
+
+    await found.transactional(db, func)
+
+
+def percentile(samples, percentile):
+    """Return the nearest-rank ``percentile`` of the sorted ``samples``."""
+    rank = max(1, -(-len(samples) * percentile // 100))
+    return samples[int(rank) - 1]
+
+
+async def measure(db, bench, rounds, warmup):
+    rng = random.Random(SEED)
+    step = await bench.func(db, rng, **bench.params)
+    if step is None:
+        return None
+    for _ in range(warmup):
+        await step()
+    # mean seconds per operation, of each round: the operations are not timed
+    # one by one, hence the percentiles are the percentiles of these means
+    samples = []
+    operations = 0
+    elapsed = 0
+    for _ in range(rounds):
+        start = time.perf_counter_ns()
+        count = await step()
+        duration = time.perf_counter_ns() - start
+        operations += count
+        elapsed += duration
+        samples.append(duration / count / 1e9)
+    samples.sort()
+    latency = dict(
+        mean=elapsed / operations / 1e9, round_mean_min=samples[0], round_mean_max=samples[-1]
+    )
+    for value in PERCENTILES:
+        latency["round_mean_p{}".format(value)] = percentile(samples, value)
+    return dict(
+        name=bench.name,
+        params=bench.params,
+        label=label(bench.name, bench.params),
+        rounds=rounds,
+        operations=operations,
+        ops_per_second=operations / (elapsed / 1e9),
+        latency=latency,
+    )
+
+
+def load():
+    """Import the modules that register the benchmarks."""
+    from found.bench import core, ext  # noqa: F401
+
+
+async def run(db, backend, rounds=20, warmup=3, filters=(), log=None):
+    """Run the benchmarks whose label contains one of ``filters``, or all of
+    them, and return the results as a dict."""
+    load()
+    results = []
+    for bench in BENCHMARKS:
+        name = label(bench.name, bench.params)
+        if filters and not any(text in name for text in filters):
+            continue
+        await clear(db)
+        try:
+            result = await measure(db, bench, rounds, warmup)
+        finally:
+            await clear(db)
+        if result is None:
+            continue
+        if log is not None:
+            log(summary(result))
+        results.append(result)
+    return dict(
+        version=".".join(str(x) for x in found.__VERSION__),
+        backend=backend,
+        python=platform.python_implementation() + " " + platform.python_version(),
+        machine=platform.machine(),
+        timestamp=time.time(),
+        rounds=rounds,
+        warmup=warmup,
+        results=results,
+    )
+
+
+def summary(result):
+    return "{:<40} {:>12.0f} ops/s  mean {:>10.2f}us  round p99 {:>10.2f}us".format(
+        result["label"],
+        result["ops_per_second"],
+        result["latency"]["mean"] * 1e6,
+        result["latency"]["round_mean_p99"] * 1e6,
+    )
+
+
+def compare(old, new):
+    """Return the lines of a report of the change of throughput between the
+    results ``old`` and ``new``, for the benchmarks in both."""
+    before = {result["label"]: result for result in old["results"]}
+    out = []
+    for result in new["results"]:
+        previous = before.get(result["label"])
+        if previous is None:
+            continue
+        ratio = result["ops_per_second"] / previous["ops_per_second"]
+        out.append(
+            "{:<40} {:>12.0f} -> {:>12.0f} ops/s  {:+.1%}".format(
+                result["label"], previous["ops_per_second"], result["ops_per_second"], ratio - 1
+            )
+        )
+    return out
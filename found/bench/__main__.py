@@ -0,0 +1,42 @@
+import argparse
+import asyncio
+import json
+import sys
+
+import found
+import found.bench
+
+
+async def main(args):
+    db = await found.open(args.cluster_file, backend="memory" if args.backend == "memory" else None)
+
+    def log(line):
+        print(line, file=sys.stderr)
+
+    out = await found.bench.run(db, args.backend, args.rounds, args.warmup, args.filter, log)
+    if args.output is None:
+        json.dump(out, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.output, "w") as f:
+            json.dump(out, f, indent=2)
+    if args.compare is not None:
+        with open(args.compare) as f:
+            old = json.load(f)
+        for line in found.bench.compare(old, out):
+            print(line, file=sys.stderr)
+
+
+parser = argparse.ArgumentParser(prog="python -m found.bench", description=found.bench.__doc__)
+parser.add_argument("--backend", choices=("fdb", "memory"), default="fdb")
+parser.add_argument("--cluster-file", default=None)
+parser.add_argument("--rounds", type=int, default=20)
+parser.add_argument("--warmup", type=int, default=3)
+parser.add_argument(
+    "--filter", action="append", default=[], help="run the benchmarks whose label contains FILTER"
+)
+parser.add_argument("--output", default=None, help="write the JSON results to OUTPUT")
+parser.add_argument("--compare", default=None, help="compare the throughput with a previous run")
+
+if __name__ == "__main__":
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,143 @@
+"""Benchmarks of the tuple layer, and of the reads of found.base."""
+
+import asyncio
+import threading
+from uuid import UUID
+
+import found
+import found.base
+from found.bench import PREFIX, benchmark
+
+_TUPLE = (
+    "found",
+    42,
+    -3.14,
+    b"\x00bytes\xff",
+    None,
+    True,
+    UUID(int=42),
+    ("nested", 7),
+)
+
+_ROWS = 10_000
+
+_MODES = dict(
+    want_all=found.STREAMING_MODE_WANT_ALL,
+    iterator=found.STREAMING_MODE_ITERATOR,
+    small=found.STREAMING_MODE_SMALL,
+    medium=found.STREAMING_MODE_MEDIUM,
+    large=found.STREAMING_MODE_LARGE,
+    serial=found.STREAMING_MODE_SERIAL,
+)
+
+
+async def _fill(db, rng, name, count, size):
+    """Write ``count`` keys ``PREFIX + (name, index)`` with values of ``size`` bytes."""
+
+    async def func(tx, start):
+        for index in range(start, min(start + 1000, count)):
+            await found.set(tx, found.pack(PREFIX + (name, index)), rng.randbytes(size))
+
+    for start in range(0, count, 1000):
+        await found.transactional(db, func, start)
+
+
+@benchmark("pack")
+async def pack(db, rng):
+    async def step():
+        for _ in range(1000):
+            found.pack(_TUPLE)
+        return 1000
+
+    return step
+
+
+@benchmark("unpack")
+async def unpack(db, rng):
+    key = found.pack(_TUPLE)
+
+    async def step():
+        for _ in range(1000):
+            found.unpack(key)
+        return 1000
+
+    return step
+
+
+@benchmark("handles", table=("dict", "slots"))
+async def handles(db, rng, table):
+    """Bookkeeping of 50k pending futures, registered then completed: the
+    cffi handles in a dict under a lock that found.base used to keep, against
+    its slot table.  Skipped with the in-memory backend, that does not load
+    libfdb_c."""
+    if db.memory:
+        return None
+    ffi = found.base.ffi
+    loop = asyncio.get_running_loop()
+    state = (found.base._completion_queue(loop), None)
+    pointers = [ffi.cast("void *", 4096 + 8 * index) for index in range(50_000)]
+
+    if table == "dict":
+        pending = {}
+        lock = threading.Lock()
+
+        async def step():
+            handles = []
+            for pointer in pointers:
+                handle = ffi.new_handle(state)
+                with lock:
+                    pending[int(ffi.cast("uintptr_t", pointer))] = handle
+                handles.append(handle)
+            for pointer, handle in zip(pointers, handles):
+                ffi.from_handle(handle)
+                with lock:
+                    pending.pop(int(ffi.cast("uintptr_t", pointer)), None)
+            return len(pointers)
+
+    else:
+
+        async def step():
+            params = [found.base._put_slot(state) for _ in pointers]
+            for param in params:
+                found.base._take_slot(param)
+            return len(pointers)
+
+    return step
+
+
+@benchmark("get", concurrency=(1, 16, 256))
+async def get(db, rng, concurrency):
+    await _fill(db, rng, "get", 1024, 100)
+    keys = [found.pack(PREFIX + ("get", index)) for index in range(1024)]
+    rng.shuffle(keys)
+
+    async def worker(tx, keys):
+        for key in keys:
+            await found.get(tx, key)
+
+    async def func(tx):
+        await asyncio.gather(*(worker(tx, keys[i::concurrency]) for i in range(concurrency)))
+
+    async def step():
+        await found.transactional(db, func)
+        return len(keys)
+
+    return step
+
+
+@benchmark("query", mode=tuple(_MODES))
+async def query(db, rng, mode):
+    await _fill(db, rng, "query", _ROWS, 100)
+    begin = found.pack(PREFIX + ("query",))
+    end = found.next_prefix(begin)
+
+    async def func(tx):
+        count = 0
+        async for _ in found.query(tx, begin, end, mode=_MODES[mode]):
+            count += 1
+        return count
+
+    async def step():
+        return await found.transactional(db, func, snapshot=True)
+
+    return step
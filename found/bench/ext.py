@@ -0,0 +1,137 @@
+"""Benchmarks of the extension stores."""
+
+from uuid import UUID
+
+import found
+from found.bench import PREFIX, benchmark
+from found.ext import bstore, nstore, vnstore
+
+_WORDS = tuple("word{}".format(index) for index in range(500))
+
+
+def _uuid(rng):
+    return UUID(int=rng.getrandbits(128))
+
+
+@benchmark("nstore.add")
+async def nstore_add(db, rng):
+    store = nstore.make("bench", PREFIX + ("nstore.add",), 3)
+
+    async def func(tx):
+        for _ in range(100):
+            await nstore.add(tx, store, _uuid(rng), "title", rng.choice(_WORDS))
+
+    async def step():
+        await found.transactional(db, func)
+        return 100
+
+    return step
+
+
+@benchmark("nstore.select")
+async def nstore_select(db, rng):
+    store = nstore.make("bench", PREFIX + ("nstore.select",), 3)
+    subjects = [_uuid(rng) for _ in range(100)]
+
+    async def fill(tx, subject):
+        for index in range(10):
+            await nstore.add(tx, store, subject, "word", _WORDS[index])
+
+    for subject in subjects:
+        await found.transactional(db, fill, subject)
+
+    async def func(tx):
+        for subject in rng.sample(subjects, 10):
+            await found.all(nstore.select(tx, store, subject, "word", nstore.var("word")))
+
+    async def step():
+        await found.transactional(db, func, snapshot=True)
+        return 10
+
+    return step
+
+
+def _document(rng):
+    return {word: rng.randint(1, 10) for word in rng.sample(_WORDS, 50)}
+
+
+@benchmark("pstore.index")
+async def pstore_index(db, rng):
+    from found.ext import pstore
+
+    store = pstore.make("bench", PREFIX + ("pstore.index",))
+
+    async def step():
+        for _ in range(10):
+            await found.transactional(db, pstore.index, store, _uuid(rng), _document(rng))
+        return 10
+
+    return step
+
+
+@benchmark("pstore.search")
+async def pstore_search(db, rng):
+    from found.ext import pstore
+
+    store = pstore.make("bench", PREFIX + ("pstore.search",))
+    for _ in range(200):
+        await found.transactional(db, pstore.index, store, _uuid(rng), _document(rng))
+
+    async def func(tx):
+        for _ in range(10):
+            await pstore.search(tx, store, rng.sample(_WORDS, 2), 10)
+
+    async def step():
+        await found.transactional(db, func, snapshot=True)
+        return 10
+
+    return step
+
+
+@benchmark("bstore.put", size=(1_000, 100_000, 1_000_000))
+async def bstore_put(db, rng, size):
+    store = bstore.make("bench", PREFIX + ("bstore.put",))
+
+    async def step():
+        # A new blob every time, otherwise it is deduplicated
+        await found.transactional(db, bstore.get_or_create, store, rng.randbytes(size))
+        return 1
+
+    return step
+
+
+@benchmark("bstore.get", size=(1_000, 100_000, 1_000_000))
+async def bstore_get(db, rng, size):
+    store = bstore.make("bench", PREFIX + ("bstore.get",))
+    uid = await found.transactional(db, bstore.get_or_create, store, rng.randbytes(size))
+
+    async def step():
+        await found.transactional(db, bstore.get, store, uid, snapshot=True)
+        return 1
+
+    return step
+
+
+@benchmark("vnstore.ask")
+async def vnstore_ask(db, rng):
+    store = vnstore.make("bench", list(PREFIX + ("vnstore.ask",)), ["uid", "key", "value"])
+    subjects = [_uuid(rng) for _ in range(100)]
+    changeid = await found.transactional(db, vnstore.change_create, store)
+
+    async def fill(tx):
+        vnstore.change_continue(tx, store, changeid)
+        for subject in subjects:
+            await vnstore.add(tx, store, subject, "title", rng.choice(_WORDS))
+        await vnstore.change_apply(tx, store, changeid)
+
+    await found.transactional(db, fill)
+
+    async def func(tx):
+        for subject in rng.sample(subjects, 10):
+            await vnstore.ask(tx, store, subject, "title", _WORDS[0])
+
+    async def step():
+        await found.transactional(db, func, snapshot=True)
+        return 10
+
+    return step
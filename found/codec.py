@@ -0,0 +1,209 @@
+"""Fixed-width key encodings for the columns of a known type.
+
+The tuple layer spends a type code on each element, and escapes the null
+bytes of strings.  When every value of a column has the same type, a
+fixed-width encoding is faster to decode, and shorter when the width fits
+the values:
+
+- ``UUID``: the 16 bytes of the UUID;
+- ``integer(width)``: ``width`` bytes, big-endian, with the sign bit
+  flipped, for integers in [-2**(8 * width - 1), 2**(8 * width - 1)),
+  ``INT64`` is ``integer(8)``;
+- ``string(width)``: the UTF-8 bytes padded with null bytes up to
+  ``width`` bytes, then one byte of length;
+- ``TUPLE``: the tuple layer encoding, for the other columns.
+
+Each encoding is order-preserving and self-delimiting, so that the keys of
+a ``Schema`` sort like the keys of ``found.pack`` of the same values.
+"""
+
+#
+# found/codec.py
+#
+# This source file is part of the asyncio-foundationdb open source project
+#
+# Copyright 2026 Amirouche Boubekki <amirouche@hyper.dev>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import struct
+import uuid as _uuid_mod
+
+from found.tuple import Versionstamp, _decode, _encode
+
+
+class UUIDColumn:
+    __slots__ = ()
+
+    def __repr__(self):
+        return "UUID"
+
+    def encode(self, value):
+        if not isinstance(value, _uuid_mod.UUID):
+            raise ValueError("Expected an UUID, got: {!r}".format(value))
+        return value.bytes
+
+    def decode(self, key, pos):
+        return _uuid_mod.UUID(bytes=bytes(key[pos : pos + 16])), pos + 16
+
+
+class IntegerColumn:
+    __slots__ = ("width", "bias")
+
+    def __init__(self, width):
+        if not 0 < width <= 8:
+            raise ValueError("The width of an integer column is between 1 and 8 bytes")
+        self.width = width
+        self.bias = 1 << (8 * width - 1)
+
+    def __repr__(self):
+        return "integer({})".format(self.width)
+
+    def __eq__(self, other):
+        return isinstance(other, IntegerColumn) and self.width == other.width
+
+    def __hash__(self):
+        return hash((IntegerColumn, self.width))
+
+    def encode(self, value):
+        # bool is an int, but the tuple layer sorts it apart
+        if value.__class__ is not int:
+            raise ValueError("Expected an integer, got: {!r}".format(value))
+        if not -self.bias <= value < self.bias:
+            raise ValueError("Integer wider than {} bytes: {}".format(self.width, value))
+        return (value + self.bias).to_bytes(self.width, "big")
+
+    def decode(self, key, pos):
+        end = pos + self.width
+        return int.from_bytes(key[pos:end], "big") - self.bias, end
+
+
+class StringColumn:
+    __slots__ = ("width",)
+
+    def __init__(self, width):
+        if not 0 < width < 256:
+            raise ValueError("The width of a string column is between 1 and 255 bytes")
+        self.width = width
+
+    def __repr__(self):
+        return "string({})".format(self.width)
+
+    def __eq__(self, other):
+        return isinstance(other, StringColumn) and self.width == other.width
+
+    def __hash__(self):
+        return hash((StringColumn, self.width))
+
+    def encode(self, value):
+        if not isinstance(value, str):
+            raise ValueError("Expected a string, got: {!r}".format(value))
+        value = value.encode("utf-8")
+        if len(value) > self.width:
+            raise ValueError("String longer than {} bytes: {!r}".format(self.width, value))
+        # Null bytes pad the value, the length tells apart "a" and "a\x00"
+        return value.ljust(self.width, b"\x00") + bytes((len(value),))
+
+    def decode(self, key, pos):
+        end = pos + self.width
+        return bytes(key[pos : pos + key[end]]).decode("utf-8"), end + 1
+
+
+class TupleColumn:
+    __slots__ = ()
+
+    def __repr__(self):
+        return "TUPLE"
+
+    def encode(self, value):
+        return _encode(value)
+
+    def decode(self, key, pos):
+        return _decode(key, pos)
+
+
+def integer(width):
+    """Return the column of the signed integers of ``width`` bytes."""
+    return IntegerColumn(width)
+
+
+def string(width):
+    """Return the column of the strings of at most ``width`` bytes in UTF-8."""
+    return StringColumn(width)
+
+
+UUID = UUIDColumn()
+INT64 = integer(8)
+TUPLE = TupleColumn()
+
+
+class Schema:
+    """The encoding of the values of ``columns``; ``None`` is ``TUPLE``."""
+
+    __slots__ = ("columns",)
+
+    def __init__(self, columns):
+        self.columns = tuple(TUPLE if column is None else column for column in columns)
+
+    def __repr__(self):
+        return "Schema({!r})".format(self.columns)
+
+    def __eq__(self, other):
+        return isinstance(other, Schema) and self.columns == other.columns
+
+    def __hash__(self):
+        return hash(self.columns)
+
+    def permute(self, index):
+        """Return the schema of the columns in the order of ``index``."""
+        return Schema(self.columns[i] for i in index)
+
+    def pack(self, values, prefix=b""):
+        """Encode ``values``, that are the first ``len(values)`` columns."""
+        if len(values) > len(self.columns):
+            raise ValueError("More values than columns: {!r}".format(values))
+        return b"".join([prefix] + [c.encode(v) for c, v in zip(self.columns, values)])
+
+    def pack_with_versionstamp(self, values, prefix=b""):
+        """Like ``found.pack_with_versionstamp``, the incomplete versionstamp
+        must be in a ``TUPLE`` column."""
+        if len(values) > len(self.columns):
+            raise ValueError("More values than columns: {!r}".format(values))
+        chunks = [prefix]
+        position = -1
+        cursor = len(prefix)
+        for column, value in zip(self.columns, values):
+            chunk = column.encode(value)
+            if isinstance(value, Versionstamp) and not value.is_complete():
+                # After the type code of the tuple layer
+                position = cursor + 1
+            chunks.append(chunk)
+            cursor += len(chunk)
+        if position < 0:
+            raise ValueError("No incomplete versionstamp in values")
+        return b"".join(chunks) + struct.pack("<I", position)
+
+    def unpack_columns(self, key, offset=0, *, first=0):
+        """Decode the values of the columns from ``first``, that start at the
+        byte ``offset`` of ``key``.
+
+        Unlike ``found.unpack_from(key, offset, count)``, the third argument
+        is the index of the first column, hence it is keyword-only."""
+        out = []
+        pos = offset
+        for column in self.columns[first:]:
+            value, pos = column.decode(key, pos)
+            out.append(value)
+        if pos != len(key):
+            raise ValueError("Key does not match the schema: {!r}".format(key))
+        return tuple(out)
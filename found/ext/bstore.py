@@ -41,6 +41,9 @@ BStore = namedtuple(
         "name",
         "prefix_hash",
         "prefix_blob",
+        # Subspaces of the keys (prefix_hash, hash) and (prefix_blob, uid, index)
+        "hash",
+        "blob",
     ),
 )
 
@@ -48,14 +51,22 @@ BStore = namedtuple(
 def make(name, prefix):
     """Create a blob store handle called ``name`` with ``prefix``."""
     prefix = list(prefix)
-    out = BStore(name, tuple(prefix + BSTORE_SUFFIX_HASH), tuple(prefix + BSTORE_SUFFIX_BLOB))
+    prefix_hash = tuple(prefix + BSTORE_SUFFIX_HASH)
+    prefix_blob = tuple(prefix + BSTORE_SUFFIX_BLOB)
+    out = BStore(
+        name,
+        prefix_hash,
+        prefix_blob,
+        found.Subspace((prefix_hash,)),
+        found.Subspace((prefix_blob,)),
+    )
     return out
 
 
 async def get_or_create(tx, bstore, blob):
     """Store ``blob`` and return its uid, or return existing uid if already stored."""
     hash = hasher(blob).digest()
-    key = found.pack((bstore.prefix_hash, hash))
+    key = bstore.hash.pack((hash,))
     maybe_uid = await found.get(tx, key)
     if maybe_uid is not None:
         return UUID(bytes=maybe_uid)
@@ -65,15 +76,15 @@ async def get_or_create(tx, bstore, blob):
     uid = uuid4()
     await found.set(tx, key, uid.bytes)
     for index, slice in enumerate(sliced(blob, found.MAX_SIZE_VALUE)):
-        await found.set(tx, found.pack((bstore.prefix_blob, uid, index)), bytes(slice))
+        await found.set(tx, bstore.blob.pack((uid, index)), bytes(slice))
     return uid
 
 
 async def get(tx, bstore, uid):
     """Retrieve the blob associated with ``uid``. Raises ``BStoreException`` if not found."""
-    key = found.pack((bstore.prefix_blob, uid))
+    begin, end = bstore.blob.range((uid,))
     out = b""
-    async for _, value in found.query(tx, key, found.next_prefix(key)):
+    async for _, value in found.query(tx, begin, end):
         out += value
     if out == b"":
         raise BStoreException("BLOB should be in database: uid={}".format(uid))
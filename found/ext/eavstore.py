@@ -23,19 +23,38 @@ from collections import namedtuple
 from uuid import uuid4
 
 import found
+from found.codec import Schema
 
-EAVStore = namedtuple("EAVStore", ("name", "prefix_data", "prefix_index"))
+# The keys are packed with the prefix as their first, nested, element:
+# data holds (prefix_data, uid, key), and index (prefix_index, key, value, uid).
+# The elements after the prefix are encoded with data_codec and index_codec,
+# the found.codec.Schema of the columns (uid, key) and (key, value, uid).
+EAVStore = namedtuple(
+    "EAVStore",
+    ("name", "prefix_data", "prefix_index", "data", "index", "data_codec", "index_codec"),
+)
 
 EAVSTORE_SUFFIX_DATA = [b"\x01"]
 EAVSTORE_SUFFIX_INDEX = [b"\x02"]
 
 
-def make(name, prefix):
-    """Create an entity-attribute-value store handle called ``name`` with ``prefix``."""
+def make(name, prefix, schema=None):
+    """Create an entity-attribute-value store handle called ``name`` with ``prefix``.
+
+    ``schema`` is the triple of the ``found.codec`` columns of the uid, the
+    keys and the values, e.g. ``(codec.UUID, codec.string(32), None)``,
+    where ``None`` is the tuple layer."""
+    prefix_data = tuple(list(prefix) + EAVSTORE_SUFFIX_DATA)
+    prefix_index = tuple(list(prefix) + EAVSTORE_SUFFIX_INDEX)
+    uid, key, value = (None, None, None) if schema is None else schema
     out = EAVStore(
         name,
-        tuple(list(prefix) + EAVSTORE_SUFFIX_DATA),
-        tuple(list(prefix) + EAVSTORE_SUFFIX_INDEX),
+        prefix_data,
+        prefix_index,
+        found.Subspace((prefix_data,)),
+        found.Subspace((prefix_index,)),
+        Schema((uid, key)),
+        Schema((key, value, uid)),
     )
     return out
 
@@ -44,11 +63,11 @@ async def create(tx, eavstore, dict, uid=None):
     """Store ``dict`` and return its uid. If ``uid`` is provided, use it instead of generating one."""  # noqa: E501
     uid = uuid4() if uid is None else uid
     for key, value in dict.items():
-        key = found.pack((eavstore.prefix_data, uid, key))
+        key = eavstore.data_codec.pack((uid, key), eavstore.data.raw)
         await found.set(tx, key, found.pack((value,)))
 
     for key, value in dict.items():
-        key = found.pack((eavstore.prefix_index, key, value, uid))
+        key = eavstore.index_codec.pack((key, value, uid), eavstore.index.raw)
         await found.set(tx, key, b"")
 
     return uid
@@ -57,9 +76,10 @@ async def create(tx, eavstore, dict, uid=None):
 async def get(tx, eavstore, uid):
     """Retrieve the dictionary associated with ``uid``. Returns empty dict if not found."""
     out = dict()
-    key = found.pack((eavstore.prefix_data, uid))
-    async for key, value in found.query(tx, key, found.next_prefix(key)):
-        prefix, _, key = found.unpack(key)
+    begin = eavstore.data_codec.pack((uid,), eavstore.data.raw)
+    async for key, value in found.query(tx, begin, found.next_prefix(begin)):
+        # Skip the prefix and the uid, that are known
+        key = eavstore.data_codec.unpack_columns(key, len(begin), first=1)[0]
         out[key] = found.unpack(value)[0]
     return out
 
@@ -68,10 +88,10 @@ async def remove(tx, eavstore, uid):
     """Remove the dictionary associated with ``uid``."""
     dict = await get(tx, eavstore, uid)
     for key, value in dict.items():
-        key = found.pack(tuple((eavstore.prefix_index, key)))
+        key = eavstore.index_codec.pack((key,), eavstore.index.raw)
         await found.clear(tx, key)
-    key = found.pack((eavstore.prefix_data, uid))
-    await found.clear(tx, key, found.next_prefix(key))
+    begin = eavstore.data_codec.pack((uid,), eavstore.data.raw)
+    await found.clear(tx, begin, found.next_prefix(begin))
 
 
 async def update(tx, eavstore, uid, dict):
@@ -82,7 +102,7 @@ async def update(tx, eavstore, uid, dict):
 
 async def query(tx, eavstore, key, value):
     """Yield uids of dictionaries where ``key`` equals ``value``."""
-    key = found.pack((eavstore.prefix_index, key, value))
-    async for key, _ in found.query(tx, key, found.next_prefix(key)):
-        _, _, _, uid = found.unpack(key)
+    begin = eavstore.index_codec.pack((key, value), eavstore.index.raw)
+    async for key, _ in found.query(tx, begin, found.next_prefix(begin)):
+        uid = eavstore.index_codec.unpack_columns(key, len(begin), first=2)[0]
         yield uid
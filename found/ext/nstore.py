@@ -27,6 +27,8 @@ from math import factorial
 
 import found
 from found.base import FoundException
+from found.codec import Schema
+from found.tuple import pack_many, unpack_from
 
 # Compute the minimal set of indices required to bind any n-pattern in
 # one hop.
@@ -106,74 +108,129 @@ def is_permutation_prefix(combination, index):
     return out
 
 
-_NStore = namedtuple("NStore", ("name", "prefix", "n", "indices"))
+# subspaces[i] holds the keys of the index indices[i], that is the
+# permutations of the items, below prefix + (i,).  Without schema, codecs is
+# None and the items are packed with the tuple layer, otherwise codecs[i] is
+# the found.codec.Schema of the columns of indices[i].
+_NStore = namedtuple("NStore", ("name", "prefix", "n", "indices", "subspaces", "codecs"))
 
 
-def make(name, prefix, n):
-    """Create a generic tuple store called ``name`` with ``prefix`` and ``n`` columns."""
-    return _NStore(name, tuple(prefix), n, list(_compute_indices(n)))
+def make(name, prefix, n, schema=None):
+    """Create a generic tuple store called ``name`` with ``prefix`` and ``n`` columns.
+
+    ``schema`` is the sequence of the ``n`` columns of ``found.codec``, e.g.
+    ``(codec.UUID, codec.string(32), None)``, where ``None`` is the tuple
+    layer."""
+    prefix = tuple(prefix)
+    indices = list(_compute_indices(n))
+    subspaces = [found.Subspace(prefix + (subspace,)) for subspace in range(len(indices))]
+    if schema is None:
+        codecs = None
+    else:
+        assert len(schema) == n, "invalid column count"
+        schema = Schema(schema)
+        codecs = [schema.permute(index) for index in indices]
+    return _NStore(name, prefix, n, indices, subspaces, codecs)
+
+
+def _pack(nstore, items):
+    """Return the keys of ``items`` in each index of ``nstore``."""
+    if nstore.codecs is not None:
+        # A column moves with its item in the permutations, encode each item
+        # once; the first index is the identity permutation.
+        chunks = [column.encode(item) for column, item in zip(nstore.codecs[0].columns, items)]
+        return [
+            subspace.raw + b"".join([chunks[i] for i in index])
+            for subspace, index in zip(nstore.subspaces, nstore.indices)
+        ]
+    permutations = [tuple(items[i] for i in index) for index in nstore.indices]
+    # Encode each item once, for all the indices
+    keys = pack_many(permutations)
+    return [subspace.raw + key for subspace, key in zip(nstore.subspaces, keys)]
+
+
+def _pack_with_versionstamp(nstore, items):
+    out = []
+    for i, (subspace, index) in enumerate(zip(nstore.subspaces, nstore.indices)):
+        permutation = tuple(items[i] for i in index)
+        if nstore.codecs is None:
+            out.append(subspace.pack_with_versionstamp(permutation))
+        else:
+            out.append(nstore.codecs[i].pack_with_versionstamp(permutation, subspace.raw))
+    return out
 
 
 async def add(tx, nstore, *items, value=b""):
     """Add ``items`` to ``nstore``, optionally associated with ``value``."""
     assert len(items) == nstore.n, "invalid item count"
-    pack = (
-        found.pack_with_versionstamp
-        if any(isinstance(x, found.Versionstamp) for x in items)
-        else found.pack
-    )
-    for subspace, index in enumerate(nstore.indices):
-        permutation = list(items[i] for i in index)
-        key = tuple(nstore.prefix) + (subspace,) + tuple(permutation)
-        key = pack(key)
+    if any(isinstance(x, found.Versionstamp) for x in items):
+        keys = _pack_with_versionstamp(nstore, items)
+    else:
+        keys = _pack(nstore, items)
+    for key in keys:
         await found.set(tx, key, value)
 
 
 async def remove(tx, nstore, *items):
     """Remove ``items`` from ``nstore``."""
     assert len(items) == nstore.n, "invalid item count"
-    for subspace, index in enumerate(nstore.indices):
-        permutation = list(items[i] for i in index)
-        key = nstore.prefix + (subspace,) + tuple(permutation)
-        await found.clear(tx, found.pack(tuple(key)))
+    for key in _pack(nstore, items):
+        await found.clear(tx, key)
 
 
 async def get(tx, nstore, *items):
     """Return the value associated with ``items``, or ``None`` if not found."""
     assert len(items) == nstore.n, "invalid item count"
-    subspace = 0
-    key = nstore.prefix + (subspace,) + tuple(items)
-    out = await found.get(tx, found.pack(tuple(key)))
+    # The first index is the identity permutation
+    if nstore.codecs is None:
+        key = nstore.subspaces[0].pack(items)
+    else:
+        key = nstore.codecs[0].pack(items, nstore.subspaces[0].raw)
+    out = await found.get(tx, key)
     out = None if out is None else out
     return out
 
 
 async def select(tx, nstore, *pattern, seed=None):
     """Yields bindings that match PATTERN"""
-    assert len(pattern) == nstore.n, "invalid item count"
-    variable = tuple(isinstance(x, Variable) for x in pattern)
-    # find the first index suitable for the query
-    combination = tuple(x for x in range(nstore.n) if not variable[x])
-    for subspace, index in enumerate(nstore.indices):
-        if is_permutation_prefix(combination, index):
-            break
-    else:
-        raise NStoreException("Oops!")
-    # `index` variable holds the permutation suitable for the
-    # query. `subspace` is the "prefix" of that index.
-    prefix = list(pattern[i] for i in index if not isinstance(pattern[i], Variable))
-    prefix = list(nstore.prefix) + [subspace] + prefix
-    start = found.pack(tuple(prefix))
-    end = found.next_prefix(start)
-    async for key, _ in found.query(tx, start, end):
-        items = found.unpack(key)[len(nstore.prefix) + 1 :]
-        # re-order the items
-        items = tuple(items[index.index(i)] for i in range(nstore.n))
-        bindings = {} if seed is None else seed
-        for i, item in enumerate(pattern):
-            if isinstance(item, Variable):
-                bindings = {**bindings, item.name: items[i]}
-        yield bindings
+    span = found.start_span("nstore.select", dict(nstore=nstore.name))
+    try:
+        assert len(pattern) == nstore.n, "invalid item count"
+        variable = tuple(isinstance(x, Variable) for x in pattern)
+        # find the first index suitable for the query
+        combination = tuple(x for x in range(nstore.n) if not variable[x])
+        for subspace, index in enumerate(nstore.indices):
+            if is_permutation_prefix(combination, index):
+                break
+        else:
+            raise NStoreException("Oops!")
+        # `index` variable holds the permutation suitable for the
+        # query. `subspace` is the "prefix" of that index.
+        codec = None if nstore.codecs is None else nstore.codecs[subspace]
+        subspace = nstore.subspaces[subspace]
+        prefix = tuple(pattern[i] for i in index if not isinstance(pattern[i], Variable))
+        if codec is None:
+            start, end = subspace.range(prefix)
+        else:
+            start = codec.pack(prefix, subspace.raw)
+            end = found.next_prefix(start)
+        # The variables follow the bound items in the permutation, only
+        # decode those, then bind them in the order of the pattern.
+        positions = index[len(prefix) :]
+        order = sorted(range(len(positions)), key=lambda x: positions[x])
+        names = tuple(pattern[positions[x]].name for x in order)
+        async for key, _ in found.query(tx, start, end):
+            if codec is None:
+                values = unpack_from(key, len(start))
+            else:
+                values = codec.unpack_columns(key, len(start), first=len(prefix))
+            bindings = {} if seed is None else seed
+            yield {**bindings, **dict(zip(names, (values[x] for x in order)))}
+    except Exception as exc:
+        found.end_span(span, exc)
+        raise
+    finally:
+        found.end_span(span)
 
 
 async def where(tx, nstore, iterator, *pattern):
@@ -0,0 +1,55 @@
+"""Send the spans of found to an OpenTelemetry tracer."""
+
+#
+# This source file is part of the asyncio-foundationdb open source project
+#
+# Copyright 2026 Amirouche Boubekki <amirouche@hyper.dev>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+from opentelemetry import trace
+
+import found
+
+
+class OpenTelemetryExporter:
+    """Exporter that mirrors each span of found with an OpenTelemetry span.
+
+    Spans without a parent in found are children of the current
+    OpenTelemetry span, e.g. the span of the HTTP request."""
+
+    def __init__(self, tracer=None):
+        self.tracer = trace.get_tracer("found") if tracer is None else tracer
+
+    def on_start(self, span):
+        parent = span.parent
+        if parent is None or parent.context is None:
+            context = None
+        else:
+            context = trace.set_span_in_context(parent.context)
+        span.context = self.tracer.start_span(
+            span.name, context=context, attributes=span.attributes, start_time=span.start_time
+        )
+
+    def on_end(self, span):
+        out = span.context
+        out.set_attributes(span.attributes)
+        if span.error is not None:
+            out.record_exception(span.error)
+            out.set_status(trace.Status(trace.StatusCode.ERROR, repr(span.error)))
+        out.end(end_time=span.end_time)
+
+
+def install(tracer=None):
+    """Send the spans of found to ``tracer``, or the global tracer provider."""
+    found.set_span_exporter(OpenTelemetryExporter(tracer))
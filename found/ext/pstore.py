@@ -30,6 +30,7 @@ import zstandard as zstd
 
 import found
 from found.ext import nstore
+from found.tuple import unpack_many
 
 
 class PStoreException(found.BaseFoundException):
@@ -46,13 +47,17 @@ PSTORE_SUFFIX_TOKENS = [b"\x01"]
 PSTORE_SUFFIX_INDEX = [b"\x02"]
 PSTORE_SUFFIX_COUNTERS = [b"\x03"]
 
-PStore = namedtuple("PStore", ("name", "tokens", "prefix_index", "prefix_counters", "pool"))
+PStore = namedtuple(
+    "PStore", ("name", "tokens", "prefix_index", "prefix_counters", "pool", "index", "counters")
+)
 
 
 def make(name, prefix):
     """Create an inverted index store called ``name`` with ``prefix``."""
     prefix = list(prefix)
     prefix_tokens = tuple(prefix + PSTORE_SUFFIX_TOKENS)
+    prefix_index = tuple(prefix + PSTORE_SUFFIX_INDEX)
+    prefix_counters = tuple(prefix + PSTORE_SUFFIX_COUNTERS)
     tokens = nstore.make("{}/token".format(name), prefix_tokens, 2)
     out = PStore(
         name,
@@ -61,11 +66,15 @@ def make(name, prefix):
         tokens,
         # TODO: Replace with a multi-dict (mstore) dedicated store.
         # The value is always empty.
-        tuple(prefix + PSTORE_SUFFIX_INDEX),
+        prefix_index,
         # That will map bag uid to a counter serialized to json and
         # compressed with zstd. It is a good old key-value store.
-        tuple(prefix + PSTORE_SUFFIX_COUNTERS),
+        prefix_counters,
         None,
+        # Subspaces of the keys (prefix_index, token, docuid) and
+        # (prefix_counters, docuid)
+        found.Subspace((prefix_index,)),
+        found.Subspace((prefix_counters,)),
     )
     return out
 
@@ -89,13 +98,13 @@ async def index(tx, store, docuid, counter):
     # store tokens to use later during search for filtering
     await found.set(
         tx,
-        found.pack((store.prefix_counters, docuid)),
+        store.counters.pack((docuid,)),
         zstd.compress(found.pack(tuple(tokens.items()))),
     )
 
     # store tokens keys for candidate selection
     for token in tokens:
-        await found.set(tx, found.pack((store.prefix_index, token, docuid)), b"")
+        await found.set(tx, store.index.pack((token, docuid)), b"")
 
 
 async def _keywords_to_token(tx, tokens, keyword):
@@ -109,15 +118,15 @@ async def _keywords_to_token(tx, tokens, keyword):
         return uid
 
 
-async def _token_to_size(tx, prefix_index, token):
-    key = found.pack((prefix_index, token))
-    out = await found.estimated_size_bytes(tx, key, found.next_prefix(key))
+async def _token_to_size(tx, index, token):
+    out = await found.estimated_size_bytes(tx, *index.range((token,)))
     return out
 
 
-async def _prepare(tx, prefix, candidates, keywords):
-    for candidate in candidates:
-        out = await found.get(tx, found.pack((prefix, candidate)))
+async def _prepare(tx, counters, candidates, keywords):
+    keys = [counters.pack((candidate,)) for candidate in candidates]
+    counters = await found.get_many(tx, keys)
+    for candidate, out in zip(candidates, counters):
         yield (candidate, keywords, out)
 
 
@@ -144,9 +153,8 @@ def _filter(hits):
     return wrapped
 
 
-async def _massage(tx, store, candidate, keywords, hits):
+def _massage(candidate, counter, keywords, hits):
     score = 0
-    counter = await found.get(tx, found.pack((store.prefix_counters, candidate)))
     # TODO: replace the dictionary and the following for loop with
     # a single iteration over the counter, using zigzag algorithm.
     counter = dict(found.unpack(zstd.decompress(counter)))
@@ -162,6 +170,17 @@ async def _massage(tx, store, candidate, keywords, hits):
 
 async def search(tx, store, keywords, limit=13):
     """Return a sorted list of at most ``limit`` documents matching ``keywords``."""
+    span = found.start_span("pstore.search", dict(pstore=store.name), current=True)
+    try:
+        return await _search(tx, store, keywords, limit)
+    except Exception as exc:
+        found.end_span(span, exc)
+        raise
+    finally:
+        found.end_span(span)
+
+
+async def _search(tx, store, keywords, limit=13):
     coroutines = (_keywords_to_token(tx, store.tokens, keyword) for keyword in keywords)
     keywords = await asyncio.gather(*coroutines)
     # If a keyword is not present in store.tokens, then there is no
@@ -172,18 +191,14 @@ async def search(tx, store, keywords, limit=13):
         return list()
 
     # Select seed token
-    coroutines = (_token_to_size(tx, store.prefix_index, token) for token in keywords)
+    coroutines = (_token_to_size(tx, store.index, token) for token in keywords)
     sizes = await asyncio.gather(*coroutines)
     _, seed = min(zip(sizes, keywords), key=itemgetter(0))
 
     # Select candidates
-    candidates = []
-    key = found.pack((store.prefix_index, seed))
-    query = found.query(tx, key, found.next_prefix(key))
-
-    async for key, _ in query:
-        _, _, uid = found.unpack(key)
-        candidates.append(uid)
+    begin, end = store.index.range((seed,))
+    keys = [key async for key, _ in found.query(tx, begin, end)]
+    candidates = [uid for (uid,) in unpack_many(keys, skip_prefix=begin)]
 
     # XXX: 500 was empirically discovered, to make it so that the
     #      search takes less than 1 second or so.
@@ -193,8 +208,10 @@ async def search(tx, store, keywords, limit=13):
     # score, filter and construct hits aka. _massage
     hits = Counter()
 
-    coroutines = (_massage(tx, store, c, keywords, hits) for c in candidates)
-    await asyncio.gather(*coroutines)
+    keys = [store.counters.pack((c,)) for c in candidates]
+    counters = await found.get_many(tx, keys)
+    for candidate, counter in zip(candidates, counters):
+        _massage(candidate, counter, keywords, hits)
 
     out = hits.most_common(limit)
 
@@ -122,6 +122,17 @@ async def change_apply(tr, vnstore, changeid):
 
 async def ask(tr, vnstore, *items):
     """Return ``True`` if ``items`` is alive in ``vnstore``."""
+    span = found.start_span("vnstore.ask", dict(vnstore=vnstore.name), current=True)
+    try:
+        return await _ask(tr, vnstore, *items)
+    except Exception as exc:
+        found.end_span(span, exc)
+        raise
+    finally:
+        found.end_span(span)
+
+
+async def _ask(tr, vnstore, *items):
     assert len(items) == len(vnstore.items), "Incorrect count of ITEMS"
     # Complexity is O(n), where n is the number of times the exact
     # same ITEMS were added and deleted.  In pratice, n=0, n=1 or
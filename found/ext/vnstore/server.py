@@ -202,12 +202,15 @@ async def server(scope, receive, send):
             autoescape=select_autoescape(),
         )
         state["database"] = await found.open()
+        # /history/ and /navigate/ are read-only, and may lag a little.
+        read_version = found.cache_read_version(state["database"])
         state["store"] = make(
             "found.vnstore:server", ["found.vnstore:server"], ["uid", "key", "value"]
         )
         log.debug("Application server lifespan init: done.")
         await send({"type": "lifespan.startup.complete"})
         await receive()  # lifespan.shutdown
+        read_version.close()
         await send({"type": "lifespan.shutdown.complete"})
         return
 
@@ -230,7 +233,9 @@ async def server(scope, receive, send):
         return
 
     if path == "/history/" and method == "GET":
-        changes = await found.transactional(state["database"], change_list, state["store"])
+        changes = await found.transactional(
+            state["database"], change_list, state["store"], snapshot=True
+        )
         html = await jinja(state, "history-list.html", dict(changes=changes))
         await reply_html(send, html)
         return
@@ -472,7 +477,7 @@ async def server(scope, receive, send):
         if valuex == "":
             valuex = nstore.var("value")
 
-        out = await found.transactional(state["database"], do, uidx, keyx, valuex)
+        out = await found.transactional(state["database"], do, uidx, keyx, valuex, snapshot=True)
         html = await jinja(
             state,
             "navigate.html",
@@ -0,0 +1,665 @@
+"""In-memory stand-in for a FoundationDB cluster.
+
+Selected with ``await found.open(backend="memory")``, it serves the same API
+as libfdb_c, in the same process, without network: an ordered key-value
+store with multi-version reads, optimistic conflict detection, atomic
+operations, versionstamps and watches.  It makes the layers testable and
+their benchmarks deterministic on any machine, and it is a reference
+implementation to check the real cluster against.
+
+What it does not simulate: latency, shards and the five seconds transaction
+limit.  Versions advance of one million per second, like a cluster, so that
+read versions older than five seconds are rejected with transaction_too_old.
+"""
+
+#
+# This source file is part of the asyncio-foundationdb open source project
+#
+# Copyright 2026 Amirouche Boubekki <amirouche@hyper.dev>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import bisect
+import heapq
+import struct
+import time
+
+import found
+from found.base import (
+    _CONFLICTING_KEYS,
+    _TRANSACTION_OPTION_REPORT_CONFLICTING_KEYS,
+    CONFLICT_RANGE_TYPE_READ,
+    MUTATION_ADD,
+    MUTATION_APPEND_IF_FITS,
+    MUTATION_BIT_AND,
+    MUTATION_BIT_OR,
+    MUTATION_BIT_XOR,
+    MUTATION_BYTE_MAX,
+    MUTATION_BYTE_MIN,
+    MUTATION_COMPARE_AND_CLEAR,
+    MUTATION_MAX,
+    MUTATION_MIN,
+    MUTATION_SET_VERSIONSTAMPED_KEY,
+    MUTATION_SET_VERSIONSTAMPED_VALUE,
+    STREAMING_MODE_EXACT,
+    STREAMING_MODE_WANT_ALL,
+    FoundException,
+)
+
+# Error codes of fdb_c
+ERROR_TRANSACTION_TOO_OLD = 1007
+ERROR_FUTURE_VERSION = 1009
+ERROR_NOT_COMMITTED = 1020
+ERROR_COMMIT_UNKNOWN_RESULT = 1021
+ERROR_TRANSACTION_CANCELLED = 1025
+ERROR_ACCESSED_UNREADABLE = 1036
+ERROR_TRANSACTION_TOO_LARGE = 2101
+ERROR_KEY_TOO_LARGE = 2102
+ERROR_VALUE_TOO_LARGE = 2103
+
+_RETRYABLE = {
+    ERROR_TRANSACTION_TOO_OLD,
+    ERROR_FUTURE_VERSION,
+    ERROR_NOT_COMMITTED,
+    ERROR_COMMIT_UNKNOWN_RESULT,
+}
+
+# Versions per second, and how long old versions stay readable
+VERSIONS_PER_SECOND = 1_000_000
+MVCC_WINDOW = 5 * VERSIONS_PER_SECOND
+
+# Rows per batch of a range read in the streaming modes, by iteration
+_BATCH_ROWS = (64, 256, 1024, 4096)
+
+_END = b"\xff"
+
+
+def _after(key):
+    """Return the first key after ``key``."""
+    return key + b"\x00"
+
+
+def _overlaps(begin, end, other_begin, other_end):
+    return begin < other_end and other_begin < end
+
+
+# ---------------------------------------------------------------------------
+# Atomic operations
+#
+# Integers are little-endian; the existing value is truncated or zero-padded
+# to the length of the parameter, as fdb_c does.  ``None`` is a missing key.
+# ---------------------------------------------------------------------------
+
+
+def _resize(value, length):
+    value = b"" if value is None else value
+    return value[:length].ljust(length, b"\x00")
+
+
+def _add(value, param):
+    total = int.from_bytes(_resize(value, len(param)), "little")
+    total += int.from_bytes(param, "little")
+    return (total % (1 << (8 * len(param)))).to_bytes(len(param), "little")
+
+
+def _bit_and(value, param):
+    if value is None:
+        return param
+    value = _resize(value, len(param))
+    return bytes(a & b for a, b in zip(value, param))
+
+
+def _bit_or(value, param):
+    value = _resize(value, len(param))
+    return bytes(a | b for a, b in zip(value, param))
+
+
+def _bit_xor(value, param):
+    value = _resize(value, len(param))
+    return bytes(a ^ b for a, b in zip(value, param))
+
+
+def _append_if_fits(value, param):
+    value = b"" if value is None else value
+    if len(value) + len(param) > found.MAX_SIZE_VALUE:
+        return value
+    return value + param
+
+
+def _max(value, param):
+    value = _resize(value, len(param))
+    if int.from_bytes(value, "little") >= int.from_bytes(param, "little"):
+        return value
+    return param
+
+
+def _min(value, param):
+    if value is None:
+        return param
+    value = _resize(value, len(param))
+    if int.from_bytes(value, "little") <= int.from_bytes(param, "little"):
+        return value
+    return param
+
+
+def _byte_max(value, param):
+    return param if value is None else max(value, param)
+
+
+def _byte_min(value, param):
+    return param if value is None else min(value, param)
+
+
+def _compare_and_clear(value, param):
+    return None if value == param else value
+
+
+_ATOMICS = {
+    MUTATION_ADD: _add,
+    MUTATION_BIT_AND: _bit_and,
+    MUTATION_BIT_OR: _bit_or,
+    MUTATION_BIT_XOR: _bit_xor,
+    MUTATION_APPEND_IF_FITS: _append_if_fits,
+    MUTATION_MAX: _max,
+    MUTATION_MIN: _min,
+    MUTATION_BYTE_MAX: _byte_max,
+    MUTATION_BYTE_MIN: _byte_min,
+    MUTATION_COMPARE_AND_CLEAR: _compare_and_clear,
+}
+
+
+def _fill_versionstamp(data, versionstamp):
+    # The last four bytes are the little-endian offset of the incomplete
+    # versionstamp in the rest of ``data``.
+    (offset,) = struct.unpack("<I", data[-4:])
+    data = data[:-4]
+    return data[:offset] + versionstamp + data[offset + len(versionstamp) :]
+
+
+# ---------------------------------------------------------------------------
+# Store
+# ---------------------------------------------------------------------------
+
+
+class Store:
+    """The data of an in-memory cluster.
+
+    ``keys`` is the sorted list of the keys that have a history, and
+    ``history`` maps each of them to the ascending list of its
+    ``(version, value)``, where a cleared key has the value ``None``.  Only
+    the versions that a read version of the last ``MVCC_WINDOW`` may see are
+    kept.  ``log`` holds the ``(version, write ranges)`` of the recent
+    commits, to detect the conflicts of the transactions that read before
+    them."""
+
+    def __init__(self):
+        self.keys = []
+        self.history = {}
+        self.log = []
+        self.watches = {}
+        self.start = time.monotonic()
+        self.version = 0
+        self.tombstones = 0
+
+    # Versions
+
+    def now(self):
+        """Return the current version, that is the latest read version."""
+        clock = int((time.monotonic() - self.start) * VERSIONS_PER_SECOND)
+        self.version = max(self.version, clock)
+        return self.version
+
+    def next_version(self):
+        self.version = self.now() + 1
+        return self.version
+
+    def oldest_version(self):
+        return self.now() - MVCC_WINDOW
+
+    # Reads
+
+    def read(self, key, version):
+        history = self.history.get(key)
+        if history is None:
+            return None
+        for item_version, value in reversed(history):
+            if item_version <= version:
+                return value
+        return None
+
+    def scan(self, begin, end, version, reverse):
+        """Generate the ``(key, value)`` visible at ``version`` in [begin, end)."""
+        keys = self.keys
+        low = bisect.bisect_left(keys, begin)
+        high = bisect.bisect_left(keys, end)
+        indices = range(high - 1, low - 1, -1) if reverse else range(low, high)
+        for index in indices:
+            key = keys[index]
+            value = self.read(key, version)
+            if value is not None:
+                yield key, value
+
+    # Writes
+
+    def write(self, key, version, value):
+        history = self.history.get(key)
+        if value is None and (history is None or history[-1][1] is None):
+            # Already cleared
+            return
+        if history is None:
+            bisect.insort(self.keys, key)
+            self.history[key] = [(version, value)]
+            return
+        # Drop the versions that no read version may see anymore
+        oldest = self.oldest_version()
+        while len(history) > 1 and history[1][0] <= oldest:
+            history.pop(0)
+        history.append((version, value))
+        if value is None:
+            self.tombstones += 1
+
+    def compact(self):
+        """Forget the keys cleared before the oldest readable version."""
+        oldest = self.oldest_version()
+        keys = []
+        for key in self.keys:
+            history = self.history[key]
+            if history[-1][1] is None and history[-1][0] <= oldest:
+                del self.history[key]
+            else:
+                keys.append(key)
+        self.keys = keys
+        self.tombstones = 0
+
+    def conflicts(self, version, ranges):
+        """Return the read ``ranges`` written by a commit after ``version``."""
+        out = []
+        for begin, end in ranges:
+            for commit_version, writes in reversed(self.log):
+                if commit_version <= version:
+                    break
+                if any(_overlaps(begin, end, *write) for write in writes):
+                    out.append((begin, end))
+                    break
+        return out
+
+    def notify(self, key, value):
+        watches = self.watches.get(key)
+        if not watches:
+            return
+        remaining = []
+        for expected, aio_future in watches:
+            if aio_future.done():
+                continue
+            if value == expected:
+                remaining.append((expected, aio_future))
+            elif not aio_future.get_loop().is_closed():
+                aio_future.set_result(None)
+        if remaining:
+            self.watches[key] = remaining
+        else:
+            del self.watches[key]
+
+
+class Database:
+    """In-memory counterpart of FDBDatabase."""
+
+    def __init__(self, store):
+        self.store = store
+
+    def create_transaction(self):
+        return Transaction(self.store)
+
+
+# ---------------------------------------------------------------------------
+# Transaction
+#
+# Writes are buffered: ``mutations`` is the ordered list of operations to
+# apply at commit, and ``overlay`` maps each written key to its value as seen
+# by the reads of the transaction itself.  A key cleared by a range clear and
+# not written since is hidden by ``cleared``.  Read ranges are recorded for
+# conflict detection unless the read is a snapshot read.
+# ---------------------------------------------------------------------------
+
+
+class Transaction:
+    """In-memory counterpart of FDBTransaction."""
+
+    def __init__(self, store):
+        self.store = store
+        self.options = {}
+        self.reset()
+
+    def reset(self):
+        self.read_version = None
+        self.committed_version = -1
+        self.versionstamp = None
+        self.conflicting = []
+        self.mutations = []
+        self.overlay = {}
+        self.cleared = []
+        self.reads = []
+        self.writes = []
+        self.unreadable = []
+        self.size = 0
+        self.watches = []
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+        for _, aio_future in self.watches:
+            if not aio_future.done():
+                aio_future.set_exception(FoundException(ERROR_TRANSACTION_CANCELLED))
+        self.watches = []
+
+    def check(self):
+        if self.cancelled:
+            raise FoundException(ERROR_TRANSACTION_CANCELLED)
+
+    def set_option(self, option, value):
+        self.options[option] = value
+
+    # Reads
+
+    def get_read_version(self):
+        self.check()
+        if self.read_version is None:
+            self.read_version = self.store.now()
+        return self.read_version
+
+    def set_read_version(self, version):
+        self.read_version = version
+
+    def version(self):
+        version = self.get_read_version()
+        if version > self.store.now():
+            raise FoundException(ERROR_FUTURE_VERSION)
+        if version < self.store.oldest_version():
+            raise FoundException(ERROR_TRANSACTION_TOO_OLD)
+        return version
+
+    def is_cleared(self, key):
+        return any(begin <= key < end for begin, end in self.cleared)
+
+    def check_readable(self, begin, end):
+        if any(_overlaps(begin, end, key, _after(key)) for key in self.unreadable):
+            raise FoundException(ERROR_ACCESSED_UNREADABLE)
+
+    def get(self, key, snapshot):
+        version = self.version()
+        self.check_readable(key, _after(key))
+        if not snapshot:
+            self.reads.append((key, _after(key)))
+        try:
+            return self.overlay[key]
+        except KeyError:
+            pass
+        if self.is_cleared(key):
+            return None
+        return self.store.read(key, version)
+
+    def scan(self, begin, end, reverse):
+        """Generate the ``(key, value)`` in [begin, end) seen by this transaction."""
+        version = self.version()
+        overlay = self.overlay
+        stored = (
+            (key, value)
+            for key, value in self.store.scan(begin, end, version, reverse)
+            if key not in overlay and not self.is_cleared(key)
+        )
+        written = sorted(
+            (key, value)
+            for key, value in overlay.items()
+            if begin <= key < end and value is not None
+        )
+        if reverse:
+            written.reverse()
+        return heapq.merge(stored, written, key=lambda item: item[0], reverse=reverse)
+
+    def resolve(self, key, or_equal, offset):
+        """Return the key designated by the key selector."""
+        if offset > 0:
+            begin = _after(key) if or_equal else key
+            for index, (out, _) in enumerate(self.scan(begin, _END, False), 1):
+                if index == offset:
+                    return out
+            return _END
+        end = _after(key) if or_equal else key
+        for index, (out, _) in enumerate(self.scan(b"", end, True)):
+            if index == -offset:
+                return out
+        return b""
+
+    def bound(self, key, or_equal, offset):
+        """Return a key that bounds a range like the key selector does."""
+        if offset == 1:
+            # The first key after, or equal to, the bound: scanning from the
+            # bound itself reads the same keys, without skipping the cleared
+            # keys in between.
+            return _after(key) if or_equal else key
+        return self.resolve(key, or_equal, offset)
+
+    def get_key(self, key, or_equal, offset, snapshot):
+        out = self.resolve(key, or_equal, offset)
+        if not snapshot:
+            low, high = min(key, out), max(key, out)
+            self.reads.append((low, _after(high)))
+        return out
+
+    def get_range(self, begin, end, limit, mode, iteration, snapshot, reverse):
+        """Return ``(kvs, count, more)`` like fdb_future_get_keyvalue_array."""
+        if begin[0].startswith(_CONFLICTING_KEYS):
+            return self.get_conflicting_keys(begin[0], end[0], limit, reverse)
+        begin = self.bound(*begin)
+        end = self.bound(*end)
+        if begin >= end:
+            return [], 0, False
+        self.check_readable(begin, end)
+        if mode in (STREAMING_MODE_WANT_ALL, STREAMING_MODE_EXACT):
+            rows = limit
+        else:
+            rows = _BATCH_ROWS[min(iteration, len(_BATCH_ROWS)) - 1]
+            if limit > 0:
+                rows = min(rows, limit)
+        out = []
+        more = False
+        for item in self.scan(begin, end, reverse):
+            if rows > 0 and len(out) == rows:
+                more = True
+                break
+            out.append(item)
+        if not snapshot:
+            if not more:
+                self.reads.append((begin, end))
+            elif reverse:
+                self.reads.append((out[-1][0], end))
+            else:
+                self.reads.append((begin, _after(out[-1][0])))
+        return out, len(out), more
+
+    def get_conflicting_keys(self, begin, end, limit, reverse):
+        if _TRANSACTION_OPTION_REPORT_CONFLICTING_KEYS not in self.options:
+            return [], 0, False
+        out = []
+        for conflict_begin, conflict_end in self.conflicting:
+            out.append((_CONFLICTING_KEYS + conflict_begin, b"1"))
+            out.append((_CONFLICTING_KEYS + conflict_end, b"0"))
+        out = [(key, value) for key, value in sorted(out) if begin <= key < end]
+        if reverse:
+            out.reverse()
+        if limit > 0:
+            out = out[:limit]
+        return out, len(out), False
+
+    def estimated_size_bytes(self, begin, end):
+        version = self.version()
+        return sum(
+            len(key) + len(value) for key, value in self.store.scan(begin, end, version, False)
+        )
+
+    def get_range_split_points(self, begin, end, chunk_size):
+        version = self.version()
+        out = [begin]
+        size = 0
+        for key, value in self.store.scan(begin, end, version, False):
+            if size >= chunk_size:
+                out.append(key)
+                size = 0
+            size += len(key) + len(value)
+        out.append(end)
+        return out
+
+    def get_addresses_for_key(self, key):
+        return ["127.0.0.1:4500"]
+
+    # Writes
+
+    def add_conflict_range(self, begin, end, conflict_type):
+        if conflict_type == CONFLICT_RANGE_TYPE_READ:
+            self.reads.append((begin, end))
+        else:
+            self.writes.append((begin, end))
+
+    def mutate(self, mutation, key, other, size):
+        self.check()
+        self.mutations.append(mutation)
+        self.writes.append((key, other))
+        self.size += size
+
+    def set(self, key, value):
+        self.mutate(("set", key, value), key, _after(key), len(key) + len(value))
+        self.overlay[key] = value
+
+    def clear(self, key):
+        self.mutate(("clear", key, None), key, _after(key), len(key))
+        self.overlay[key] = None
+
+    def clear_range(self, begin, end):
+        if begin >= end:
+            return
+        self.mutate(("clear_range", begin, end), begin, end, len(begin) + len(end))
+        for key in [key for key in self.overlay if begin <= key < end]:
+            del self.overlay[key]
+        self.cleared.append((begin, end))
+
+    def atomic_op(self, key, param, opcode):
+        if opcode == MUTATION_SET_VERSIONSTAMPED_KEY:
+            # The key is not known until commit, nor readable before.
+            self.check()
+            self.mutations.append(("versionstamped_key", key, param))
+            self.size += len(key) + len(param)
+            return
+        if opcode == MUTATION_SET_VERSIONSTAMPED_VALUE:
+            self.mutate(
+                ("versionstamped_value", key, param), key, _after(key), len(key) + len(param)
+            )
+            self.overlay.pop(key, None)
+            self.unreadable.append(key)
+            return
+        self.mutate(("atomic", key, (opcode, param)), key, _after(key), len(key) + len(param))
+        # The reads of the transaction see the result of the operation, without
+        # adding a read conflict range, as fdb_c does.
+        if key in self.overlay or self.is_cleared(key):
+            value = self.overlay.get(key)
+        else:
+            value = self.store.read(key, self.version())
+        self.overlay[key] = _ATOMICS[opcode](value, param)
+
+    def watch(self, loop, key):
+        aio_future = loop.create_future()
+        self.watches.append((key, aio_future))
+        return aio_future
+
+    def get_approximate_size(self):
+        return self.size + sum(len(begin) + len(end) for begin, end in self.reads)
+
+    # Commit
+
+    def validate(self):
+        if self.size > found.MAX_SIZE_TRANSACTION:
+            raise FoundException(ERROR_TRANSACTION_TOO_LARGE)
+        for kind, key, param in self.mutations:
+            if len(key) > found.MAX_SIZE_KEY:
+                raise FoundException(ERROR_KEY_TOO_LARGE)
+            if kind == "set" and len(param) > found.MAX_SIZE_VALUE:
+                raise FoundException(ERROR_VALUE_TOO_LARGE)
+
+    def commit(self):
+        self.check()
+        store = self.store
+        self.conflicting = []
+        if not self.mutations and not self.writes:
+            # Read-only transactions commit without a version.
+            self.committed_version = -1
+            self.activate_watches()
+            return
+        self.validate()
+        version = self.version()
+        conflicting = store.conflicts(version, self.reads)
+        if conflicting:
+            self.conflicting = conflicting
+            raise FoundException(ERROR_NOT_COMMITTED)
+        version = store.next_version()
+        self.versionstamp = struct.pack(">QH", version, 0)
+        for kind, key, param in self.mutations:
+            if kind == "set":
+                self.apply(key, version, param)
+            elif kind == "clear":
+                self.apply(key, version, None)
+            elif kind == "clear_range":
+                low = bisect.bisect_left(store.keys, key)
+                high = bisect.bisect_left(store.keys, param)
+                for cleared in store.keys[low:high]:
+                    self.apply(cleared, version, None)
+            elif kind == "atomic":
+                opcode, param = param
+                self.apply(key, version, _ATOMICS[opcode](store.read(key, version), param))
+            elif kind == "versionstamped_key":
+                key = _fill_versionstamp(key, self.versionstamp)
+                self.writes.append((key, _after(key)))
+                self.apply(key, version, param)
+            else:
+                self.apply(key, version, _fill_versionstamp(param, self.versionstamp))
+        store.log.append((version, self.writes))
+        oldest = store.oldest_version()
+        while store.log and store.log[0][0] <= oldest:
+            store.log.pop(0)
+        if store.tombstones > len(store.keys) // 2:
+            store.compact()
+        self.committed_version = version
+        self.activate_watches()
+
+    def apply(self, key, version, value):
+        store = self.store
+        store.write(key, version, value)
+        store.notify(key, value)
+
+    def activate_watches(self):
+        for key, aio_future in self.watches:
+            if aio_future.done():
+                continue
+            value = self.store.read(key, self.store.now())
+            self.store.watches.setdefault(key, []).append((value, aio_future))
+        self.watches = []
+
+    def get_committed_version(self):
+        return self.committed_version
+
+    def get_versionstamp(self):
+        return self.versionstamp
+
+    def on_error(self, code):
+        if code not in _RETRYABLE:
+            raise FoundException(code)
+        self.cancel()
+        self.reset()
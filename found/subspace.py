@@ -0,0 +1,81 @@
+"""Subspaces: the keys below a constant, pre-packed prefix."""
+
+#
+# found/subspace.py
+#
+# This source file is part of the asyncio-foundationdb open source project
+#
+# Copyright 2026 Amirouche Boubekki <amirouche@hyper.dev>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+from found.base import next_prefix
+from found.tuple import pack, pack_with_versionstamp, unpack_from
+
+
+class Subspace:
+    """The keys that start with ``raw + pack(prefix)``.
+
+    The prefix is packed once, when the subspace is created, instead of on
+    every call: ``subspace.pack(suffix) == raw + pack(prefix + suffix)``.
+    """
+
+    __slots__ = ("raw",)
+
+    def __init__(self, prefix=(), raw=b""):
+        self.raw = raw + pack(tuple(prefix))
+
+    def __repr__(self):
+        return "Subspace(raw={!r})".format(self.raw)
+
+    def __eq__(self, other):
+        return isinstance(other, Subspace) and self.raw == other.raw
+
+    def __hash__(self):
+        return hash(self.raw)
+
+    def __getitem__(self, item):
+        return Subspace((item,), self.raw)
+
+    def subspace(self, suffix):
+        """Return the subspace of the keys that start with ``self.pack(suffix)``."""
+        return Subspace(suffix, self.raw)
+
+    def key(self):
+        """Return the packed prefix."""
+        return self.raw
+
+    def pack(self, suffix=(), cache=None):
+        """Return the key of the tuple ``suffix`` in the subspace."""
+        return self.raw + pack(suffix, cache)
+
+    def pack_with_versionstamp(self, suffix, cache=None):
+        """Like ``found.pack_with_versionstamp``, the offset counts the prefix."""
+        return pack_with_versionstamp(suffix, prefix=self.raw, cache=cache)
+
+    def contains(self, key):
+        return key.startswith(self.raw)
+
+    def unpack(self, key):
+        """Return the tuple of ``key`` without the prefix, that is not decoded."""
+        if key.__class__ is not bytes:
+            key = bytes(key)
+        if not key.startswith(self.raw):
+            raise ValueError("Key is not in the subspace: {!r}".format(key))
+        return unpack_from(key, len(self.raw))
+
+    def range(self, suffix=()):
+        """Return the ``begin`` and ``end`` keys of the tuples that start with
+        ``suffix``, e.g. ``found.query(tx, *subspace.range())``."""
+        begin = self.raw + pack(suffix)
+        return begin, next_prefix(begin)
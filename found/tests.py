@@ -1,4 +1,9 @@
 import asyncio
+import builtins
+import itertools
+import os
+import struct
+import time
 import uuid as _uuid_mod
 from uuid import uuid4
 
@@ -9,13 +14,17 @@ try:
     from fdb import tuple as fdb_tuple
 
     _FDB_AVAILABLE = True
-except AttributeError:
+except Exception:
     # PyPy: fdb.impl accesses ctypes.pythonapi which PyPy's ctypes doesn't expose.
+    # Without libfdb_c, fdb.impl raises a plain Exception: "Unable to locate the
+    # FoundationDB API shared library!", and the fdb bindings may be missing.
     fdb_tuple = None  # type: ignore[assignment]
     _FDB_AVAILABLE = False
 
 import found
 import found.base
+import found.memory
+import found.tuple
 from found.ext import bstore, eavstore, nstore, vnstore
 from found.ext.nstore import var
 from found.tuple import (
@@ -31,20 +40,125 @@ from found.tuple import (
     VERSIONSTAMP_CODE,
 )
 
+# found.unpack uses the found._tuple accelerator when it is compiled, the
+# tuple tests run against both decoders.
+_UNPACK_IMPLEMENTATIONS = [
+    pytest.param(found.tuple._unpack_python, id="python"),
+    pytest.param(
+        found.tuple._unpack_native,
+        id="native",
+        marks=pytest.mark.skipif(found.tuple._lib is None, reason="found._tuple not compiled"),
+    ),
+]
+
 
-def test_pack_unpack():
+@pytest.mark.parametrize("unpack", _UNPACK_IMPLEMENTATIONS)
+def test_pack_unpack(unpack):
     value = (
         (None, False, True, b"x42", 1, -1, 3.1415, -3.1415, ("abc",)),
         ("d", "e", "f"),
         2.718281828459045,
     )
-    assert found.unpack(found.pack(value)) == value
+    assert unpack(found.pack(value)) == value
+
+
+@pytest.mark.parametrize("unpack", _UNPACK_IMPLEMENTATIONS)
+def test_unpack_flat(unpack):
+    value = (
+        None, False, True, b"x\x00y", "a\x00b", 0, 255, -256, 2**64, -(2**64), 0.5, -0.0,
+        _uuid_mod.UUID(int=42), found.Versionstamp(b"\x02" * 10, 3), (1, None, ("x",)),
+    )
+    assert unpack(found.pack(value)) == value
+    # more elements than the accelerator scratch space
+    assert unpack(found.pack(tuple(range(100)))) == tuple(range(100))
+
+
+@pytest.mark.parametrize("unpack", _UNPACK_IMPLEMENTATIONS)
+def test_unpack_malformed(unpack):
+    with pytest.raises(ValueError):
+        unpack(b"\x42")
+    # a truncated string is accepted by both decoders, like fdb.tuple does
+    assert unpack(b"\x02abc") == ("abc",)
+
+
+@pytest.mark.parametrize("unpack", _UNPACK_IMPLEMENTATIONS)
+def test_unpack_offset(unpack):
+    prefix = found.pack(("prefix", b"\x00", 2**64))
+    value = ("a\x00b", -256, 2**64, _uuid_mod.UUID(int=42), (1, None))
+    assert unpack(prefix + found.pack(value), len(prefix)) == value
+    assert unpack(prefix, len(prefix)) == ()
+
+
+def test_unpack_from():
+    from found.tuple import iter_unpack, unpack_from
+
+    key = found.pack(("prefix", 42, "x", None, b"y"))
+    offset = len(found.pack(("prefix",)))
+    assert unpack_from(key) == found.unpack(key)
+    assert unpack_from(key, offset) == (42, "x", None, b"y")
+    assert unpack_from(key, offset, 2) == (42, "x")
+    assert unpack_from(key, offset, 10) == (42, "x", None, b"y")
+    assert unpack_from(key, len(key)) == ()
+    # only the consumed elements are decoded
+    elements = iter_unpack(key + b"\x42", offset)
+    assert next(elements) == 42
+    assert list(itertools.islice(elements, 3)) == ["x", None, b"y"]
+    with pytest.raises(ValueError):
+        next(elements)
+
 
+def test_pack_many():
+    from found.tuple import pack_many, unpack_many
 
-def test_versionstamp_pack_roundtrip():
+    uid = _uuid_mod.UUID(int=42)
+    tuples = [(uid, "title", 1), ("title", 1, uid), (1, uid, "title")]
+    prefix = found.pack(("prefix",))
+    keys = pack_many(tuples, prefix=prefix)
+    assert keys == [prefix + found.pack(t) for t in tuples]
+    assert unpack_many(keys, skip_prefix=prefix) == tuples
+    assert unpack_many(keys) == [("prefix",) + t for t in tuples]
+    with pytest.raises(ValueError):
+        unpack_many(keys, skip_prefix=found.pack(("other",)))
+    # equal elements of different types are encoded apart
+    assert pack_many([(1, True, 1.0, 0.0, -0.0)]) == [found.pack((1, True, 1.0, 0.0, -0.0))]
+    # the elements of the tuples that are generated on the fly
+    generated = pack_many((str(x), (x,)) for x in range(100))
+    assert generated == [found.pack((str(x), (x,))) for x in range(100)]
+
+
+def test_encoder_cache():
+    uid = _uuid_mod.UUID(int=42)
+    value = ("type", b"\x00", uid, 1, True, 1.0, -0.0, ("type",))
+    cache = found.EncoderCache(max_entries=2)
+    assert found.pack(value, cache) == found.pack(value)
+    # only str, bytes and UUID are cached
+    assert (cache.hits, cache.misses) == (0, 3)
+    assert builtins.list(cache.entries) == [(bytes, b"\x00"), (_uuid_mod.UUID, uid)]
+    assert found.pack(("x", uid), cache) == found.pack(("x", uid))
+    assert (cache.hits, cache.misses) == (1, 4)
+    assert cache.hit_rate == 0.2
+    cache.clear()
+    assert (cache.hits, cache.misses, cache.hit_rate) == (0, 0, 0.0)
+
+    try:
+        cache = found.enable_encoder_cache()
+        assert found.enable_encoder_cache() is cache
+        found.pack(("type",))
+        found.tuple.pack_many([("type", "a"), ("type", "b")])
+        found.Subspace(("type",)).pack(("type",))
+        found.pack(("type",), cache=False)
+        assert (cache.hits, cache.misses) == (3, 3)
+    finally:
+        found.disable_encoder_cache()
+    found.pack(("type",))
+    assert cache.hits == 3
+
+
+@pytest.mark.parametrize("unpack", _UNPACK_IMPLEMENTATIONS)
+def test_versionstamp_pack_roundtrip(unpack):
     vs = found.Versionstamp(b"\x01" * 10, 7)
     packed = found.pack((vs, b"after"))
-    result = found.unpack(packed)
+    result = unpack(packed)
     assert result[0] == vs
     assert result[1] == b"after"
 
@@ -115,7 +229,8 @@ _FDB_COMPAT_CASES = [
 
 
 @pytest.mark.skipif(not _FDB_AVAILABLE, reason="fdb.impl unavailable on PyPy")
-def test_pack_matches_fdb_tuple():
+@pytest.mark.parametrize("unpack", _UNPACK_IMPLEMENTATIONS)
+def test_pack_matches_fdb_tuple(unpack):
     """found.pack output must be byte-for-byte identical to fdb.tuple.pack."""
     for t in _FDB_COMPAT_CASES:
         expected = fdb_tuple.pack(t)
@@ -124,15 +239,17 @@ def test_pack_matches_fdb_tuple():
             f"pack mismatch for {t!r}: "
             f"fdb={expected.hex()!r} found={actual.hex()!r}"
         )
+        assert unpack(actual) == fdb_tuple.unpack(expected)
 
 
 @pytest.mark.skipif(not _FDB_AVAILABLE, reason="fdb.impl unavailable on PyPy")
-def test_unpack_matches_fdb_tuple():
+@pytest.mark.parametrize("unpack", _UNPACK_IMPLEMENTATIONS)
+def test_unpack_matches_fdb_tuple(unpack):
     """found.unpack must decode bytes produced by fdb.tuple.pack identically."""
     for t in _FDB_COMPAT_CASES:
         raw = fdb_tuple.pack(t)
         fdb_result = fdb_tuple.unpack(raw)
-        found_result = found.unpack(raw)
+        found_result = unpack(raw)
         assert found_result == fdb_result, (
             f"unpack mismatch for {t!r}: "
             f"fdb={fdb_result!r} found={found_result!r}"
@@ -242,8 +359,13 @@ def test_pack_lexicographic_order():
     assert cross == sorted(cross), "cross-type order must follow type-code ordering"
 
 
+# FOUND_BACKEND=memory runs the suite against the in-memory backend, with
+# one store shared by the databases of the tests like a cluster.
+_BACKEND = found.memory.Store() if os.environ.get("FOUND_BACKEND") == "memory" else None
+
+
 async def open():
-    db = await found.open()
+    db = await found.open(backend=_BACKEND)
 
     async def purge(tx):
         await found.clear(tx, b"", b"\xff")
@@ -309,6 +431,596 @@ async def test_get():
     await found.transactional(db, test1)
 
 
+@pytest.mark.asyncio
+async def test_get_concurrent():
+    db = await open()
+
+    async def setup(tx):
+        for number in range(100):
+            await found.set(tx, found.pack((number,)), found.pack((str(number),)))
+
+    await found.transactional(db, setup)
+
+    async def fanout(tx):
+        # many futures in flight resolve through the same completion queue
+        coroutines = (found.get(tx, found.pack((number,))) for number in range(200))
+        return await asyncio.gather(*coroutines)
+
+    out = await found.transactional(db, fanout)
+    assert out[:100] == [found.pack((str(number),)) for number in range(100)]
+    assert out[100:] == [None] * 100
+
+
+def test_completion_queues_release_loops():
+    import gc
+    import weakref
+
+    loops = []
+    for _ in range(5):
+        loop = asyncio.new_event_loop()
+        found.base._completion_queue(loop)
+        loop.close()
+        loops.append(weakref.ref(loop))
+    del loop
+    gc.collect()
+    assert [ref() for ref in loops] == [None] * 5
+
+
+@pytest.mark.skipif(_BACKEND is not None, reason="libfdb_c is not loaded in memory")
+def test_buffers():
+    import threading
+
+    found.base._load_fdb()
+    buffers = found.base._buffers
+    assert buffers.value is buffers.value
+    out = []
+    thread = threading.Thread(target=lambda: out.append(buffers.value))
+    thread.start()
+    thread.join()
+    # each thread has its own out-parameters
+    assert out[0] is not buffers.value
+    assert len(found.base._READERS) == found.base._RESULT_STRING_ARRAY + 1
+
+
+@pytest.mark.skipif(_BACKEND is not None, reason="no callbacks in memory")
+@pytest.mark.asyncio
+async def test_slots():
+    db = await open()
+    free = len(found.base._free_slots)
+
+    async def func(tx):
+        await found.set(tx, b"slot", b"1")
+        assert await found.get(tx, b"slot") == b"1"
+        assert await found.get_many(tx, [b"slot", b"other"]) == [b"1", None]
+        return await found.all(found.query(tx, b"", b"\xff"))
+
+    assert await found.transactional(db, func) == [(b"slot", b"1")]
+    assert len(found.base._free_slots) == free
+
+    # the table grows when every slot is taken, and the slots are recycled
+    size = len(found.base._slots)
+    params = [found.base._put_slot(index) for index in range(size + 1)]
+    assert len(found.base._slots) == 2 * size
+    assert [found.base._take_slot(param) for param in params] == list(range(size + 1))
+    assert found.base._slots == [None] * 2 * size
+
+
+@pytest.mark.skipif(_BACKEND is not None, reason="no callbacks in memory")
+@pytest.mark.asyncio
+async def test_ready_futures(monkeypatch):
+    db = await open()
+    registered = []
+    register = found.base._register_callback
+
+    def spy(fdb_future, kind, loop, aio_future):
+        registered.append(kind)
+        register(fdb_future, kind, loop, aio_future)
+
+    monkeypatch.setattr(found.base, "_register_callback", spy)
+
+    async def func(tx):
+        await found.set(tx, b"ready", b"1")
+        # read your writes: the futures are ready, and read inline
+        assert await found.get(tx, b"ready") == b"1"
+        assert await found.get_key(tx, found.gte(b"ready")) == b"ready"
+        assert await found.all(found.query(tx, b"ready", b"readz")) == [(b"ready", b"1")]
+
+    await found.transactional(db, func)
+    # only the commit waits on a callback
+    assert registered == [found.base._RESULT_NONE]
+
+
+@pytest.mark.asyncio
+async def test_get_many():
+    db = await open()
+
+    async def setup(tx):
+        for number in range(0, 100, 2):
+            await found.set(tx, found.pack((number,)), found.pack((str(number),)))
+
+    await found.transactional(db, setup)
+
+    async def get_many(tx, keys):
+        return await found.get_many(tx, keys)
+
+    keys = [found.pack((number,)) for number in reversed(range(100))]
+    out = await found.transactional(db, get_many, keys)
+    expected = [found.pack((str(n),)) if n % 2 == 0 else None for n in reversed(range(100))]
+    assert out == expected
+    assert await found.transactional(db, get_many, []) == []
+
+
+@pytest.mark.asyncio
+async def test_read_cache():
+    db = await open()
+
+    async def setup(tx):
+        for number in range(10):
+            await found.set(tx, found.pack((number,)), found.pack((str(number),)))
+
+    await found.transactional(db, setup)
+
+    async def read(tx):
+        return [kv async for kv in found.query(tx, found.pack((0,)), found.pack((5,)))]
+
+    async def func(tx):
+        cache = found.enable_read_cache(tx)
+        assert found.enable_read_cache(tx) is cache
+        assert await found.get(tx, found.pack((1,))) == found.pack(("1",))
+        assert await found.get(tx, found.pack((1,))) == found.pack(("1",))
+        assert await found.get(tx, found.pack((42,))) is None
+        assert await found.get(tx, found.pack((42,))) is None
+        assert (cache.hits, cache.misses) == (2, 2)
+
+        keys = [found.pack((number,)) for number in (1, 2, 42)]
+        assert await found.get_many(tx, keys) == [found.pack(("1",)), found.pack(("2",)), None]
+        assert (cache.hits, cache.misses) == (4, 3)
+
+        before = await read(tx)
+        assert await read(tx) == before
+        assert (cache.hits, cache.misses) == (5, 4)
+
+        # writes are visible through the cache
+        await found.set(tx, found.pack((1,)), b"one")
+        assert await found.get(tx, found.pack((1,))) == b"one"
+        await found.add(tx, found.pack((42,)), b"\x01")
+        assert await found.get(tx, found.pack((42,))) == b"\x01"
+        await found.clear(tx, found.pack((2,)), found.pack((4,)))
+        assert await found.get(tx, found.pack((2,))) is None
+        assert await found.get(tx, found.pack((4,))) == found.pack(("4",))
+        after = await read(tx)
+        assert [found.unpack(key)[0] for key, _ in after] == [0, 1, 4]
+        assert after[1][1] == b"one"
+        return cache
+
+    cache = await found.transactional(db, func)
+    assert (cache.hits, cache.misses) == (5, 9)
+
+
+@pytest.mark.asyncio
+async def test_versioned_cache():
+    db = await open()
+    key = found.pack(("hot",))
+
+    async def setup(tx, value):
+        await found.set(tx, key, value)
+
+    await found.transactional(db, setup, b"v1")
+
+    async def get(tx):
+        return await found.get(tx, key)
+
+    cache = found.VersionedCache(max_staleness=60)
+    assert await found.transactional(db, get, cache=cache) == b"v1"
+    assert await found.transactional(db, get, cache=cache) == b"v1"
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # stale until the entry expires
+    await found.transactional(db, setup, b"v2")
+    assert await found.transactional(db, get, cache=cache) == b"v1"
+    cache.max_staleness = 0
+    assert await found.transactional(db, get, cache=cache) == b"v2"
+
+    # writes through a transaction with the cache evict the entry
+    cache.max_staleness = 60
+    await found.transactional(db, setup, b"v3", cache=cache)
+    assert await found.transactional(db, get, cache=cache) == b"v3"
+
+    # least recently used entries are evicted
+    cache = found.VersionedCache(max_entries=2, max_staleness=60)
+
+    async def get_many(tx):
+        for number in range(3):
+            await found.get(tx, found.pack((number,)))
+
+    await found.transactional(db, get_many, cache=cache)
+    assert list(cache.entries) == [found.pack((1,)), found.pack((2,))]
+
+
+@pytest.mark.asyncio
+async def test_versioned_cache_uncommitted():
+    db = await open()
+    key = found.pack(("hot",))
+    cache = found.VersionedCache(max_staleness=60)
+
+    class Rollback(Exception):
+        pass
+
+    async def write(tx):
+        await found.set(tx, key, b"uncommitted")
+        # read your writes
+        assert await found.get(tx, key) == b"uncommitted"
+        raise Rollback()
+
+    with pytest.raises(Rollback):
+        await found.transactional(db, write, cache=cache)
+    assert key not in cache.entries
+
+    async def get(tx):
+        return await found.get(tx, key)
+
+    assert await found.transactional(db, get, cache=cache) is None
+
+
+@pytest.mark.asyncio
+async def test_versioned_cache_watch():
+    db = await open()
+    key = found.pack(("hot",))
+
+    async def setup(tx, value):
+        await found.set(tx, key, value)
+
+    async def get(tx):
+        return await found.get(tx, key)
+
+    await found.transactional(db, setup, b"v1")
+    cache = found.VersionedCache(watch=True)
+    assert await found.transactional(db, get, cache=cache) == b"v1"
+    task = cache.watches[key]
+    await asyncio.sleep(0.1)
+    assert await found.transactional(db, get, cache=cache) == b"v1"
+    await found.transactional(db, setup, b"v2")
+    await asyncio.wait_for(task, timeout=5.0)
+    assert key not in cache.entries
+    assert await found.transactional(db, get, cache=cache) == b"v2"
+    cache.clear()
+    assert not cache.watches
+
+
+@pytest.mark.asyncio
+async def test_cache_read_version(monkeypatch):
+    db = await open()
+    key = found.pack(("grv",))
+    cache = found.cache_read_version(db, interval=60)
+    sizes = []
+    get_approximate_size = found.base.get_approximate_size
+
+    async def spy(tx):
+        sizes.append(tx)
+        return await get_approximate_size(tx)
+
+    monkeypatch.setattr(found.base, "get_approximate_size", spy)
+    try:
+        await asyncio.sleep(0.1)
+        version = cache.version
+        assert version is not None
+
+        async def read(tx):
+            return await found.read_version(tx), await found.get(tx, key)
+
+        assert await found.transactional(db, read, snapshot=True) == (version, None)
+        assert await found.transactional(db, read, snapshot=True) == (version, None)
+        assert cache.hits == 2
+        # read-write transactions get their own read version
+        assert (await found.transactional(db, read))[0] >= version
+        assert cache.hits == 2
+
+        async def write(tx):
+            await found.set(tx, key, b"value")
+
+        # the writes of this process are visible
+        await found.transactional(db, write)
+        assert cache.version > version
+        assert (await found.transactional(db, read, snapshot=True))[1] == b"value"
+
+        # a version that is too old is not used
+        cache.max_age = 0
+        assert (await found.transactional(db, read, snapshot=True))[0] >= cache.version
+        assert cache.misses == 1
+        # the hook does not read commit_bytes, that costs a round trip
+        assert sizes == []
+    finally:
+        cache.close()
+    assert db.hooks.on_begin == []
+
+
+@pytest.mark.asyncio
+async def test_batch_writer():
+    db = await open()
+    commits = []
+
+    async def on_post_commit(tx, stats):
+        commits.append(stats)
+
+    db.hooks.on_post_commit.append(on_post_commit)
+    writer = found.BatchWriter(db, max_batch_bytes=1000, max_delay=0.01)
+
+    # the writes of a batch would share one versionstamp
+    for op in (found.set_versionstamped_key, found.set_versionstamped_value):
+        with pytest.raises(ValueError):
+            await writer.write(op, b"key", b"value" + b"\x00" * 4)
+
+    async def producer(number):
+        await writer.write(found.set, found.pack(("batch", number)), b"x" * 10)
+        await writer.write(found.add, found.pack(("counter",)), (1).to_bytes(8, "little"))
+
+    await asyncio.gather(*(producer(number) for number in range(100)))
+    # 100 sets of 23 bytes, then 100 adds, fit in a few batches
+    assert 2 < len(commits) < 10
+
+    await writer.write(found.clear, found.pack(("batch", 0)), found.pack(("batch", 50)))
+    await writer.flush()
+    assert not writer.commits
+
+    async def read(tx):
+        begin, end = found.pack(("batch",)), found.next_prefix(found.pack(("batch",)))
+        count = len(await found.all(found.query(tx, begin, end)))
+        return count, await found.get(tx, found.pack(("counter",)))
+
+    assert await found.transactional(db, read) == (50, (100).to_bytes(8, "little"))
+
+
+@pytest.mark.asyncio
+async def test_transactional_retry_budget():
+    db = await open()
+    key = found.pack(("hot",))
+    attempts = []
+
+    async def bump(tx):
+        await found.set(tx, key, found.pack((len(attempts),)))
+
+    async def conflict(tx):
+        attempts.append(tx)
+        await found.get(tx, key)
+        await found.set(tx, found.pack(("other",)), b"")
+        # Another transaction changes the key that was read
+        await found.transactional(db, bump)
+
+    with pytest.raises(found.RetryBudgetExhausted) as exc:
+        await found.transactional(db, conflict, retry_limit=2)
+    assert exc.value.code == 1020
+    assert exc.value.stats.retries == 2
+    assert len(attempts) == 3
+    assert isinstance(exc.value, found.FoundException)
+
+    attempts.clear()
+    with pytest.raises(found.RetryBudgetExhausted) as exc:
+        await found.transactional(db, conflict, deadline=0.2, backoff=0.01, max_backoff=0.05)
+    assert 0.2 <= exc.value.stats.elapsed < 1
+    assert len(attempts) == exc.value.stats.retries + 1
+
+    # the backoff does not delay an exhausted budget, nor wait past the deadline
+    start = time.monotonic()
+    with pytest.raises(found.RetryBudgetExhausted):
+        await found.transactional(db, conflict, retry_limit=0, backoff=30, max_backoff=30)
+    with pytest.raises(found.RetryBudgetExhausted):
+        await found.transactional(db, conflict, deadline=0.2, backoff=30, max_backoff=30)
+    assert time.monotonic() - start < 1
+
+
+@pytest.mark.asyncio
+async def test_transactional_report_conflicting_keys():
+    db = await open()
+    key = found.pack(("hot",))
+    posted = []
+
+    async def on_post_commit(tx, stats):
+        posted.append(stats)
+
+    async def bump(tx):
+        await found.set(tx, key, b"")
+
+    async def conflict_once(tx, attempts):
+        attempts.append(tx)
+        await found.get(tx, key)
+        await found.set(tx, found.pack(("other",)), b"")
+        if len(attempts) == 1:
+            await found.transactional(db, bump)
+
+    db.hooks.on_post_commit.append(on_post_commit)
+    await found.transactional(db, conflict_once, [], report_conflicting_keys=True)
+    assert posted[-1].retries == 1
+    assert posted[-1].conflicts == ((key, key + b"\x00"),)
+
+    # without the option, nothing is reported
+    await found.transactional(db, conflict_once, [])
+    assert posted[-1].retries == 1
+    assert posted[-1].conflicts == ()
+
+
+@pytest.mark.asyncio
+async def test_transactional_conflicting_keys_failure(monkeypatch):
+    db = await open()
+    key = found.pack(("hot",))
+
+    async def failing(tx):
+        raise found.FoundException(1031)
+
+    monkeypatch.setattr(found.base, "_conflicting_keys", failing)
+
+    async def bump(tx):
+        await found.set(tx, key, b"")
+
+    async def conflict_once(tx, attempts):
+        attempts.append(tx)
+        await found.get(tx, key)
+        await found.set(tx, found.pack(("other",)), b"")
+        if len(attempts) == 1:
+            await found.transactional(db, bump)
+
+    # the commit error, not_committed, is retried
+    attempts = []
+    await found.transactional(db, conflict_once, attempts, report_conflicting_keys=True)
+    assert len(attempts) == 2
+
+
+def test_histogram():
+    histogram = found.Histogram()
+    for value in range(1, 100_001):
+        histogram.record(value)
+        index = found.Histogram.index(value)
+        assert found.Histogram.highest(index) >= value
+        assert found.Histogram.index(found.Histogram.highest(index)) == index
+    assert (histogram.count, histogram.min, histogram.max) == (100_000, 1, 100_000)
+    for percentile in (1, 50, 90, 99, 99.9):
+        expected = percentile * 1000
+        assert expected <= histogram.percentile(percentile) <= expected * 1.0625
+    assert histogram.percentile(100) == 100_000
+    assert found.Histogram().percentile(50) == 0
+
+
+@pytest.mark.asyncio
+async def test_metrics():
+    db = await open()
+    metrics = found.enable_metrics()
+    try:
+        assert found.enable_metrics() is metrics
+
+        async def func(tx):
+            await found.set(tx, b"metrics", b"value")
+            assert await found.get(tx, b"metrics") == b"value"
+            await found.all(found.query(tx, b"metrics", b"metrics\xff"))
+
+        await found.transactional(db, func)
+    finally:
+        found.disable_metrics()
+
+    out = metrics.to_dict()
+    assert out["write"] == dict(bytes=len(b"metrics") + len(b"value"))
+    assert out["get"]["bytes"] == len(b"value")
+    assert out["query"]["bytes"] == len(b"metrics") + len(b"value")
+    for operation in ("get", "query", "commit"):
+        assert out[operation]["count"] == 1
+        assert 0 < out[operation]["min"] == out[operation]["p50"] == out[operation]["max"]
+
+    text = metrics.to_prometheus()
+    assert "# TYPE found_operation_duration_seconds summary\n" in text
+    assert 'found_operation_duration_seconds_count{operation="commit"} 1\n' in text
+    assert 'found_operation_bytes_total{operation="get"} 5\n' in text
+
+    # disabled metrics are not recorded
+    await found.transactional(db, func)
+    assert metrics.to_dict() == out
+
+
+@pytest.mark.skipif(_BACKEND is not None, reason="no network thread in memory")
+@pytest.mark.asyncio
+async def test_monitor_loop_lag(caplog):
+    db = await open()
+    lag = found.monitor_loop_lag(threshold=0.05)
+    try:
+        assert found.monitor_loop_lag(threshold=0.05) is lag
+
+        # read_version, unlike get, is never ready right away, hence its
+        # result always goes through the network thread.
+        async def get(tx):
+            return await found.read_version(tx)
+
+        await found.transactional(db, get)
+        count = lag.histogram.count
+        assert count > 0
+        assert lag.slow == 0
+
+        async def busy():
+            time.sleep(0.1)
+
+        async def read(tx):
+            # The result is ready while the loop is busy, before it drains
+            # the results of the network thread
+            busy_task = asyncio.ensure_future(busy())
+            out = await found.read_version(tx)
+            await busy_task
+            return out
+
+        with caplog.at_level("WARNING", logger="found.base"):
+            await found.transactional(db, read)
+        assert lag.slow >= 1
+        assert lag.histogram.max >= 0.05 * 1e9
+        assert "event loop lag" in caplog.text
+    finally:
+        lag.close()
+
+    count = lag.histogram.count
+    await found.transactional(db, get)
+    assert lag.histogram.count == count
+
+
+@pytest.mark.asyncio
+async def test_tracing():
+    db = await open()
+    store = nstore.make("test-tracing", [42], 2)
+    exporter = found.InMemoryExporter()
+    found.set_span_exporter(exporter)
+    try:
+        attempts = []
+
+        async def func(tx):
+            attempts.append(tx)
+            await nstore.add(tx, store, "a", "b")
+            assert await found.get(tx, b"tracing") is None
+            await found.all(nstore.select(tx, store, "a", var("b")))
+            if len(attempts) == 1:
+                raise found.FoundException(1020)
+
+        await found.transactional(db, func)
+    finally:
+        found.set_span_exporter(None)
+
+    first, second = [span for span in exporter.spans if span.name == "found.transactional"]
+    assert first.attributes["retry"] == 0 and isinstance(first.error, found.FoundException)
+    assert second.attributes["retry"] == 1 and second.error is None
+    children = [span.name for span in exporter.spans if span.parent is second]
+    assert children == ["found.get", "found.query", "nstore.select", "found.commit"]
+    assert all(span.end_time >= span.start_time for span in exporter.spans)
+    on_error = [span for span in exporter.spans if span.name == "found.on_error"]
+    assert on_error[0].parent is None
+
+    # disabled tracing records nothing
+    count = len(exporter.spans)
+    attempts.clear()
+    await found.transactional(db, func)
+    assert len(exporter.spans) == count
+
+
+@pytest.mark.asyncio
+async def test_tracing_opentelemetry():
+    pytest.importorskip("opentelemetry.sdk")
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+    from found.ext import otel
+
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    db = await open()
+    otel.install(provider.get_tracer("test"))
+    try:
+
+        async def func(tx):
+            await found.get(tx, b"tracing")
+
+        await found.transactional(db, func)
+    finally:
+        found.set_span_exporter(None)
+
+    spans = {span.name: span for span in exporter.get_finished_spans()}
+    assert builtins.set(spans) == {"found.transactional", "found.get", "found.commit"}
+    assert spans["found.get"].parent.span_id == spans["found.transactional"].context.span_id
+    assert spans["found.get"].attributes["bytes"] == 0
+
+
 @pytest.mark.asyncio
 async def test_query():
     # prepare
@@ -331,6 +1043,95 @@ async def test_query():
         assert found.unpack(value)[0] == str(index)
 
 
+@pytest.mark.asyncio
+async def test_query_zero_copy():
+    db = await open()
+
+    async def set(tx):
+        for number in range(10):
+            await found.set(tx, found.pack((number,)), found.pack((str(number),)))
+
+    await found.transactional(db, set)
+
+    async def query(tx):
+        out = found.query(tx, found.pack((1,)), found.pack((8,)), zero_copy=True)
+        return [(key, value) async for key, value in out]
+
+    out = await found.transactional(db, query)
+    assert [type(key) for key, _ in out] == [memoryview] * 7
+    assert [found.unpack(bytes(key))[0] for key, _ in out] == list(range(1, 8))
+    assert [found.unpack(bytes(value))[0] for _, value in out] == [str(x) for x in range(1, 8)]
+    with pytest.raises(TypeError):
+        out[0][1][0] = 0
+    # the slices are valid after the batch is read, and the tuple layer
+    # accepts them
+    import gc
+
+    gc.collect()
+    assert [found.unpack(key) for key, _ in out] == [(x,) for x in range(1, 8)]
+    assert [found.tuple.unpack_from(key, 0, 1) for key, _ in out] == [(x,) for x in range(1, 8)]
+    assert found.tuple.unpack_many([key for key, _ in out]) == [(x,) for x in range(1, 8)]
+    assert list(found.tuple.iter_unpack(out[0][1])) == ["1"]
+
+
+@pytest.mark.asyncio
+async def test_query_prefetch():
+    db = await open()
+
+    async def set(tx):
+        for number in range(100):
+            await found.set(tx, found.pack((number,)), found.pack((str(number),)))
+
+    await found.transactional(db, set)
+
+    async def query(tx, **kwargs):
+        out = found.query(tx, found.pack((10,)), found.pack((90,)), **kwargs)
+        return [found.unpack(key)[0] async for key, _ in out]
+
+    expected = list(range(10, 90))
+    for prefetch in (1, 2, 8):
+        out = await found.transactional(db, query, prefetch=prefetch)
+        assert out == expected
+        out = await found.transactional(db, query, prefetch=prefetch, limit=25)
+        assert out == expected[:25]
+        out = await found.transactional(db, query, prefetch=prefetch, reverse=True)
+        assert out == expected[::-1]
+
+    async def head(tx):
+        out = []
+        async for key, _ in found.query(tx, found.pack((0,)), found.pack((100,)), prefetch=4):
+            out.append(found.unpack(key)[0])
+            if len(out) == 5:
+                break
+        return out
+
+    assert await found.transactional(db, head) == list(range(5))
+
+    # at most prefetch batches are read ahead of the one that is consumed
+    requested = []
+
+    async def batches(tx, begin, end, limit, reverse, mode, kind):
+        for index in range(20):
+            requested.append(index)
+            yield [(index, None)]
+
+    async def bounded(tx, prefetch):
+        async for index, _ in found.query(tx, b"a", b"b", prefetch=prefetch):
+            for _ in range(10):
+                await asyncio.sleep(0)
+            assert len(requested) <= index + 1 + prefetch
+
+    query_batches = found.base._query_batches
+    found.base._query_batches = batches
+    try:
+        for prefetch in (1, 3):
+            requested.clear()
+            await found.transactional(db, bounded, prefetch)
+            assert len(requested) == 20
+    finally:
+        found.base._query_batches = query_batches
+
+
 @pytest.mark.asyncio
 async def test_query_reverse():
     # prepare
@@ -423,6 +1224,82 @@ async def test_get_range_split_points():
         assert begin <= key <= end
 
 
+@pytest.mark.asyncio
+async def test_parallel_query():
+    db = await open()
+
+    async def setup(tx):
+        for number in range(100):
+            await found.set(tx, found.pack((number,)), b"\x00" * 100)
+
+    await found.transactional(db, setup)
+
+    expected = [(found.pack((number,)), b"\x00" * 100) for number in range(10, 90)]
+    begin = found.pack((10,))
+    end = found.pack((90,))
+
+    async def ordered(tx):
+        out = found.parallel_query(tx, begin, end, 1000, 4)
+        return await found.all(out)
+
+    assert await found.transactional(db, ordered) == expected
+
+    async def unordered(tx):
+        out = found.parallel_query(tx, begin, end, 1000, 4, ordered=False)
+        return await found.all(out)
+
+    assert sorted(await found.transactional(db, unordered)) == expected
+
+    async def first(tx):
+        # stopping early cancels the shards still in flight
+        out = found.parallel_query(tx, begin, end, 1000, 4)
+        return await found.all(found.limit(out, 3))
+
+    assert await found.transactional(db, first) == expected[:3]
+
+    async def duplicates(tx):
+        # a shard between duplicate split points is empty
+        middle = found.pack((50,))
+        get_range_split_points = found.base.get_range_split_points
+
+        async def points(tx, begin, end, chunk_size):
+            return [begin, middle, middle, end]
+
+        found.base.get_range_split_points = points
+        try:
+            return await found.all(found.parallel_query(tx, begin, end, 1000, 4))
+        finally:
+            found.base.get_range_split_points = get_range_split_points
+
+    assert await found.transactional(db, duplicates) == expected
+
+    async def bounded(tx):
+        started = []
+        query_shard = found.base._query_shard
+
+        async def spy(tx, begin, end, mode):
+            started.append(end)
+            return await query_shard(tx, begin, end, mode)
+
+        found.base._query_shard = spy
+        try:
+            async for key, _ in found.parallel_query(tx, begin, end, 1000, 2):
+                # let the shards that are scheduled start
+                await asyncio.sleep(0)
+                # the shards that are read, or not yet consumed
+                held = [shard_end for shard_end in started if shard_end > key]
+                assert len(held) <= 2
+        finally:
+            found.base._query_shard = query_shard
+        # a cluster may not split so little data: there may be one shard
+        points = await found.get_range_split_points(tx, begin, end, 1000)
+        shards = len({point for point in points if begin < point < end}) + 1
+        return len(started), shards
+
+    started, shards = await found.transactional(db, bounded)
+    assert started == shards
+
+
 @pytest.mark.asyncio
 async def test_estimated_size_bytes():
     # prepare
@@ -778,6 +1655,102 @@ async def test_bstore_idempotent():
 # eavstore tests
 
 
+def test_codec():
+    import random
+
+    from found import codec
+
+    rng = random.Random(42)
+    schema = codec.Schema((codec.UUID, codec.INT64, codec.string(8), None))
+    strings = ["", "a", "a\x00", "a\x00b", "a\x01", "ab", "\x00", "é", "\uffff", "z" * 8]
+    integers = [-(2**63), -256, -1, 0, 1, 255, 2**63 - 1]
+    rows = [
+        (
+            _uuid_mod.UUID(int=rng.choice([0, 1, 2**127])),
+            rng.choice(integers),
+            rng.choice(strings),
+            rng.choice([None, 1, "x", (1, "y")]),
+        )
+        for _ in range(500)
+    ]
+    # the keys sort like the keys of the tuple layer
+    ordered = sorted(rows, key=lambda row: schema.pack(row))
+    assert [found.pack(row) for row in ordered] == sorted(found.pack(row) for row in rows)
+    for row in rows:
+        key = schema.pack(row, b"prefix")
+        assert schema.unpack_columns(key, len(b"prefix")) == row
+        assert schema.unpack_columns(key, len(schema.pack(row[:2], b"prefix")), first=2) == row[2:]
+    # smaller when the widths fit the values
+    row = (_uuid_mod.UUID(int=42), 42, "title", None)
+    small = codec.Schema((codec.UUID, codec.integer(2), codec.string(5), None))
+    assert len(small.pack(row)) < len(found.pack(row))
+    assert small.unpack_columns(small.pack(row)) == row
+    permuted = schema.permute((2, 0, 1, 3))
+    assert permuted == codec.Schema((codec.string(8), codec.UUID, codec.INT64, None))
+
+    for column, value in [
+        (codec.UUID, "uid"),
+        (codec.INT64, True),
+        (codec.INT64, 2**63),
+        (codec.integer(1), 128),
+        (codec.integer(1), -129),
+        (codec.string(2), "abc"),
+        (codec.string(2), b"ab"),
+    ]:
+        with pytest.raises(ValueError):
+            column.encode(value)
+    with pytest.raises(ValueError):
+        codec.string(256)
+    with pytest.raises(ValueError):
+        codec.integer(9)
+    with pytest.raises(ValueError):
+        schema.pack((None,) * 5)
+    with pytest.raises(ValueError):
+        schema.unpack_columns(schema.pack(row) + b"\x00")
+
+    versionstamp = found.Versionstamp.incomplete()
+    key = codec.Schema((codec.UUID, None)).pack_with_versionstamp((row[0], versionstamp), b"p")
+    assert key == found.pack_with_versionstamp((versionstamp,), prefix=b"p" + row[0].bytes)
+
+
+@pytest.mark.asyncio
+async def test_codec_stores():
+    from found import codec
+
+    db = await open()
+    schema = (codec.UUID, codec.string(16), None)
+    ntest = nstore.make("test-codec", ["codec"], 3, schema=schema)
+    store = eavstore.make("test-codec", ["eav"], schema=schema)
+    uid = uuid4()
+
+    async def prepare(tx):
+        await nstore.add(tx, ntest, uid, "title", "hyper.dev", value=b"value")
+        await nstore.add(tx, ntest, uid, "keyword", "scheme")
+        await eavstore.create(tx, store, dict(title="hyper.dev", stars=42), uid)
+
+    async def query(tx):
+        assert await nstore.get(tx, ntest, uid, "title", "hyper.dev") == b"value"
+        out = await found.all(nstore.select(tx, ntest, var("uid"), var("key"), "scheme"))
+        assert out == [dict(uid=uid, key="keyword")]
+        out = await found.all(nstore.select(tx, ntest, uid, var("key"), var("value")))
+        assert out == [dict(key="keyword", value="scheme"), dict(key="title", value="hyper.dev")]
+        assert await eavstore.get(tx, store, uid) == dict(title="hyper.dev", stars=42)
+        assert await found.all(eavstore.query(tx, store, "stars", 42)) == [uid]
+
+    await found.transactional(db, prepare)
+    await found.transactional(db, query)
+
+    await found.transactional(db, nstore.remove, ntest, uid, "keyword", "scheme")
+    await found.transactional(db, eavstore.remove, store, uid)
+
+    async def check(tx):
+        out = await found.all(nstore.select(tx, ntest, uid, var("key"), var("value")))
+        assert out == [dict(key="title", value="hyper.dev")]
+        assert await eavstore.get(tx, store, uid) == dict()
+
+    await found.transactional(db, check)
+
+
 @pytest.mark.asyncio
 async def test_eavstore_crud():
     db = await open()
@@ -983,6 +1956,128 @@ async def test_atomic_add():
     assert out == 5
 
 
+@pytest.mark.asyncio
+async def test_memory_backend():
+    store = found.memory.Store()
+    db = await found.open(backend=store)
+    other = await found.open(backend=store)
+
+    await found.transactional(db, found.set, b"a", b"1")
+    assert await found.transactional(other, found.get, b"a") == b"1"
+
+    # reads see the transaction's own writes, and the versions read at
+    tx = found.base.make_transaction(db)
+    older = found.base.make_transaction(db)
+    await found.read_version(older)
+    await found.set(tx, b"b", b"2")
+    await found.add(tx, b"c", struct.pack("<q", 3))
+    await found.add(tx, b"c", struct.pack("<q", 4))
+    assert await found.get(tx, b"c") == struct.pack("<q", 7)
+    await found.clear(tx, b"a", b"b")
+    assert await found.all(found.query(tx, b"", b"\xff")) == [
+        (b"b", b"2"),
+        (b"c", struct.pack("<q", 7)),
+    ]
+    assert await found.get_key(tx, found.gt(b"b")) == b"c"
+    assert await found.get_key(tx, found.lt(b"b")) == b""
+    await found.commit(tx)
+    assert await found.get(older, b"a") == b"1"
+    assert await found.get(older, b"b") is None
+
+    # write after read of another transaction conflicts
+    tx = found.base.make_transaction(db)
+    assert await found.get(tx, b"b") == b"2"
+    await found.transactional(other, found.set, b"b", b"3")
+    await found.set(tx, b"d", b"4")
+    with pytest.raises(found.FoundException) as error:
+        await found.commit(tx)
+    assert error.value.code == 1020
+    await found.on_error(tx, error.value.code)
+    assert await found.get(tx, b"b") == b"3"
+    await found.commit(tx)
+
+    # versionstamps and watches
+    tx = found.base.make_transaction(db)
+    key = found.pack_with_versionstamp(("stamp", found.Versionstamp()))
+    await found.set_versionstamped_key(tx, key, b"")
+    await found.commit(tx)
+    versionstamp = await found.get_versionstamp(tx)
+    assert found.base.get_committed_version(tx) > 0
+
+    async def stamps(tx):
+        return await found.all(found.query(tx, b"\x02stamp", b"\x02stamq"))
+
+    stamps = await found.transactional(db, stamps)
+    (stamp,) = [found.unpack(key)[1] for key, _ in stamps]
+    assert stamp.tr_version == versionstamp
+
+    tx = found.base.make_transaction(db)
+    watch = await found.watch(tx, b"b")
+    await found.commit(tx)
+    await found.transactional(other, found.set, b"b", b"3")
+    assert not watch.done()
+    await found.transactional(other, found.set, b"b", b"5")
+    await asyncio.wait_for(watch, timeout=1.0)
+
+
+@pytest.mark.asyncio
+async def test_bench():
+    import found.bench
+
+    db = await found.open(backend="memory")
+    out = await found.bench.run(db, "memory", rounds=2, warmup=0, filters=["pack", "nstore.add"])
+    labels = [result["label"] for result in out["results"]]
+    assert labels == ["pack", "unpack", "nstore.add"]
+    for result in out["results"]:
+        assert result["operations"] > 0
+        latency = result["latency"]
+        names = ("min", "p50", "p90", "p99", "max")
+        rounds = [latency["round_mean_" + name] for name in names]
+        assert rounds == sorted(rounds)
+        assert rounds[0] <= latency["mean"] <= rounds[-1]
+    # only the benchmark prefix is written, and it is cleared
+
+    async def everything(tx):
+        return await found.all(found.query(tx, b"", b"\xff"))
+
+    assert await found.transactional(db, everything) == []
+    report = found.bench.compare(out, out)
+    assert len(report) == 3 and all(line.endswith("+0.0%") for line in report)
+
+
+def test_subspace():
+    from uuid import UUID
+
+    from found.ext import eavstore, nstore
+
+    subspace = found.Subspace(("app", 1))
+    assert subspace.key() == found.pack(("app", 1))
+    assert subspace.pack(("x", None)) == found.pack(("app", 1, "x", None))
+    assert subspace.unpack(found.pack(("app", 1, "x", 2))) == ("x", 2)
+    assert subspace["x"] == found.Subspace(("app", 1, "x"))
+    assert subspace.subspace(("x",)).pack((2,)) == subspace.pack(("x", 2))
+    begin, end = subspace.range(("x",))
+    assert begin == found.pack(("app", 1, "x"))
+    assert end == found.next_prefix(begin)
+    assert subspace.contains(begin) and not subspace.contains(found.pack(("app", 2)))
+    with pytest.raises(ValueError):
+        subspace.unpack(found.pack(("app", 2)))
+    versionstamp = found.Versionstamp.incomplete()
+    assert subspace.pack_with_versionstamp((versionstamp,)) == found.pack_with_versionstamp(
+        ("app", 1, versionstamp)
+    )
+
+    # the stores keep the keys they had before subspaces
+    uid = UUID(int=42)
+    store = nstore.make("test", ("prefix",), 3)
+    for index, permutation in enumerate(store.indices):
+        items = tuple(("a", "b", "c")[i] for i in permutation)
+        assert store.subspaces[index].pack(items) == found.pack(("prefix", index) + items)
+    store = eavstore.make("test", ("prefix",))
+    assert store.data.pack((uid, "key")) == found.pack((store.prefix_data, uid, "key"))
+    assert store.index.pack(("key", 1, uid)) == found.pack((store.prefix_index, "key", 1, uid))
+
+
 def test_next_prefix_all_ff():
     with pytest.raises(ValueError):
         found.next_prefix(b"\xff")
@@ -1082,6 +2177,7 @@ async def test_compare_and_clear():
     assert out == b"match"
 
 
+@pytest.mark.skipif(_BACKEND is not None, reason="libfdb_c is not loaded in memory")
 def test_get_client_version():
     import re
 
@@ -1117,6 +2213,7 @@ async def test_database_set_option():
     found.database_set_option(db, 500, struct.pack("<q", 5000))
 
 
+@pytest.mark.skipif(_BACKEND is not None, reason="libfdb_c is not loaded in memory")
 def test_error_predicate():
     # error code 1020 = not_committed, should be retryable
     assert found.error_predicate(found.ERROR_PREDICATE_RETRYABLE, 1020) is True
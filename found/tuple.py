@@ -18,12 +18,29 @@
 #
 
 import struct
+import threading
 import uuid as _uuid_mod
 from bisect import bisect_left
+from collections import OrderedDict
+
+try:
+    from found._tuple import ffi as _ffi
+    from found._tuple import lib as _lib
+except ImportError:
+    # The accelerator is optional, e.g. on PyPy or in a source checkout
+    # where found/tuplebuild.py was not compiled.
+    _ffi = _lib = None
 
 __all__ = [
     "pack",
     "unpack",
+    "unpack_from",
+    "iter_unpack",
+    "pack_many",
+    "unpack_many",
+    "EncoderCache",
+    "enable_encoder_cache",
+    "disable_encoder_cache",
     "Versionstamp",
     "pack_with_versionstamp",
     "has_incomplete_versionstamp",
@@ -257,23 +274,137 @@ def _encode(value, nested=False):
         raise ValueError("Unsupported data type: {}".format(type(value)))
 
 
+# ---------------------------------------------------------------------------
+# Encoder cache — the same strings, bytes and UUIDs, e.g. the predicates of a
+# store, are packed over and over.  Their encoding is memoized in an LRU
+# keyed by type and value: only those types, because equal values of other
+# types may not have the same encoding, e.g. 1 and True, or 0.0 and -0.0.
+# ---------------------------------------------------------------------------
+
+_CACHEABLE = frozenset((str, bytes, _uuid_mod.UUID))
+
+
+class EncoderCache:
+    """LRU of the encoding of str, bytes and UUID elements.
+
+    ``hits`` and ``misses`` count the lookups, other elements are encoded
+    as usual and not counted."""
+
+    __slots__ = ("max_entries", "entries", "hits", "misses")
+
+    def __init__(self, max_entries=4096):
+        self.max_entries = max_entries
+        # (type, value) -> bytes
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def encode(self, value):
+        if value.__class__ not in _CACHEABLE:
+            return _encode(value)
+        key = (value.__class__, value)
+        out = self.entries.get(key)
+        if out is None:
+            self.misses += 1
+            out = self.entries[key] = _encode(value)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            return out
+        self.hits += 1
+        try:
+            self.entries.move_to_end(key)
+        except KeyError:
+            # Evicted by another thread in the meantime
+            pass
+        return out
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+_encoder_cache = None
+
+
+def enable_encoder_cache(max_entries=4096):
+    """Memoize the encoding of elements in every pack, return the ``EncoderCache``."""
+    global _encoder_cache
+    if _encoder_cache is None:
+        _encoder_cache = EncoderCache(max_entries)
+    return _encoder_cache
+
+
+def disable_encoder_cache():
+    global _encoder_cache
+    _encoder_cache = None
+
+
+def _encoder(cache):
+    """Return the function that encodes an element: ``cache`` is an
+    ``EncoderCache``, ``False`` to not use any, or ``None`` for the cache of
+    enable_encoder_cache if any."""
+    if cache is None:
+        cache = _encoder_cache
+    if cache is None or cache is False:
+        return _encode
+    return cache.encode
+
+
 # ---------------------------------------------------------------------------
 # Public API
 # ---------------------------------------------------------------------------
 
 
-def pack(t):
+def pack(t, cache=None):
     """Pack a tuple of values into a lexicographically ordered byte string.
 
     Encoding is byte-for-byte compatible with the official FoundationDB Python
     binding (``fdb.tuple.pack``).
+
+    ``cache`` is the ``EncoderCache`` that memoizes the encoding of the
+    elements, ``False`` for none; it defaults to the cache of
+    ``enable_encoder_cache``, if any.
     """
-    return b"".join(_encode(x) for x in t)
+    if cache is None:
+        cache = _encoder_cache
+    if cache is None or cache is False:
+        return b"".join([_encode(x) for x in t])
+    encode = cache.encode
+    return b"".join([encode(x) for x in t])
 
 
-def unpack(key):
-    """Unpack a byte string produced by pack() back into a tuple."""
-    pos = 0
+def pack_many(tuples, prefix=b"", cache=None):
+    """Return the list of ``prefix + pack(t)`` for each tuple ``t`` of ``tuples``.
+
+    Each distinct element, that is each object, is encoded once, then its
+    bytes are reused by the other tuples that hold it, e.g. the
+    permutations of the same items.
+    """
+    encode = _encoder(cache)
+    # id(x) -> (x, bytes); x is kept alive, so that its id is not reused
+    encoded = {}
+    out = []
+    for t in tuples:
+        chunks = [prefix]
+        for x in t:
+            try:
+                chunks.append(encoded[id(x)][1])
+            except KeyError:
+                chunk = encode(x)
+                encoded[id(x)] = (x, chunk)
+                chunks.append(chunk)
+        out.append(b"".join(chunks))
+    return out
+
+
+def _unpack_python(key, offset=0):
+    pos = offset
     res = []
     while pos < len(key):
         r, pos = _decode(key, pos)
@@ -281,6 +412,160 @@ def unpack(key):
     return tuple(res)
 
 
+# ---------------------------------------------------------------------------
+# Native decoder — found._tuple splits the key into elements in one C call,
+# then each element is built with a table lookup on its type code.
+# ---------------------------------------------------------------------------
+
+_SCAN_CAPACITY = 32
+_SCAN_SLOTS = 4  # code, payload start, payload end, value (see tuplebuild.py)
+
+_scratch = threading.local()
+
+_DOUBLE_BITS = struct.Struct(">Q")
+_DOUBLE = struct.Struct(">d")
+
+
+def _native_bytes(key, start, end, escaped):
+    if escaped:
+        return key[start:end].replace(b"\x00\xFF", b"\x00")
+    return key[start:end]
+
+
+def _native_string(key, start, end, escaped):
+    if escaped:
+        return key[start:end].replace(b"\x00\xFF", b"\x00").decode("utf-8")
+    return key[start:end].decode("utf-8")
+
+
+def _native_positive(key, start, end, magnitude):
+    return magnitude
+
+
+def _native_negative(key, start, end, magnitude):
+    return magnitude - _size_limits[end - start]
+
+
+def _native_double(key, start, end, bits):
+    return _DOUBLE.unpack(_DOUBLE_BITS.pack(bits))[0]
+
+
+def _native_fallback(key, start, end, value):
+    # Arbitrary-precision integers and nested tuples
+    return _decode(key, start - 1)[0]
+
+
+_native_decoders = [None] * 256
+_native_decoders[NULL_CODE] = lambda key, start, end, value: None
+_native_decoders[BYTES_CODE] = _native_bytes
+_native_decoders[STRING_CODE] = _native_string
+_native_decoders[NESTED_CODE] = _native_fallback
+_native_decoders[NEG_INT_START] = _native_fallback
+_native_decoders[INT_ZERO_CODE] = lambda key, start, end, value: 0
+_native_decoders[POS_INT_END] = _native_fallback
+for _code in range(NEG_INT_START + 1, INT_ZERO_CODE):
+    _native_decoders[_code] = _native_negative
+for _code in range(INT_ZERO_CODE + 1, POS_INT_END):
+    _native_decoders[_code] = _native_positive
+_native_decoders[DOUBLE_CODE] = _native_double
+_native_decoders[FALSE_CODE] = lambda key, start, end, value: False
+_native_decoders[TRUE_CODE] = lambda key, start, end, value: True
+_native_decoders[UUID_CODE] = lambda key, start, end, value: _uuid_mod.UUID(bytes=key[start:end])
+_native_decoders[VERSIONSTAMP_CODE] = lambda key, start, end, value: Versionstamp.from_bytes(
+    key, start
+)
+
+
+def _unpack_native(key, offset=0):
+    try:
+        out, slots = _scratch.out
+    except AttributeError:
+        out = _ffi.new("uint64_t[]", _SCAN_CAPACITY * _SCAN_SLOTS)
+        slots = memoryview(_ffi.buffer(out)).cast("Q")
+        _scratch.out = out, slots
+    if offset:
+        # Scan in place, the offsets are relative to the pointer
+        pointer = _ffi.from_buffer("uint8_t[]", key) + offset
+        count = _lib.found_tuple_scan(pointer, len(key) - offset, out, _SCAN_CAPACITY)
+    else:
+        count = _lib.found_tuple_scan(key, len(key), out, _SCAN_CAPACITY)
+    if count < 0:
+        # Malformed key, or more elements than the scratch space: the pure
+        # Python decoder knows how to handle (or report) those.
+        return _unpack_python(key, offset)
+    count *= _SCAN_SLOTS
+    slots = slots[:count].tolist()
+    if offset:
+        for i in range(1, count, _SCAN_SLOTS):
+            slots[i] += offset
+            slots[i + 1] += offset
+    decoders = _native_decoders
+    res = []
+    for i in range(0, count, _SCAN_SLOTS):
+        res.append(decoders[slots[i]](key, slots[i + 1], slots[i + 2], slots[i + 3]))
+    return tuple(res)
+
+
+def unpack(key):
+    """Unpack a byte string produced by pack() back into a tuple.
+
+    ``key`` may also be a buffer, e.g. the ``memoryview`` of a zero-copy
+    range read, that is copied into ``bytes`` first."""
+    if key.__class__ is not bytes:
+        key = bytes(key)
+    return _unpack(key)
+
+
+_unpack = _unpack_python if _lib is None else _unpack_native
+
+
+def unpack_from(key, offset=0, count=None):
+    """Unpack the elements of ``key`` that start at the byte ``offset``, or
+    only the first ``count`` of them.
+
+    The bytes before ``offset``, e.g. a known prefix, are neither decoded
+    nor copied: ``unpack_from(key, len(pack(prefix)))`` is
+    ``unpack(key)[len(prefix):]``.
+    """
+    if key.__class__ is not bytes:
+        key = bytes(key)
+    if count is None:
+        return _unpack(key, offset)
+    res = []
+    pos = offset
+    while pos < len(key) and len(res) < count:
+        r, pos = _decode(key, pos)
+        res.append(r)
+    return tuple(res)
+
+
+def unpack_many(keys, skip_prefix=b""):
+    """Return the list of the tuples of ``keys`` without ``skip_prefix``,
+    that is not decoded.  Raise ``ValueError`` when a key does not start
+    with ``skip_prefix``."""
+    offset = len(skip_prefix)
+    unpack = _unpack
+    out = []
+    for key in keys:
+        if key.__class__ is not bytes:
+            key = bytes(key)
+        if not key.startswith(skip_prefix):
+            raise ValueError("Key does not start with the prefix: {!r}".format(key))
+        out.append(unpack(key, offset))
+    return out
+
+
+def iter_unpack(key, offset=0):
+    """Yield the elements of ``key`` that start at the byte ``offset``, one
+    at a time: the elements after the last one consumed are not decoded."""
+    if key.__class__ is not bytes:
+        key = bytes(key)
+    pos = offset
+    while pos < len(key):
+        r, pos = _decode(key, pos)
+        yield r
+
+
 def has_incomplete_versionstamp(t):
     """Return True if tuple t contains an incomplete Versionstamp at any depth."""
     for item in t:
@@ -291,7 +576,7 @@ def has_incomplete_versionstamp(t):
     return False
 
 
-def pack_with_versionstamp(t, prefix=None):
+def pack_with_versionstamp(t, prefix=None, cache=None):
     """Pack a tuple that contains exactly one incomplete Versionstamp.
 
     Returns the packed bytes with a 4-byte little-endian offset appended at the
@@ -301,12 +586,13 @@ def pack_with_versionstamp(t, prefix=None):
     """
     if not has_incomplete_versionstamp(t):
         raise ValueError("No incomplete versionstamp in tuple")
+    encode = _encoder(cache)
     pre = prefix if prefix else b""
     chunks = [pre]
     vs_pos = -1
     cur = len(pre)
     for item in t:
-        chunk = _encode(item)
+        chunk = encode(item)
         if isinstance(item, Versionstamp) and not item.is_complete():
             # vs_pos points to where the 10-byte tr_version starts:
             # cur (start of this item) + 1 (type code byte)
@@ -0,0 +1,221 @@
+"""
+tuplebuild.py — CFFI build script for found._tuple
+
+Usage:
+    python tuplebuild.py
+
+found._tuple is an optional accelerator for found.tuple.unpack: a single C
+call splits a packed key into its top-level elements, and decodes fixed-width
+integers and doubles on the way.  found.tuple builds the Python objects from
+the result with a table lookup per element instead of an if/elif chain.
+
+Anything unusual (unknown type code, truncated key, too many elements) is
+reported as an error, and found.tuple falls back to the pure-Python decoder,
+so both implementations accept and reject exactly the same inputs.
+
+Unlike found._fdb, this module does not link against libfdb_c.
+"""
+
+from cffi import FFI
+
+CDEF = """
+int found_tuple_scan(const uint8_t *key, int length, uint64_t *out, int capacity);
+"""
+
+SOURCE = r"""
+#include <stdint.h>
+#include <string.h>
+
+/* Each element is reported as four slots in the output array:
+   type code, payload start, payload end, and a value that depends on the
+   type code: the escape flag of bytes and strings, the magnitude of 1 to 8
+   bytes integers, or the IEEE 754 bits of doubles. */
+#define CODE 0
+#define START 1
+#define END 2
+#define VALUE 3
+#define SLOTS 4
+
+#define FOUND_ERROR -1
+#define FOUND_FULL -2
+
+/* Return the offset of the terminator of a bytes or string payload starting
+   at pos, or length when there is none (same as _find_terminator). */
+static int find_terminator(const uint8_t *key, int length, int pos, uint64_t *escaped)
+{
+    while (pos < length) {
+        const uint8_t *hit = memchr(key + pos, 0x00, length - pos);
+        if (hit == NULL) {
+            return length;
+        }
+        pos = (int)(hit - key);
+        if (pos + 1 < length && key[pos + 1] == 0xff) {
+            *escaped = 1;
+            pos += 2;
+            continue;
+        }
+        return pos;
+    }
+    return length;
+}
+
+static uint64_t read_big_endian(const uint8_t *key, int pos, int n)
+{
+    uint64_t out = 0;
+    int i;
+    for (i = 0; i < n; i++) {
+        out = (out << 8) | key[pos + i];
+    }
+    return out;
+}
+
+static int skip(const uint8_t *key, int length, int pos);
+
+/* pos is the offset after the nested type code; return the offset after the
+   nested terminator. */
+static int skip_nested(const uint8_t *key, int length, int pos)
+{
+    while (pos < length) {
+        if (key[pos] == 0x00) {
+            if (pos + 1 < length && key[pos + 1] == 0xff) {
+                pos += 2;
+                continue;
+            }
+            return pos + 1;
+        }
+        pos = skip(key, length, pos);
+        if (pos < 0) {
+            return FOUND_ERROR;
+        }
+    }
+    return FOUND_ERROR;
+}
+
+/* Fill item with the element starting at pos, return the offset of the next
+   element. */
+static int scan(const uint8_t *key, int length, int pos, uint64_t *item)
+{
+    int code = key[pos];
+    int n;
+    uint64_t bits;
+    item[CODE] = code;
+    item[START] = pos + 1;
+    item[END] = pos + 1;
+    item[VALUE] = 0;
+    if (code == 0x00 || code == 0x14 || code == 0x26 || code == 0x27) {
+        /* null, zero, false, true */
+        return pos + 1;
+    }
+    if (code == 0x01 || code == 0x02) {
+        /* bytes, string */
+        n = find_terminator(key, length, pos + 1, &item[VALUE]);
+        item[END] = n;
+        return n + 1;
+    }
+    if (0x0b < code && code < 0x1d) {
+        /* 1 to 8 bytes integers */
+        n = code > 0x14 ? code - 0x14 : 0x14 - code;
+        if (pos + 1 + n > length) {
+            return FOUND_ERROR;
+        }
+        item[END] = pos + 1 + n;
+        item[VALUE] = read_big_endian(key, pos + 1, n);
+        return pos + 1 + n;
+    }
+    if (code == 0x0b || code == 0x1d) {
+        /* arbitrary-precision integers, decoded in Python */
+        if (pos + 1 >= length) {
+            return FOUND_ERROR;
+        }
+        n = code == 0x1d ? key[pos + 1] : key[pos + 1] ^ 0xff;
+        if (pos + 2 + n > length) {
+            return FOUND_ERROR;
+        }
+        item[END] = pos + 2 + n;
+        return pos + 2 + n;
+    }
+    if (code == 0x21) {
+        /* double, undo the ordering adjustment */
+        if (pos + 9 > length) {
+            return FOUND_ERROR;
+        }
+        bits = read_big_endian(key, pos + 1, 8);
+        if (bits & 0x8000000000000000ULL) {
+            bits ^= 0x8000000000000000ULL;
+        } else {
+            bits = ~bits;
+        }
+        item[END] = pos + 9;
+        item[VALUE] = bits;
+        return pos + 9;
+    }
+    if (code == 0x30 || code == 0x33) {
+        /* uuid, versionstamp */
+        n = code == 0x30 ? 16 : 12;
+        if (pos + 1 + n > length) {
+            return FOUND_ERROR;
+        }
+        item[END] = pos + 1 + n;
+        return pos + 1 + n;
+    }
+    if (code == 0x05) {
+        /* nested tuple, decoded in Python */
+        n = skip_nested(key, length, pos + 1);
+        if (n < 0) {
+            return FOUND_ERROR;
+        }
+        item[END] = n - 1;
+        return n;
+    }
+    return FOUND_ERROR;
+}
+
+static int skip(const uint8_t *key, int length, int pos)
+{
+    uint64_t item[SLOTS];
+    pos = scan(key, length, pos, item);
+    if (pos > length) {
+        /* unterminated bytes or string */
+        return FOUND_ERROR;
+    }
+    return pos;
+}
+
+/* Split key into at most capacity elements, return the element count,
+   FOUND_ERROR if key is malformed, or FOUND_FULL if there are more
+   elements. */
+int found_tuple_scan(const uint8_t *key, int length, uint64_t *out, int capacity)
+{
+    int pos = 0;
+    int count = 0;
+    while (pos < length) {
+        if (count == capacity) {
+            return FOUND_FULL;
+        }
+        pos = scan(key, length, pos, out + count * SLOTS);
+        if (pos < 0) {
+            return FOUND_ERROR;
+        }
+        count++;
+    }
+    return count;
+}
+"""
+
+
+def _build_ffi():
+    ffi = FFI()
+    ffi.set_source("found._tuple", SOURCE)
+    ffi.cdef(CDEF)
+    return ffi
+
+
+ffi = _build_ffi()
+
+
+def main():
+    ffi.compile(verbose=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
 from setuptools import setup
 
 setup(
-    cffi_modules=["found/ffibuild.py:ffi"],
+    cffi_modules=["found/ffibuild.py:ffi", "found/tuplebuild.py:ffi"],
 )